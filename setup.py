@@ -176,6 +176,13 @@ cairo_module = Extension('uc2.libcairo._libcairo',
 		libraries=['cairo'])
 modules.append(cairo_module)
 
+libgeom_src = os.path.join(src_path, 'uc2', 'libgeom')
+files = make_source_list(libgeom_src, ['_libgeom.c', ])
+libgeom_module = Extension('uc2.libgeom._libgeom',
+		define_macros=[('MAJOR_VERSION', '1'), ('MINOR_VERSION', '0')],
+		sources=files)
+modules.append(libgeom_module)
+
 #trace_src = os.path.join(src_path, 'uc2', 'libtrace')
 #files = make_source_list(trace_src, ['_libtrace.c', ])
 #trace_module = Extension('uc2.libtrace._libtrace',
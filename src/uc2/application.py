@@ -59,6 +59,53 @@ Example: uniconvertor drawing.cdr drawing.svg
  Available options:
  --help    Show this help
  -verbose  Internal logs printed while translation
+
+ CDR loading options:
+ -pages=1,3-5          Translate selected pages only
+ -layers=NAME1,NAME2   Translate layers with selected names only
+ -inflate_threads=N    Number of threads inflating compressed data
+ -mmap_loading=yes|no  Read file content through memory mapping
+
+BATCH MODE: uniconvertor --batch [OPTIONS] [INPUT FILES] [OUTPUT DIRECTORY]
+
+Translates many files using a pool of worker processes. Input files can be
+provided as file names or quoted glob patterns and/or as a manifest file
+(one input file path per line).
+
+Example: uniconvertor --batch -format=svg "drawings/*.cdr" out/
+
+ Batch mode options (CDR loading options are accepted too):
+ -format=EXT     Output file format extension (required)
+ -workers=N      Number of worker processes (default is number of CPUs)
+ -manifest=FILE  Manifest file with input file paths
+
+SERVER MODE: uniconvertor --serve [OPTIONS]
+
+Starts translation server on localhost. Jobs are processed by warm worker
+processes, so interpreter start and application initialization are paid once.
+
+Example: curl --data-binary @drawing.cdr \
+              "http://127.0.0.1:8100/convert?from=cdr&to=svg" > drawing.svg
+
+ Server mode options:
+ -host=HOST      Host to bind (default is 127.0.0.1)
+ -port=PORT      Port to listen (default is 8100)
+ -workers=N      Number of worker processes (default is number of CPUs)
+ -queue=N        Maximum number of waiting jobs (default is 16)
+ -timeout=SEC    Timeout for single job in seconds (default is 120)
+ -max_jobs=N     Number of jobs before worker recycling (default is 100)
+ -max_size=MB    Maximum request body size in megabytes (default is 100)
+
+THUMBNAIL MODE: uniconvertor --thumbnail [OPTIONS] [INPUT FILE] [PNG FILE]
+
+Saves preview image embedded into CDR/CDRZ file as PNG file without
+document translation. If there is no embedded preview, the first page
+is rendered in low resolution.
+
+Example: uniconvertor --thumbnail drawing.cdr drawing.png
+
+ Thumbnail mode options:
+ -size=N         Size of rendered preview in pixels (default is 128)
 '''
 
 import sys
@@ -66,10 +113,32 @@ import os
 
 import uc2
 from uc2 import _, cms
-from uc2 import events, msgconst
+from uc2 import events, msgconst, batch, server, thumbnail
 from uc2.uc_conf import UCData, UCConfig
-from uc2.formats import get_loader, get_saver
-
+from uc2.formats import get_loader, get_saver, get_direct_translator
+
+#Command line options forwarded to loader config, name -> value type
+LOADER_OPTIONS = {
+	'pages': str,
+	'layers': str,
+	'inflate_threads': int,
+	'mmap_loading': bool,
+	}
+
+def get_loader_options(options):
+	"""
+	Returns loader config dictionary built from command line options.
+	Options of application modes are not included.
+	Raises ValueError for malformed option value.
+	"""
+	cnf = {}
+	for key, value_type in LOADER_OPTIONS.items():
+		if not options.has_key(key): continue
+		value = options[key]
+		if value_type is bool and not isinstance(value, bool):
+			raise ValueError(_('Option %s should be yes or no') % (key))
+		cnf[key] = value_type(value)
+	return cnf
 
 class UCApplication:
 
@@ -96,27 +165,106 @@ class UCApplication:
 		status += ' ' * (msgconst.MAX_LEN - len(status)) + '| ' + args[1]
 		print status
 
+	def translate(self, input_file, output_file, cnf={}, use_cache=True):
+		"""
+		Translates input file into output file using current application
+		instance. Returns (True, '') on success, otherwise (False, message).
+		Provided cnf dictionary updates loader config. If use_cache is
+		False, input format detection results are not cached.
+		The method doesn't terminate application, so can be called
+		many times for the same instance.
+		"""
+		msg = _('Translation of') + ' "%s" ' % (input_file) + _('into "%s"') % (output_file)
+		events.emit(events.MESSAGES, msgconst.JOB, msg)
+
+		saver = get_saver(output_file)
+		if saver is None:
+			msg = _("Output file format of '%s' is unsupported.") % (output_file)
+			return self._interrupt(msg)
+
+		loader = get_loader(input_file, use_cache=use_cache)
+		if loader is None:
+			msg = _("Input file format of '%s' is unsupported.") % (input_file)
+			return self._interrupt(msg)
+
+		translator = get_direct_translator(loader, saver)
+		if not translator is None:
+			try:
+				translator(self.appdata, input_file, output_file, cnf=dict(cnf))
+			except:
+				msg = _("Error while translation and saving '%s'") % (input_file)
+				return self._interrupt(msg, sys.exc_info())
+			events.emit(events.MESSAGES, msgconst.OK, _('Translation is successful'))
+			return True, ''
+
+		try:
+			doc = loader(self.appdata, input_file, cnf=dict(cnf))
+		except:
+			msg = _("Error while loading '%s'") % (input_file)
+			msg += _("The file may be corrupted or contains unknown file format.")
+			return self._interrupt(msg, sys.exc_info())
+
+		if doc is None:
+			msg = _("Error while model creating for '%s'") % (input_file)
+			return self._interrupt(msg)
+
+		try:
+			saver(doc, output_file)
+		except:
+			msg = _("Error while translation and saving '%s'") % (input_file)
+			exc_info = sys.exc_info()
+			doc.close()
+			return self._interrupt(msg, exc_info)
+
+		doc.close()
+		events.emit(events.MESSAGES, msgconst.OK, _('Translation is successful'))
+		return True, ''
+
+	def make_thumbnail(self, input_file, output_file,
+					size=thumbnail.DEFAULT_SIZE):
+		"""
+		Saves preview of input file as PNG file. Embedded preview
+		of CDR/CDRZ file is used if any, otherwise the document is rendered.
+		Returns (True, '') on success, otherwise (False, message).
+		"""
+		msg = _('Thumbnail of') + ' "%s" ' % (input_file) + _('into "%s"') % (output_file)
+		events.emit(events.MESSAGES, msgconst.JOB, msg)
+		try:
+			thumbnail.save_thumbnail(self.appdata, input_file, output_file, size)
+		except:
+			msg = _("Error while thumbnail creating for '%s'") % (input_file)
+			return self._interrupt(msg, sys.exc_info())
+		events.emit(events.MESSAGES, msgconst.OK, _('Thumbnail is saved'))
+		return True, ''
+
+	def _interrupt(self, msg, exc_info=None):
+		events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		events.emit(events.MESSAGES, msgconst.STOP, _('Translation is interrupted'))
+		if not exc_info is None:
+			msg += '\n%s %s' % (exc_info[1], exc_info[2])
+		return False, msg
+
 	def run(self):
 
-		if len(sys.argv) < 3 or '--help' in sys.argv:
+		if '--help' in sys.argv or \
+		(len(sys.argv) < 3 and not '--serve' in sys.argv):
 			self.show_help()
 
 		files = []
 		options_list = []
 		options = {}
+		verbose = False
 
 		for item in sys.argv[1:]:
 			if item[0] == '-':
 				if item == '-verbose':
 					events.connect(events.MESSAGES, self.verbose)
+					verbose = True
 				else:
 					options_list.append(item)
 			else:
 				files.append(item)
 
-		if len(files) <> 2: self.show_help()
-		if not os.path.lexists(files[0]):self.show_help()
-
 		for item in options_list:
 			result = item[1:].split('=')
 			if not len(result) == 2:
@@ -127,73 +275,80 @@ class UCApplication:
 				if value == 'no':value = False
 				options[key] = value
 
-		self.default_cms = cms.ColorManager()
+		if '--batch' in options_list:
+			self.run_batch(files, options, verbose)
 
-		print ''
-		msg = _('Translation of') + ' "%s" ' % (files[0]) + _('into "%s"') % (files[1])
-		events.emit(events.MESSAGES, msgconst.JOB, msg)
+		if '--serve' in options_list:
+			self.run_server(options, verbose)
 
-		saver = get_saver(files[1])
-		if saver is None:
-			msg = _("Output file format of '%s' is unsupported.") % (files[1])
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		if '--thumbnail' in options_list:
+			self.run_thumbnail(files, options)
 
-			msg = _('Translation is interrupted')
-			events.emit(events.MESSAGES, msgconst.STOP, msg)
-
-			sys.exit(1)
+		if len(files) <> 2: self.show_help()
+		if not os.path.lexists(files[0]):self.show_help()
 
-		loader = get_loader(files[0])
-		if loader is None:
-			msg = _("Input file format of '%s' is unsupported.") % (files[0])
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		try:
+			cnf = get_loader_options(options)
+		except ValueError:
+			self.show_help()
 
-			msg = _('Translation is interrupted')
-			events.emit(events.MESSAGES, msgconst.STOP, msg)
+		self.default_cms = cms.ColorManager()
 
+		print ''
+		result, msg = self.translate(files[0], files[1], cnf)
+		if not result:
+			print '\n', msg
 			sys.exit(1)
+		print ''
 
-		try:
-			doc = loader(self.appdata, files[0])
-		except:
-			msg = _("Error while loading '%s'") % (files[0])
-			msg += _("The file may be corrupted or contains unknown file format.")
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		sys.exit(0)
 
-			msg = _('Translation is interrupted')
-			events.emit(events.MESSAGES, msgconst.STOP, msg)
+	def run_batch(self, files, options, verbose=False):
+		if not options.has_key('format'): self.show_help()
+		manifest = options.get('manifest', '')
+		if not files or (len(files) < 2 and not manifest): self.show_help()
 
-			print '\n', sys.exc_info()[1], sys.exc_info()[2]
+		output_dir = files[-1]
+		inputs = batch.collect_inputs(files[:-1], manifest)
+		if not inputs:
+			print _('No input files are found')
 			sys.exit(1)
 
-		if doc is not None:
-			try:
-				saver(doc, files[1])
-			except:
-				msg = _("Error while translation and saving '%s'") % (files[0])
-				events.emit(events.MESSAGES, msgconst.ERROR, msg)
-
-				msg = _('Translation is interrupted')
-				events.emit(events.MESSAGES, msgconst.STOP, msg)
+		workers = 0
+		try:
+			if options.has_key('workers'):
+				workers = int(options['workers'])
+			cnf = get_loader_options(options)
+		except ValueError:
+			self.show_help()
 
-				print '\n', sys.exc_info()[1], sys.exc_info()[2]
-				sys.exit(1)
-		else:
-			msg = _("Error while model creating for '%s'") % (files[0])
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		jobs = batch.make_jobs(inputs, output_dir, options['format'], cnf)
+		failures = batch.run_jobs(self, jobs, workers, verbose)
 
-			msg = _('Translation is interrupted')
-			events.emit(events.MESSAGES, msgconst.STOP, msg)
-			sys.exit(1)
-
-		doc.close()
-		events.emit(events.MESSAGES, msgconst.OK, _('Translation is successful'))
 		print ''
-
+		print _('Translated: %d, failed: %d') % (len(jobs) - failures, failures)
+		if failures: sys.exit(1)
 		sys.exit(0)
 
+	def run_thumbnail(self, files, options):
+		if len(files) <> 2: self.show_help()
+		if not os.path.lexists(files[0]):self.show_help()
+		try:
+			size = int(options.get('size', thumbnail.DEFAULT_SIZE))
+		except ValueError:
+			self.show_help()
+		if size < 1: self.show_help()
 
+		self.default_cms = cms.ColorManager()
+		result, msg = self.make_thumbnail(files[0], files[1], size)
+		if not result:
+			print '\n', msg
+			sys.exit(1)
+		sys.exit(0)
 
-
-
-
+	def run_server(self, options, verbose=False):
+		try:
+			server.serve(self, options, verbose)
+		except ValueError:
+			self.show_help()
+		sys.exit(0)
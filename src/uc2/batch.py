@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides batch translation routines. Jobs are distributed
+over a pool of worker processes, each worker initializes application
+(config, appdata and color manager) only once and translates many files.
+"""
+
+import os
+import sys
+import glob
+import multiprocessing
+
+from uc2 import _, cms, events
+from uc2.utils.fs import change_file_extension
+
+WORKER_APP = None
+
+def collect_inputs(patterns, manifest=''):
+	"""
+	Returns sorted list of input file paths. Patterns are expanded as
+	glob patterns, manifest file is a plain text file with one path per line.
+	"""
+	result = []
+	for pattern in patterns:
+		paths = glob.glob(pattern)
+		paths.sort()
+		result += paths
+	if manifest:
+		try:
+			fileobj = open(manifest, 'rb')
+		except:
+			msg = _('Cannot open %s file for reading') % (manifest)
+			raise IOError(msg)
+		for line in fileobj.readlines():
+			line = line.strip()
+			if line and not line[0] == '#':
+				result.append(line)
+		fileobj.close()
+	paths = []
+	for path in result:
+		if os.path.isfile(path) and not path in paths:
+			paths.append(path)
+	return paths
+
+def make_jobs(inputs, output_dir, ext, cnf={}):
+	"""
+	Creates list of (input path, output path, loader config) jobs.
+	Output files are placed into output directory with provided extension.
+	"""
+	if not os.path.lexists(output_dir):
+		os.makedirs(output_dir)
+	jobs = []
+	for path in inputs:
+		filename = change_file_extension(os.path.basename(path), ext)
+		jobs.append((path, os.path.join(output_dir, filename), cnf))
+	return jobs
+
+def init_worker(app_class, path, verbose=False):
+	"""
+	Worker process initializer. Creates application instance
+	which is used for all jobs processed by the worker.
+	"""
+	global WORKER_APP
+	WORKER_APP = app_class(path)
+	WORKER_APP.default_cms = cms.ColorManager()
+	if verbose:
+		events.connect(events.MESSAGES, WORKER_APP.verbose)
+
+def translate_job(job):
+	"""
+	Translates single job by worker application.
+	Returns (input path, output path, result flag, message) tuple.
+	"""
+	input_file, output_file, cnf = job
+	try:
+		result, msg = WORKER_APP.translate(input_file, output_file, cnf)
+	except:
+		result = False
+		msg = '%s %s' % (sys.exc_info()[0], sys.exc_info()[1])
+	return input_file, output_file, result, msg
+
+def report(job_result):
+	input_file, output_file, result, msg = job_result
+	if result:
+		print '[ OK ] %s -> %s' % (input_file, output_file)
+	else:
+		print '[FAIL] %s -> %s' % (input_file, output_file)
+		for line in msg.splitlines():
+			print '       ' + line
+
+def run_jobs(app, jobs, workers=0, verbose=False):
+	"""
+	Translates jobs and reports result for each file.
+	If workers number is 1, jobs are translated in current process
+	by provided application instance. Returns number of failed jobs.
+	"""
+	global WORKER_APP
+	if workers < 1:
+		workers = multiprocessing.cpu_count()
+	workers = max(1, min(workers, len(jobs)))
+
+	failures = 0
+	outputs = {}
+	checked_jobs = []
+	for job in jobs:
+		if outputs.has_key(job[1]):
+			msg = _('Output file name is already used by other input file')
+			report((job[0], job[1], False, msg))
+			failures += 1
+		else:
+			outputs[job[1]] = job[0]
+			checked_jobs.append(job)
+
+	if workers == 1:
+		WORKER_APP = app
+		if app.default_cms is None:
+			app.default_cms = cms.ColorManager()
+		for job in checked_jobs:
+			item = translate_job(job)
+			report(item)
+			if not item[2]: failures += 1
+		return failures
+
+	pool = multiprocessing.Pool(workers, init_worker,
+							(app.__class__, app.path, verbose))
+	try:
+		for item in pool.imap_unordered(translate_job, checked_jobs):
+			report(item)
+			if not item[2]: failures += 1
+		pool.close()
+	except KeyboardInterrupt:
+		pool.terminate()
+		raise
+	pool.join()
+	return failures
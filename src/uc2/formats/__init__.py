@@ -23,15 +23,52 @@ from uc2 import events, msgconst
 from uc2.utils.fs import get_file_extension
 
 from uc2.formats import data
+from uc2.formats.generic import get_file_header
+
+
+DETECTION_CACHE = {}
+DETECTION_CACHE_SIZE = 1000
+
+def detect_format(path, formats, use_cache=True):
+	"""
+	Returns first format of provided list which matches file content,
+	or None. File header is read once and shared by format sniffers.
+	Results are cached by file path, inode, size, modification and
+	status change times. Files which are rewritten in place quickly
+	(like temporary files) should be detected with use_cache=False.
+	"""
+	key = None
+	if use_cache:
+		stat = os.stat(path)
+		key = (path, stat.st_ino, stat.st_size, stat.st_mtime,
+			stat.st_ctime, tuple(formats))
+		if key in DETECTION_CACHE:
+			return DETECTION_CACHE[key]
+	header = get_file_header(path)
+	result = None
+	for format in formats:
+		sniffer = data.SNIFFERS.get(format)
+		if not sniffer is None:
+			if sniffer(header, path):
+				result = format
+				break
+		else:
+			checker = data.CHECKERS.get(format)
+			if not checker is None and checker(path):
+				result = format
+				break
+	if not key is None:
+		if len(DETECTION_CACHE) >= DETECTION_CACHE_SIZE:
+			DETECTION_CACHE.clear()
+		DETECTION_CACHE[key] = result
+	return result
 
-
-def get_loader(path, experimental=False):
+def get_loader(path, experimental=False, use_cache=True):
 
 	if not os.path.lexists(path): return None
 	if not os.path.isfile(path):return None
 
 	ext = get_file_extension(path)
-	loader = None
 	ld_formats = [] + data.LOADER_FORMATS
 
 	msg = _('Start to search for loader by file extension %s') % (ext.__str__())
@@ -39,24 +76,25 @@ def get_loader(path, experimental=False):
 
 	if experimental:
 		ld_formats += data.EXPERIMENTAL_LOADERS
+	ext_formats = []
 	for format in ld_formats:
 		if ext in uc2const.FORMAT_EXTENSION[format]:
-			if data.CHECKERS[format](path):
-				loader = data.LOADERS[format]
-				break
-	if loader is None:
+			ext_formats.append(format)
+	other_formats = [item for item in ld_formats if not item in ext_formats]
+
+	#formats matched by extension are sniffed first, so content
+	#detection reads file header once for both search stages
+	format = detect_format(path, ext_formats + other_formats, use_cache)
+	if not format in ext_formats:
 
 		msg = _('Loader is not found or not suitable for %s') % (path)
 		events.emit(events.MESSAGES, msgconst.WARNING, msg)
 		msg = _('Start to search loader by file content')
 		events.emit(events.MESSAGES, msgconst.INFO, msg)
 
-		for format in ld_formats:
-			checker = data.CHECKERS[format]
-			if not checker is None:
-				if checker(path):
-					loader = data.LOADERS[format]
-					break
+	loader = None
+	if not format is None:
+		loader = data.LOADERS[format]
 	if loader is None:
 		msg = _('Loader is not found for %s') % (path)
 		events.emit(events.MESSAGES, msgconst.ERROR, msg)
@@ -87,6 +125,18 @@ def get_saver(path, experimental=False):
 		events.emit(events.MESSAGES, msgconst.OK, msg)
 	return saver
 
+def get_direct_translator(loader, saver):
+	"""
+	Returns translator function for loader and saver pair which
+	translates file without intermediate PDXF model, or None
+	if there is no such translator.
+	"""
+	translator = data.DIRECT_TRANSLATORS.get((loader, saver))
+	if not translator is None:
+		msg = _('Direct translator is found')
+		events.emit(events.MESSAGES, msgconst.OK, msg)
+	return translator
+
 
 def _test():
 	print get_saver('/home/igor/TEST/canada.pdxf')
@@ -19,8 +19,10 @@ import sys
 
 from uc2 import events, msgconst
 from uc2.formats.cdr.presenter import CDR_Presenter
+from uc2.formats.generic import get_file_header
 from uc2.formats.cdr import const
 from uc2.formats.pdxf.presenter import PDXF_Presenter
+from uc2.formats.plt.presenter import PLT_Presenter
 
 def cdr_loader(appdata, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
@@ -38,20 +40,27 @@ def cdr_saver(cdr_doc, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
 	cdr_doc.save(filename)
 
-def check_cdr(path):
-	try:
-		file = open(path, 'rb')
-	except:
-		errtype, value, traceback = sys.exc_info()
-		msg = _('Cannot open %s file for reading') % (path)
-		events.emit(events.MESSAGES, msgconst.ERROR, msg)
-		raise IOError(errtype, msg + '\n' + value, traceback)
+def cdr_to_plt(appdata, filename, plt_filename, cnf={}, **kw):
+	"""
+	Translates CDR file into PLT file directly, without intermediate
+	PDXF model.
+	"""
+	if kw: cnf.update(kw)
+	doc = CDR_Presenter(appdata, cnf)
+	doc.load(filename)
+	plt_doc = PLT_Presenter(appdata, cnf)
+	doc.traslate_to_plt(plt_doc)
+	doc.close()
+	plt_doc.save(plt_filename)
+	plt_doc.close()
 
-	header = file.read(12)
-	file.close()
+def sniff_cdr(header, path=''):
 	if not header[:4] == 'RIFF':
 		return False
-	if header[8:] in const.CDR_VERSIONS:
+	if header[8:12] in const.CDR_VERSIONS:
 		return True
 	else:
 		return False
+
+def check_cdr(path):
+	return sniff_cdr(get_file_header(path, 12), path)
@@ -20,3 +20,15 @@ from uc2.utils.config import XmlConfigParser
 class CDR_Config(XmlConfigParser):
 
 	system_encoding = 'cp1251'
+
+	#If True, chunk content is read from memory mapped file on demand
+	mmap_loading = True
+	#Number of threads inflating compressed lists, 0 - number of CPUs,
+	#1 - sequential inflating
+	inflate_threads = 1
+	#Numbers of pages to be loaded (starting from 1) as a list or
+	#'1,3-5' like string, all pages are loaded if empty
+	pages = []
+	#Names of layers to be translated as a list or comma separated
+	#string, all layers are translated if empty
+	layers = []
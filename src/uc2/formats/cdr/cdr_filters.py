@@ -16,30 +16,34 @@
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os, sys
+import mmap
 import traceback
 
 
 from uc2 import _, events, msgconst
-from uc2.formats.riff import model
-from uc2.formats.riff.utils import get_chunk_size, dword2py_int, py_int2dword
+from uc2.formats.riff.parser import RiffParser
 from uc2.formats.cdr.model import generic_dict
+from uc2.formats.cdr.utils import parse_page_numbers
 
-class CDR_Loader:
+class CDR_Loader(RiffParser):
 
 	name = 'CDR_Loader'
 	version = 'CDR12'
-	obj_map = {}
+	obj_map = generic_dict
 
 	tr_objs = 0
 	num_objs = 0
 
-	file_size = 0
-	file_position = 0
-	stream_start = 0
-	stream_size = 0
-	stream_decompr_size = 0
 	stream_position = 0
 
+	#Selected page numbers, empty set - all pages
+	pages = set()
+	page_number = 0
+	#Decoded colors, (color space, color bytes) -> color value
+	color_cache = None
+	#(device, inode) of memory mapped file which lazy chunks refer
+	mapped_file = None
+
 	def __init__(self):
 		pass
 
@@ -57,11 +61,44 @@ class CDR_Loader:
 			events.emit(events.MESSAGES, msgconst.ERROR, msg)
 			raise IOError(errtype, msg + '\n' + value, trace)
 
+		self.inflate_threads = presenter.config.inflate_threads
+		self.pages = parse_page_numbers(presenter.config.pages)
+		if self.pages:
+			#pages are counted by skip_list() in file order, but deferred
+			#compressed regions are parsed after the rest of the file
+			self.inflate_threads = 1
+		self.page_number = -1
+		self.color_cache = {}
+		self.mapping = None
+		self.mapped_file = None
+		if presenter.config.mmap_loading and self.file_size:
+			self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+			st = os.fstat(file.fileno())
+			self.mapped_file = (st.st_dev, st.st_ino)
+
 		self.model = self.parse_file(file)
 
 		file.close()
+		self.mapping = None
 		return self.model
 
+	def is_mapped_file(self, path):
+		"""
+		Returns True if lazy chunks of loaded model refer the file.
+		"""
+		if self.mapped_file is None or not os.path.exists(path):
+			return False
+		st = os.stat(path)
+		return (st.st_dev, st.st_ino) == self.mapped_file
+
+	def skip_list(self, list_identifier):
+		#First page list is a master page, so it is always loaded
+		if list_identifier == 'page':
+			self.page_number += 1
+			if self.pages and self.page_number:
+				return not self.page_number in self.pages
+		return False
+
 	def report_position(self, position):
 		if 100.0 * (position - self.file_position) / self.file_size > 3.0:
 			msg = _('Parsing is under process...')
@@ -72,145 +109,6 @@ class CDR_Loader:
 		position = self.stream_start + self.stream_size * position / self.stream_decompr_size
 		self.report_position(position)
 
-	def parse_file(self, file):
-		identifier = file.read(4)
-		size_field = file.read(4)
-		list_identifier = file.read(4)
-		self.version = list_identifier
-		self.obj_map = generic_dict
-		obj = model.RiffRootList(identifier + size_field + list_identifier)
-
-		size = get_chunk_size(size_field)
-		while file.tell() < size + 8:
-			ret = self.parse_stream(file)
-			obj.childs.append(ret)
-
-		return obj
-
-	def get_class(self, identifier, list_identifier=''):
-		if list_identifier:
-			if self.obj_map.has_key(list_identifier):
-				return self.obj_map[list_identifier]
-			else:
-				return model.RiffList
-		else:
-			if self.obj_map.has_key(identifier):
-				return self.obj_map[identifier]
-			else:
-				return model.RiffObject
-
-	def parse_stream(self, file):
-		identifier = file.read(4)
-		if identifier == 'LIST':
-			return self.parse_list(file, identifier)
-		else:
-			return self.parse_object(file, identifier)
-
-	def parse_list(self, file, identifier):
-		size_field = file.read(4)
-		list_identifier = file.read(4)
-
-		size = get_chunk_size(size_field)
-		offset = file.tell()
-
-		if list_identifier == 'cmpr':
-			file.seek(offset)
-			self.stream_start = offset
-			self.stream_size = get_chunk_size(size_field)
-			chunk = file.read(size - 4)
-			return self.parse_cmpr_list(identifier + size_field + \
-									list_identifier + chunk)
-
-		class_ = self.get_class(identifier, list_identifier)
-		obj = class_(identifier + size_field + list_identifier)
-
-		while file.tell() <= offset + size - 8:
-			ret = self.parse_stream(file)
-			if ret is None:
-				file.seek(offset)
-				chunk = file.read(size - 4)
-				return model.RiffUnparsedList(identifier + size_field + \
-										list_identifier + chunk)
-			else:
-				obj.childs.append(ret)
-
-		return obj
-
-	def parse_object(self, file, identifier):
-		if not identifier[:3].isalnum():
-			return None
-		size_field = file.read(4)
-		size = get_chunk_size(size_field)
-		chunk = file.read(size)
-		self.report_position(file.tell())
-		class_ = self.get_class(identifier)
-		return class_(identifier + size_field + chunk)
-
-	def parse_cmpr_list(self, buffer):
-		obj = model.RiffCmprList(buffer)
-		import StringIO, zlib
-		compressedsize = dword2py_int(buffer[12:16])
-
-		decomp = zlib.decompressobj()
-		uncompresseddata = decomp.decompress(buffer[36:])
-
-		blocksizesdata = zlib.decompress(buffer[36 + compressedsize:])
-		blocksizes = []
-		for i in range(0, len(blocksizesdata), 4):
-			blocksizes.append(dword2py_int(blocksizesdata[i:i + 4]))
-
-		stream = StringIO.StringIO(uncompresseddata)
-		self.stream_decompr_size = len(uncompresseddata)
-		while stream.tell() < len(uncompresseddata):
-			ret = self.parse_comressed_stream(stream, blocksizes)
-			obj.childs.append(ret)
-
-		return obj
-
-	def parse_comressed_stream(self, stream, blocksizes):
-		identifier = stream.read(4)
-		if identifier == 'LIST':
-			return self.parse_compressed_list(stream, identifier, blocksizes)
-		else:
-			return self.parse_compressed_object(stream, identifier, blocksizes)
-
-	def parse_compressed_list(self, stream, identifier, blocksizes):
-		rawsize = dword2py_int(stream.read(4))
-		list_identifier = stream.read(4)
-		size = blocksizes[rawsize]
-
-		size_field = py_int2dword(size)
-		if size & 1:size += 1
-
-		offset = stream.tell()
-
-		class_ = self.get_class(identifier, list_identifier)
-		obj = class_(identifier + size_field + list_identifier)
-
-		while stream.tell() <= offset + size - 8:
-			ret = self.parse_comressed_stream(stream, blocksizes)
-			if ret is None:
-				stream.seek(offset)
-				chunk = stream.read(size - 4)
-				return model.RiffUnparsedList(identifier + size_field + \
-										list_identifier + chunk)
-			else:
-				obj.childs.append(ret)
-
-		return obj
-
-	def parse_compressed_object(self, stream, identifier, blocksizes):
-		if not identifier[:3].isalnum():
-			return None
-		rawsize = dword2py_int(stream.read(4))
-		size = blocksizes[rawsize]
-		size_field = py_int2dword(size)
-		if size & 1:size += 1
-		chunk = stream.read(size)
-		self.report_stream_position(stream.tell())
-		class_ = self.get_class(identifier)
-		return class_(identifier + size_field + chunk)
-
 
 class CDR_Saver:
 
@@ -220,6 +118,10 @@ class CDR_Saver:
 		pass
 
 	def save(self, presenter, path):
+		model = presenter.model
+		if presenter.loader.is_mapped_file(path):
+			#lazy chunks are mapped from overwritten file
+			model.materialize()
 
 		try:
 			file = open(path, 'wb')
@@ -229,5 +131,6 @@ class CDR_Saver:
 			events.emit(events.MESSAGES, msgconst.ERROR, msg)
 			raise IOError(errtype, msg + '\n' + value, traceback)
 
-		file.write(presenter.model.get_chunk())
+		model.update_size()
+		model.write_chunk(file)
 		file.close()
@@ -17,8 +17,35 @@
 
 from copy import deepcopy
 
+from uc2 import libgeom
 from uc2.formats.pdxf.const import FILL_EVENODD, FILL_SOLID, STROKE_MIDDLE
 from uc2.formats.pdxf import model
+from uc2.formats.plt import model as plt_model
+from uc2.formats.plt.pltconst import PDXF_to_PLT_TRAFO
+from uc2.formats.cdr.utils import parse_layer_names
+
+def get_rect_geometry(obj):
+	"""
+	Returns rectangle [x, y, width, height] and relative corner
+	radiuses of CDR rectangle.
+	"""
+	w, h = obj.rect_size
+	x = y = 0.0
+	if w < 0: x = w;w = -w
+	if h < 0: y = h;h = -h
+	mr = min(w, h) / 2.0
+	r1, r2, r3, r4 = obj.radiuses
+	radiuses = [r1 / mr, r2 / mr, r3 / mr, r4 / mr]
+	return [x, y, w, h], radiuses
+
+def copy_value(value):
+	"""
+	Returns copy of nested lists value. Items which are not lists
+	(numbers, strings) are immutable, so they are not copied.
+	"""
+	if isinstance(value, list):
+		return [copy_value(item) for item in value]
+	return value
 
 class CDR_to_PDXF_Translator:
 
@@ -26,6 +53,17 @@ class CDR_to_PDXF_Translator:
 	parent_stack = []
 	page_counter = 0
 
+	#Interned style values, repr -> list
+	shared_values = {}
+	#Style templates, (fill_id, outl_id) -> interned style
+	styles = {}
+	#Selected layer names, empty set - all layers
+	layers = set()
+
+	#Property records by identifiers, decoded when requested first
+	stroke_records = {}
+	fill_records = {}
+
 	stroke_props = {}
 	fill_props = {}
 	font_props = {}
@@ -34,10 +72,16 @@ class CDR_to_PDXF_Translator:
 		self.pdxf_doc = pdxf_doc
 		self.methods = pdxf_doc.methods
 		self.methods.delete_pages()
+		self.stroke_records = {}
+		self.fill_records = {}
 		self.stroke_props = {}
 		self.fill_props = {}
 		self.font_props = {}
+		self.shared_values = {}
+		self.styles = {}
 		self.parent_stack = []
+		config = cdr_doc.config
+		self.layers = parse_layer_names(config.layers, config.system_encoding)
 
 		self.default_style = [deepcopy(pdxf_doc.config.default_fill),
 				deepcopy(pdxf_doc.config.default_stroke),
@@ -51,28 +95,61 @@ class CDR_to_PDXF_Translator:
 	def set_doc_properties(self, obj):
 		self.methods.set_default_page_size(obj.page_width, obj.page_height)
 
+	def share(self, value):
+		"""
+		Returns interned copy of the list value. Equal values are
+		decoded and stored once, interned values are never passed
+		to model objects directly (see get_style()).
+		"""
+		if not isinstance(value, list):
+			return value
+		key = repr(value)
+		if not self.shared_values.has_key(key):
+			self.shared_values[key] = [self.share(item) for item in value]
+		return self.shared_values[key]
+
 	def add_fill_prop(self, obj):
-		if obj.fill_color:
-			self.fill_props[obj.fill_id] = [FILL_EVENODD, FILL_SOLID, obj.fill_color]
-		else:
-			self.fill_props[obj.fill_id] = []
+		self.fill_records[obj.fill_id] = obj
+		if self.fill_props.has_key(obj.fill_id):
+			#redefined property invalidates decoded styles
+			del self.fill_props[obj.fill_id]
+			self.styles = {}
 
 	def get_fill_prop(self, id):
-		res = []
-		if self.fill_props.has_key(id):
-			res = deepcopy(self.fill_props[id])
-		return res
+		if not self.fill_props.has_key(id):
+			if not self.fill_records.has_key(id):
+				return self.share([])
+			self.fill_props[id] = self.decode_fill_prop(self.fill_records[id])
+		return self.fill_props[id]
+
+	def decode_fill_prop(self, obj):
+		if obj.fill_color:
+			return self.share([FILL_EVENODD, FILL_SOLID, obj.fill_color])
+		return self.share([])
 
 	def add_stroke_prop(self, obj):
+		self.stroke_records[obj.stroke_id] = obj
+		if self.stroke_props.has_key(obj.stroke_id):
+			#redefined property invalidates decoded styles
+			del self.stroke_props[obj.stroke_id]
+			self.styles = {}
+
+	def get_stroke_prop(self, id):
+		if not self.stroke_props.has_key(id):
+			if not self.stroke_records.has_key(id):
+				return self.share([])
+			obj = self.stroke_records[id]
+			self.stroke_props[id] = self.decode_stroke_prop(obj)
+		return self.stroke_props[id]
+
+	def decode_stroke_prop(self, obj):
 		if obj.stroke_spec & 0x01:
-			self.stroke_props[obj.stroke_id] = []
-			return
+			return self.share([])
 		else:
 			color = obj.stroke_color
 
 		if not obj.stroke_color:
-			self.stroke_props[obj.stroke_id] = []
-			return
+			return self.share([])
 
 		if obj.stroke_spec & 0x04:
 			dashes = obj.stroke_dashes
@@ -84,7 +161,7 @@ class CDR_to_PDXF_Translator:
 		else:
 			scalable_flag = 0
 
-		self.stroke_props[obj.stroke_id] = [
+		return self.share([
 					STROKE_MIDDLE,
 					obj.stroke_width,
 					color,
@@ -95,13 +172,32 @@ class CDR_to_PDXF_Translator:
 					self.pdxf_doc.config.default_stroke_behind_flag,
 					scalable_flag,
 					self.pdxf_doc.config.default_stroke_markers
-											]
-
-	def get_stroke_prop(self, id):
-		res = []
-		if self.stroke_props.has_key(id):
-			res = deepcopy(self.stroke_props[id])
-		return res
+											])
+
+	def get_style(self, obj):
+		"""
+		Returns new style list of graphics object. Style is copied
+		from interned one with all nested lists, so the object owns
+		its style and can modify it in place.
+		"""
+		if not obj.style_id is None and obj.fill_id is None and obj.outl_id is None:
+			key = None
+		else:
+			key = (obj.fill_id, obj.outl_id)
+		style = self.styles.get(key)
+		if style is None:
+			if key is None:
+				stroke = self.pdxf_doc.config.default_stroke
+				style = [[], stroke, [], []]
+			else:
+				if obj.fill_id is None:	fill = []
+				else: fill = self.get_fill_prop(obj.fill_id)
+				if obj.outl_id is None:	stroke = []
+				else: stroke = self.get_stroke_prop(obj.outl_id)
+				style = [fill, stroke, [], []]
+			style = self.share(style)
+			self.styles[key] = style
+		return copy_value(style)
 
 	def add_font_prop(self, obj):
 		self.font_props[obj.font_id] = obj.font_name
@@ -124,11 +220,14 @@ class CDR_to_PDXF_Translator:
 		self.parent_stack = self.parent_stack[:-1]
 
 	def start_layer(self, obj):
+		if self.layers and not obj.layer_name.strip() in self.layers:
+			return False
 		page = self.parent_stack[-1]
 		layer_name = ''
 		if obj.layer_name: layer_name = str(obj.layer_name)
 		layer = self.methods.add_layer(page, layer_name)
 		self.parent_stack.append(layer)
+		return True
 
 	def close_layer(self):
 		self.parent_stack = self.parent_stack[:-1]
@@ -151,14 +250,7 @@ class CDR_to_PDXF_Translator:
 		parent = self.parent_stack[-1]
 		paths = deepcopy(obj.paths)
 		trafo = deepcopy(obj.trafo)
-		if not obj.style_id is None and obj.fill_id is None and obj.outl_id is None:
-			style = [[], deepcopy(config.default_stroke), [], []]
-		else:
-			if obj.fill_id is None:	fill = []
-			else: fill = self.get_fill_prop(obj.fill_id)
-			if obj.outl_id is None:	stroke = []
-			else: stroke = self.get_stroke_prop(obj.outl_id)
-			style = [fill, stroke, [], []]
+		style = self.get_style(obj)
 		curve = model.Curve(config, parent, paths, trafo, style)
 		self.methods.append_object(curve, parent)
 
@@ -166,28 +258,105 @@ class CDR_to_PDXF_Translator:
 		config = self.pdxf_doc.config
 		parent = self.parent_stack[-1]
 
-		w, h = obj.rect_size
-		x = y = 0.0
-		if w < 0: x = w;w = -w
-		if h < 0: y = h;h = -h
-		mr = min(w, h) / 2.0
-		r1, r2, r3, r4 = obj.radiuses
-		radiuses = [r1 / mr, r2 / mr, r3 / mr, r4 / mr]
-
+		rect, radiuses = get_rect_geometry(obj)
 		trafo = deepcopy(obj.trafo)
-		if not obj.style_id is None and obj.fill_id is None and obj.outl_id is None:
-			style = [[], deepcopy(config.default_stroke), [], []]
-		else:
-			if obj.fill_id is None:	fill = []
-			else: fill = self.get_fill_prop(obj.fill_id)
-			if obj.outl_id is None:	stroke = []
-			else: stroke = self.get_stroke_prop(obj.outl_id)
-			style = [fill, stroke, [], []]
+		style = self.get_style(obj)
 
-		rect = model.Rectangle(config, parent, [x, y, w, h], trafo, style, radiuses)
+		rect = model.Rectangle(config, parent, rect, trafo, style, radiuses)
 		self.methods.append_object(rect, parent)
 
 	def create_ellipse(self, obj):pass
 	def create_polygon(self, obj):pass
 	def create_image(self, obj):pass
 	def create_text(self, obj):pass
+
+
+class CDR_to_PLT_Translator:
+	"""
+	Translates CDR document into PLT cutting jobs directly, without
+	intermediate PDXF model. Curve and rectangle geometry is transformed
+	and flattened in PLT coordinates on the fly. Like PDXF_to_PLT_Translator
+	applied to translated PDXF document, only the first page of the
+	PDXF document (i.e. the last translated CDR page) is processed.
+	"""
+
+	plt_doc = None
+	paths = []
+	page_counter = 0
+	trafo = []
+	tolerance = 0.5
+	#Selected layer names, empty set - all layers
+	layers = set()
+
+	def translate(self, cdr_doc, plt_doc):
+		self.plt_doc = plt_doc
+		self.paths = []
+		self.page_counter = 0
+		self.trafo = [] + PDXF_to_PLT_TRAFO
+		self.tolerance = plt_doc.config.tolerance
+		config = cdr_doc.config
+		self.layers = parse_layer_names(config.layers, config.system_encoding)
+
+		cdr_doc.model.translate(self)
+
+		self.create_jobs()
+		plt_doc.model.do_update()
+
+	def create_jobs(self):
+		jobs = self.plt_doc.get_jobs()
+		dx = dy = 0.0
+		if self.plt_doc.config.force_zero and self.paths:
+			points = []
+			for path in self.paths:
+				points.append(path[0])
+				points += path[1]
+			dx = -min([point[0] for point in points])
+			dy = -min([point[1] for point in points])
+		for path in self.paths:
+			if dx or dy:
+				path = [[path[0][0] + dx, path[0][1] + dy],
+					[[x + dx, y + dy] for x, y in path[1]], path[2]]
+			jobs.append(plt_model.PltJob('', path))
+
+	def add_paths(self, paths, trafo):
+		trafo = libgeom.multiply_trafo(trafo, self.trafo)
+		paths = libgeom.apply_trafo_to_paths(paths, trafo)
+		for path in libgeom.flat_paths(paths, self.tolerance):
+			if path and path[1]:
+				self.paths.append(path)
+
+	def set_doc_properties(self, obj):pass
+	def add_fill_prop(self, obj):pass
+	def add_stroke_prop(self, obj):pass
+	def add_font_prop(self, obj):pass
+
+	def start_page(self, obj):
+		self.page_counter += 1
+		if self.page_counter == 1:
+			return False
+		self.paths = []
+		return True
+
+	def close_page(self):pass
+
+	def start_layer(self, obj):
+		if self.layers and not obj.layer_name.strip() in self.layers:
+			return False
+		return True
+
+	def close_layer(self):pass
+	def start_group(self):pass
+	def close_group(self):pass
+
+	def create_curve(self, obj):
+		self.add_paths(obj.paths, obj.trafo)
+
+	def create_rectangle(self, obj):
+		rect, radiuses = get_rect_geometry(obj)
+		paths = libgeom.get_rect_path(rect[:2], rect[2], rect[3], radiuses)
+		self.add_paths(paths, obj.trafo)
+
+	def create_ellipse(self, obj):pass
+	def create_polygon(self, obj):pass
+	def create_image(self, obj):pass
+	def create_text(self, obj):pass
@@ -15,17 +15,15 @@
 #	You should have received a copy of the GNU General Public License
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import sys
 import math
-from copy import deepcopy
 
 from uc2.formats.riff.model import RiffList, RiffObject
 from uc2.formats.riff.utils import dword2py_int, long2py_float, word2py_int
 from uc2.formats.cdr.const import CDR6, CDR7, CDR8, CDR9, CDR12, CDR13
 from uc2.formats.cdr import const
-from uc2.formats.pdxf.const import NODE_CUSP, NODE_SMOOTH, NODE_SYMMETRICAL, \
-									CURVE_CLOSED, CURVE_OPENED
 from uc2.formats.cdr.utils import parse_matrix, parse_size_value, \
-							parse_cdr_color
+							parse_cdr_color, parse_curve_points
 
 
 
@@ -37,25 +35,15 @@ CDR_IMAGE = 5
 CDR_POLYGON = 0x14
 
 
-def find_chunk(chunks, chunk_tag):
-	"""
-	Finds chunk in chunk list by chunk tag.
-	Returns first occurrence.
-	"""
-	for chunk in chunks:
-		if chunk.chunk_tag == chunk_tag:
-			return chunk
-	return False
-
 def parse_trafo(obj):
 	"""
 	Finds <trfd> chunk, parses trafo value and stores the value
 	in object trafo field. 
 	"""
 	#Finds <loda> and <trfd> chunks 
-	lgob_chunk = find_chunk(obj.childs, 'lgob')
-	trfl_chunk = find_chunk(lgob_chunk.childs, 'trfl')
-	obj.trfd = find_chunk(trfl_chunk.childs, 'trfd')
+	lgob_chunk = obj.find('lgob')
+	trfl_chunk = lgob_chunk.find('trfl')
+	obj.trfd = trfl_chunk.find('trfd')
 
 	data = obj.loda.chunk
 
@@ -133,64 +121,13 @@ def parse_curve(obj):
 		if item[0] == const.DATA_COORDS:
 			offset = item[1] + 8
 
-	obj.paths = []
-	path = []
-	points = []
-	point1 = []
-	point2 = []
-
 	pointnum = dword2py_int(data[offset:offset + 4])
 	obj.num_of_points = pointnum
 	obj.loda.cache_fields.append((offset, 4, 'num of points'))
 	obj.loda.cache_fields.append((offset + 4, 8 * pointnum, 'curve points'))
 	obj.loda.cache_fields.append((offset + 4 + pointnum * 8, pointnum, 'point flags'))
 
-	for i in range (pointnum):
-		x = parse_size_value(data[offset + 4 + i * 8:offset + 8 + i * 8])
-		y = parse_size_value(data[offset + 8 + i * 8:offset + 12 + i * 8])
-
-		point_type = ord(data[offset + 4 + pointnum * 8 + i])
-		if point_type & 0x10 == 0 and point_type & 0x20 == 0:
-			marker = NODE_CUSP
-		if point_type & 0x10 == 0x10:
-			marker = NODE_SMOOTH
-		if point_type & 0x20 == 0x20:
-			marker = NODE_SYMMETRICAL
-
-		if point_type & 0x40 == 0 and point_type & 0x80 == 0:
-			if path:
-				path.append(deepcopy(points))
-				path.append(CURVE_OPENED)
-				obj.paths.append(deepcopy(path))
-			path = []
-			points = []
-			point1 = []
-			point2 = []
-			path.append([x, y])
-		if point_type & 0x40 == 0x40 and point_type & 0x80 == 0:
-			points.append([x, y])
-			point1 = []
-			point2 = []
-		if point_type & 0x40 == 0 and point_type & 0x80 == 0x80:
-			points.append(deepcopy([point1, point2, [x, y], marker]))
-			point1 = []
-			point2 = []
-		if point_type & 0x40 == 0x40 and point_type & 0x80 == 0x80:
-			if point1:
-				point2 = [x, y]
-			else:
-				point1 = [x, y]
-		if point_type & 8 == 8:
-			if path and points:
-				path.append(deepcopy(points))
-				path.append(CURVE_CLOSED)
-				obj.paths.append(deepcopy(path))
-				path = []
-				points = []
-	if path:
-		path.append(deepcopy(points))
-		path.append(CURVE_OPENED)
-		obj.paths.append(deepcopy(path))
+	obj.paths = parse_curve_points(data, offset + 4, pointnum)
 
 def parse_text(obj):pass
 def parse_image(obj):pass
@@ -214,9 +151,9 @@ class CdrGraphObj(RiffList):
 
 	def update(self):
 		#Finds <loda> and <trfd> chunks 
-		lgob_chunk = find_chunk(self.childs, 'lgob')
-		trfl_chunk = find_chunk(lgob_chunk.childs, 'trfl')
-		self.trfd = find_chunk(trfl_chunk.childs, 'trfd')
+		lgob_chunk = self.find('lgob')
+		trfl_chunk = lgob_chunk.find('trfl')
+		self.trfd = trfl_chunk.find('trfd')
 
 		data = self.loda.chunk
 
@@ -358,64 +295,13 @@ class CdrCurve(CdrGraphObj):
 			if item[0] == const.DATA_COORDS:
 				offset = item[1] + 8
 
-		self.paths = []
-		path = []
-		points = []
-		point1 = []
-		point2 = []
-
 		pointnum = dword2py_int(data[offset:offset + 4])
 		self.num_of_points = pointnum
 		self.loda.cache_fields.append((offset, 4, 'num of points'))
 		self.loda.cache_fields.append((offset + 4, 8 * pointnum, 'curve points'))
 		self.loda.cache_fields.append((offset + 4 + pointnum * 8, pointnum, 'point flags'))
 
-		for i in range (pointnum):
-			x = parse_size_value(data[offset + 4 + i * 8:offset + 8 + i * 8])
-			y = parse_size_value(data[offset + 8 + i * 8:offset + 12 + i * 8])
-
-			point_type = ord(data[offset + 4 + pointnum * 8 + i])
-			if point_type & 0x10 == 0 and point_type & 0x20 == 0:
-				marker = NODE_CUSP
-			if point_type & 0x10 == 0x10:
-				marker = NODE_SMOOTH
-			if point_type & 0x20 == 0x20:
-				marker = NODE_SYMMETRICAL
-
-			if point_type & 0x40 == 0 and point_type & 0x80 == 0:
-				if path:
-					path.append(deepcopy(points))
-					path.append(CURVE_OPENED)
-					self.paths.append(deepcopy(path))
-				path = []
-				points = []
-				point1 = []
-				point2 = []
-				path.append([x, y])
-			if point_type & 0x40 == 0x40 and point_type & 0x80 == 0:
-				points.append([x, y])
-				point1 = []
-				point2 = []
-			if point_type & 0x40 == 0 and point_type & 0x80 == 0x80:
-				points.append(deepcopy([point1, point2, [x, y], marker]))
-				point1 = []
-				point2 = []
-			if point_type & 0x40 == 0x40 and point_type & 0x80 == 0x80:
-				if point1:
-					point2 = [x, y]
-				else:
-					point1 = [x, y]
-			if point_type & 8 == 8:
-				if path and points:
-					path.append(deepcopy(points))
-					path.append(CURVE_CLOSED)
-					self.paths.append(deepcopy(path))
-					path = []
-					points = []
-		if path:
-			path.append(deepcopy(points))
-			path.append(CURVE_OPENED)
-			self.paths.append(deepcopy(path))
+		self.paths = parse_curve_points(data, offset + 4, pointnum)
 
 	def translate(self, translator):
 		translator.create_curve(self)
@@ -477,17 +363,63 @@ obj_parse = {
 		CDR_POLYGON: (parse_polygon, 'Polygon'),
 		}
 
-class CdrUniObject(RiffList):
+class LazyDecodeMixin:
+	"""
+	Decodes fields listed in lazy_fields by decode() method on first
+	access to any of them. Decoded fields are removed by clear_fields().
+	"""
+	lazy_fields = ()
+	decoded = False
+	decoding = False
+
+	def __getattr__(self, name):
+		if name in self.lazy_fields and not self.decoded and \
+		not self.decoding:
+			#AttributeError raised while decoding is reported as error,
+			#otherwise it looks like missing attribute for hasattr()
+			self.decoding = True
+			try:
+				self.decode()
+			except:
+				errtype, value, trace = sys.exc_info()
+				self.clear_fields()
+				if issubclass(errtype, AttributeError):
+					msg = 'Cannot decode %s: %s' % \
+						(self.__class__.__name__, value)
+					raise RuntimeError, msg, trace
+				raise errtype, value, trace
+			finally:
+				self.decoding = False
+			self.decoded = True
+			return getattr(self, name)
+		raise AttributeError(name)
+
+	def clear_fields(self):
+		"""
+		Removes decoded fields, so they are decoded on next access.
+		"""
+		for name in self.lazy_fields:
+			if self.__dict__.has_key(name):
+				del self.__dict__[name]
+		self.decoded = False
+
+	def decode(self):pass
+
+#Fields of CdrUniObject decoded from <loda> and <trfd> chunks on demand
+LAZY_FIELDS = ('trfd', 'trafo', 'style_id', 'fill_id', 'outl_id',
+			'paths', 'num_of_points', 'rect_size', 'radiuses',
+			'ellipse_size', 'ellipse_angles', 'plg_num')
+
+class CdrUniObject(LazyDecodeMixin, RiffList):
 	"""
 	The class represents universal CDR object.
 	This is an universal graphics object representation and on model update 
-	object specific fields will be created.
+	object type is detected. Object specific fields are decoded on first
+	access, so untouched objects are never decoded.
 	"""
-	trfd = None
+	lazy_fields = LAZY_FIELDS
 	loda = None
-	style_id = None
-	fill_id = None
-	outl_id = None
+	obj_type = None
 
 	def __init__(self, chunk):
 		RiffList.__init__(self, chunk)
@@ -500,12 +432,21 @@ class CdrUniObject(RiffList):
 
 	def do_update(self, presenter):
 		RiffList.do_update(self, presenter)
+		self.clear_fields()
 		self.obj_type = None
 
-		lgob_chunk = find_chunk(self.childs, 'lgob')
-		self.loda = find_chunk(lgob_chunk.childs, 'loda')
+		lgob_chunk = self.find('lgob')
+		self.loda = lgob_chunk.find('loda')
 		self.obj_type = dword2py_int(self.loda.chunk[0x18:0x1c])
 
+	def decode(self):
+		"""
+		Decodes trafo, style identifiers and geometry of the object.
+		"""
+		self.trfd = None
+		self.style_id = None
+		self.fill_id = None
+		self.outl_id = None
 		if not self.obj_type is None and obj_parse.has_key(self.obj_type):
 			parse_trafo(self)
 			obj_parse[self.obj_type][0](self)
@@ -545,7 +486,7 @@ class CdrPage(RiffList):
 
 	def translate(self, translator):
 		if translator.start_page(self):
-			gobj_chunk = find_chunk(self.childs, 'gobj')
+			gobj_chunk = self.find('gobj')
 			layers = [] + gobj_chunk.childs
 			layers.reverse()
 			for layer in layers:
@@ -571,8 +512,8 @@ class CdrLayer(RiffList):
 
 	def update(self):
 		#Finds <loda> chunk
-		lgob_chunk = find_chunk(self.childs, 'lgob')
-		self.loda = find_chunk(lgob_chunk.childs, 'loda')
+		lgob_chunk = self.find('lgob')
+		self.loda = lgob_chunk.find('loda')
 
 		for item in self.loda.data_list:
 			if item[0] == const.DATA_NAME:
@@ -590,12 +531,12 @@ class CdrLayer(RiffList):
 			self.layer_name = ''
 
 	def translate(self, translator):
-		translator.start_layer(self)
-		objs = [] + self.childs
-		objs.reverse()
-		for obj in objs:
-			obj.translate(translator)
-		translator.close_layer()
+		if translator.start_layer(self):
+			objs = [] + self.childs
+			objs.reverse()
+			for obj in objs:
+				obj.translate(translator)
+			translator.close_layer()
 
 
 class CdrGroup(RiffList):
@@ -629,7 +570,7 @@ class CdrDocList(RiffList):
 		RiffList.__init__(self, chunk)
 
 	def update(self):
-		mcfg = find_chunk(self.childs, 'mcfg')
+		mcfg = self.find('mcfg')
 		data = mcfg.chunk
 		offset = 12
 		if self.version == CDR7: offset = 8
@@ -662,8 +603,8 @@ class CdrObject(RiffList):
 	def do_update(self, presenter):
 		type = None
 
-		lgob_chunk = find_chunk(self.childs, 'lgob')
-		loda_chunk = find_chunk(lgob_chunk.childs, 'loda')
+		lgob_chunk = self.find('lgob')
+		loda_chunk = lgob_chunk.find('loda')
 		type = dword2py_int(loda_chunk.chunk[0x18:0x1c])
 
 		if not type is None and obj_dict.has_key(type):
@@ -676,6 +617,7 @@ class CdrObject(RiffList):
 			index = self.parent.childs.index(self)
 			self.parent.childs.insert(index, new_obj)
 			self.parent.childs.remove(self)
+			self.parent.invalidate_index()
 			new_obj.do_update(presenter)
 		else:
 			RiffList.do_update(self, presenter)
@@ -737,23 +679,47 @@ class CdrFontProperty(RiffObject):
 	def translate(self, translator):
 		translator.add_font_prop(self)
 
-class CdrFillProperty(RiffObject):
+class CdrLazyProperty(LazyDecodeMixin, RiffObject):
+	"""
+	The class represents CDR property record. Property identifier is
+	decoded on model update, other fields (listed in lazy_fields) are
+	decoded on first access, so unused records are never decoded.
+	"""
+	#Decoded colors cache of the loader, see parse_cdr_color()
+	color_cache = None
+
+	def __init__(self, chunk):
+		RiffObject.__init__(self, chunk)
+
+	def do_update(self, presenter):
+		self.color_cache = presenter.loader.color_cache
+		RiffObject.do_update(self, presenter)
+
+	def update(self):
+		self.clear_fields()
+		self.update_id()
+
+	def update_id(self):pass
+
+class CdrFillProperty(CdrLazyProperty):
 	"""
 	The class represents CDR fill property.
 	This is a record about used fill color/pattern with object identifier.
 	"""
+	lazy_fields = ('fill_type', 'color_space_type', 'fill_color')
 
 	def __init__(self, chunk):
-		RiffObject.__init__(self, chunk)
+		CdrLazyProperty.__init__(self, chunk)
 
 	def resolve(self):
 		name = 'FillProperty'
 		return (True, name, str(self.chunk_size))
 
-	def update(self):
+	def update_id(self):
 		self.fill_id = str(self.chunk[8:12].encode('hex'))
 		self.cache_fields.append((8, 4, 'fill id'))
 
+	def decode(self):
 		offset = 12
 		if self.version == CDR13: offset += 8
 		self.fill_type = ord(self.chunk[offset])
@@ -772,7 +738,8 @@ class CdrFillProperty(RiffObject):
 		offset = 24
 		if self.version == CDR13: offset = 43
 
-		self.fill_color = parse_cdr_color(self.color_space_type, self.chunk[offset:offset + 4])
+		self.fill_color = parse_cdr_color(self.color_space_type,
+						self.chunk[offset:offset + 4], self.color_cache)
 		if self.fill_color:
 			self.cache_fields.append((offset, 4, 'color value'))
 
@@ -780,24 +747,26 @@ class CdrFillProperty(RiffObject):
 		translator.add_fill_prop(self)
 
 
-class CdrOutlineProperty(RiffObject):
+class CdrOutlineProperty(CdrLazyProperty):
 	"""
 	The class represents CDR outline property.
 	This is a record about used outline pattern with object identifier.
 	"""
-	stroke_dashes = []
+	lazy_fields = ('stroke_spec', 'stroke_caps', 'stroke_join', 'stroke_width',
+				'stroke_dashes', 'color_space_type', 'stroke_color')
 
 	def __init__(self, chunk):
-		RiffObject.__init__(self, chunk)
+		CdrLazyProperty.__init__(self, chunk)
 
 	def resolve(self):
 		name = 'OutlineProperty'
 		return (True, name, str(self.chunk_size))
 
-	def update(self):
+	def update_id(self):
 		self.stroke_id = str(self.chunk[8:12].encode('hex'))
 		self.cache_fields.append((8, 4, 'outline id'))
 
+	def decode(self):
 		data = self.chunk[8:]
 
 		ls_offset = 4
@@ -830,6 +799,7 @@ class CdrOutlineProperty(RiffObject):
 		dashnum = word2py_int(data[dash_offset:dash_offset + 2])
 		self.cache_fields.append((dash_offset + 8, 2, 'number of dash records'))
 
+		self.stroke_dashes = []
 		if dashnum > 0:
 			self.stroke_dashes = range(dashnum)
 			for i in self.stroke_dashes:
@@ -842,7 +812,8 @@ class CdrOutlineProperty(RiffObject):
 		self.cache_fields.append((offset + 8, 1, 'color space type'))
 
 		offset += 16
-		self.stroke_color = parse_cdr_color(self.color_space_type, self.chunk[offset:offset + 4])
+		self.stroke_color = parse_cdr_color(self.color_space_type,
+						self.chunk[offset:offset + 4], self.color_cache)
 		if self.stroke_color:
 			self.cache_fields.append((offset, 4, 'color value'))
 
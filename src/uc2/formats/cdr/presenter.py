@@ -23,6 +23,7 @@ from uc2.formats.cdr.cdr_config import CDR_Config
 from uc2.formats.riff import model
 from uc2.formats.cdr.cdr_filters import CDR_Loader, CDR_Saver
 from uc2.formats.cdr.cdr_translators import CDR_to_PDXF_Translator
+from uc2.formats.cdr.cdr_translators import CDR_to_PLT_Translator
 
 class CDR_Presenter(BinaryModelPresenter):
 
@@ -58,3 +59,9 @@ class CDR_Presenter(BinaryModelPresenter):
 		events.emit(events.FILTER_INFO, msg, 0.95)
 		translator = CDR_to_PDXF_Translator()
 		translator.translate(self, pdxf_doc)
+
+	def traslate_to_plt(self, plt_doc):
+		msg = _('Translation is under process...')
+		events.emit(events.FILTER_INFO, msg, 0.95)
+		translator = CDR_to_PLT_Translator()
+		translator.translate(self, plt_doc)
@@ -15,9 +15,12 @@
 #	You should have received a copy of the GNU General Public License
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import struct
 from colorsys import yiq_to_rgb, hls_to_rgb, hsv_to_rgb
 
 from uc2 import uc2const
+from uc2.formats.pdxf.const import NODE_CUSP, NODE_SMOOTH, NODE_SYMMETRICAL, \
+									CURVE_CLOSED, CURVE_OPENED
 from uc2.formats.riff.utils import double2py_float, word2py_int, long2py_float
 from uc2.formats.cdr.const import cdrunit_to_pt, \
 								CDR_COLOR_CMYK, CDR_COLOR_BGR, CDR_COLOR_CMY, \
@@ -129,7 +132,42 @@ def parse_reg_color(data=''):
 	"""
 	return [uc2const.COLOR_SPOT, [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0, 1.0] ], 1.0, 'Registration color']
 
-def parse_cdr_color(color_space, color_bytes):
+COLOR_CACHE_SIZE = 10000
+
+def parse_cdr_color(color_space, color_bytes, cache=None):
+	"""
+	Parses color type and returns according color value.
+	If cache dictionary is provided, decoded colors are stored in it
+	as tuples, returned color value is a new list anyway.
+	"""
+	if cache is None:
+		return decode_cdr_color(color_space, color_bytes)
+	key = (color_space, color_bytes)
+	value = cache.get(key)
+	if value is None:
+		if len(cache) >= COLOR_CACHE_SIZE:
+			cache.clear()
+		value = freeze_color(decode_cdr_color(color_space, color_bytes))
+		cache[key] = value
+	return thaw_color(value)
+
+def freeze_color(color):
+	"""
+	Converts color value into nested tuples.
+	"""
+	if isinstance(color, list):
+		return tuple([freeze_color(item) for item in color])
+	return color
+
+def thaw_color(color):
+	"""
+	Converts nested tuples into new color value lists.
+	"""
+	if isinstance(color, tuple):
+		return [thaw_color(item) for item in color]
+	return color
+
+def decode_cdr_color(color_space, color_bytes):
 	"""
 	Parses color type and returns according color value.
 	"""
@@ -161,3 +199,101 @@ def parse_size_value(data):
 	Convert 4-bytes string to value in points.
 	"""
 	return long2py_float(data) * cdrunit_to_pt
+
+def parse_curve_points(data, offset, pointnum):
+	"""
+	Parses curve points block: pointnum coordinate pairs followed by
+	pointnum point flags. Whole block is unpacked at once.
+	Returns list of paths.
+	"""
+	flags_offset = offset + 8 * pointnum
+	coords = struct.unpack('<%dl' % (2 * pointnum), data[offset:flags_offset])
+	flags = bytearray(data[flags_offset:flags_offset + pointnum])
+	if len(flags) < pointnum:
+		raise ValueError('curve point flags are truncated')
+	coords = [item * cdrunit_to_pt for item in coords]
+
+	paths = []
+	path = []
+	points = []
+	point1 = []
+	point2 = []
+	i = 0
+	for point_type in flags:
+		point = [coords[i], coords[i + 1]]
+		i += 2
+
+		if point_type & 0x20:
+			marker = NODE_SYMMETRICAL
+		elif point_type & 0x10:
+			marker = NODE_SMOOTH
+		else:
+			marker = NODE_CUSP
+
+		node_type = point_type & 0xc0
+		if not node_type:
+			if path:
+				path.append(points)
+				path.append(CURVE_OPENED)
+				paths.append(path)
+			path = [point, ]
+			points = []
+			point1 = []
+			point2 = []
+		elif node_type == 0x40:
+			points.append(point)
+			point1 = []
+			point2 = []
+		elif node_type == 0x80:
+			points.append([point1, point2, point, marker])
+			point1 = []
+			point2 = []
+		elif point1:
+			point2 = point
+		else:
+			point1 = point
+
+		if point_type & 8 and path and points:
+			path.append(points)
+			path.append(CURVE_CLOSED)
+			paths.append(path)
+			path = []
+			points = []
+	if path:
+		path.append(points)
+		path.append(CURVE_OPENED)
+		paths.append(path)
+	return paths
+
+def parse_page_numbers(value):
+	"""
+	Parses pages selection provided as a list of page numbers or
+	as '1,3-5' like string. Returns set of page numbers.
+	"""
+	if not isinstance(value, basestring):
+		return set([int(item) for item in value])
+	result = set()
+	for item in value.split(','):
+		item = item.strip()
+		if not item: continue
+		if '-' in item:
+			start, end = item.split('-', 1)
+			result.update(range(int(start), int(end) + 1))
+		else:
+			result.add(int(item))
+	return result
+
+def parse_layer_names(value, encoding='utf-8'):
+	"""
+	Parses layers selection provided as a list of layer names or
+	as comma separated string. Returns set of unicode layer names.
+	"""
+	if isinstance(value, basestring):
+		value = value.split(',')
+	result = set()
+	for item in value:
+		if isinstance(item, str):
+			item = item.decode(encoding, 'replace')
+		item = item.strip()
+		if item: result.add(item)
+	return result
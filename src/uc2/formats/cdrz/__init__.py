@@ -19,6 +19,7 @@ import sys
 import zipfile
 
 from uc2 import events, msgconst
+from uc2.formats.generic import ZIP_SIGNATURE, get_file_header
 from uc2.formats.cdrz.presenter import CDRZ_Presenter
 from uc2.formats.cdrz import const
 from uc2.formats.pdxf.presenter import PDXF_Presenter
@@ -39,11 +40,17 @@ def cdrz_saver(cdr_doc, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
 	cdr_doc.save(filename)
 
-def check_cdrz(path):
-
+def sniff_cdrz(header, path=''):
+	"""
+	Detects CDRZ file by file header and archive members list.
+	"""
+	if not header[:4] == ZIP_SIGNATURE or not path: return False
 	if not zipfile.is_zipfile(path):return False
 
 	cdrz_file = zipfile.ZipFile(path, 'r')
 	fl = cdrz_file.namelist()
 	if not 'content/riffData.cdr' in fl: return False
 	return True
+
+def check_cdrz(path):
+	return sniff_cdrz(get_file_header(path, 4), path)
@@ -33,15 +33,16 @@ LOADER_FORMATS = SIMPLE_LOADERS + MODEL_LOADERS
 
 SAVER_FORMATS = SIMPLE_SAVERS + MODEL_SAVERS
 
-from uc2.formats.pdxf import pdxf_loader, pdxf_saver, check_pdxf
-from uc2.formats.plt import plt_loader, plt_saver, check_plt
-from uc2.formats.sk1 import sk1_loader, sk1_saver, check_sk1
+from uc2.formats.pdxf import pdxf_loader, pdxf_saver, check_pdxf, sniff_pdxf
+from uc2.formats.plt import plt_loader, plt_saver, check_plt, sniff_plt
+from uc2.formats.sk1 import sk1_loader, sk1_saver, check_sk1, sniff_sk1
 from uc2.formats.sk import SK_Loader, SK_Saver
-from uc2.formats.wmf import wmf_loader, wmf_saver, check_wmf
+from uc2.formats.wmf import wmf_loader, wmf_saver, check_wmf, sniff_wmf
 
-from uc2.formats.cdr import cdr_loader, cdr_saver, check_cdr
-from uc2.formats.cdrz import cdrz_loader, check_cdrz
-from uc2.formats.riff import riff_loader, riff_saver, check_riff
+from uc2.formats.cdr import cdr_loader, cdr_saver, check_cdr, sniff_cdr, \
+							cdr_to_plt
+from uc2.formats.cdrz import cdrz_loader, check_cdrz, sniff_cdrz
+from uc2.formats.riff import riff_loader, riff_saver, check_riff, sniff_riff
 
 
 LOADERS = {
@@ -77,3 +78,15 @@ PLT : check_plt, HPGL : None, DXF : None, DWG : None,
 RIFF: check_riff,
 }
 
+#Format detection functions over shared file header,
+#sniffer(header, path) -> bool
+SNIFFERS = {
+PDXF : sniff_pdxf, SK1 : sniff_sk1,
+CDR : sniff_cdr, CDT : sniff_cdr, CDRZ : sniff_cdrz, CDTZ : sniff_cdrz,
+WMF : sniff_wmf, PLT : sniff_plt, RIFF: sniff_riff,
+}
+
+#Translators bypassing intermediate PDXF model, (loader, saver) -> translator
+DIRECT_TRANSLATORS = {
+(cdr_loader, plt_saver) : cdr_to_plt,
+}
@@ -17,11 +17,57 @@
 
 import sys
 import os
+import zlib
+import struct
 
 from uc2 import _, uc2const
 from uc2 import events, msgconst
 from uc2.utils import fs
 
+#Size of file header used for file format detection
+HEADER_SIZE = 4096
+ZIP_SIGNATURE = 'PK\x03\x04'
+
+def get_file_header(path, size=HEADER_SIZE):
+	"""
+	Reads first bytes of the file for file format detection.
+	"""
+	try:
+		file = open(path, 'rb')
+	except:
+		errtype, value, traceback = sys.exc_info()
+		msg = _('Cannot open %s file for reading') % (path)
+		events.emit(events.MESSAGES, msgconst.ERROR, msg)
+		raise IOError(errtype, msg + '\n' + str(value), traceback)
+	header = file.read(size)
+	file.close()
+	return header
+
+def get_first_zip_member(header):
+	"""
+	Returns (name, content) pair of the first zip archive member
+	if the member is wholly in file header, otherwise None.
+	"""
+	if not header[:4] == ZIP_SIGNATURE or len(header) < 30:
+		return None
+	flags, method = struct.unpack('<HH', header[6:10])
+	size, = struct.unpack('<I', header[18:22])
+	name_size, extra_size = struct.unpack('<HH', header[26:30])
+	start = 30 + name_size + extra_size
+	#sizes are in data descriptor after member content
+	if flags & 0x08 or start + size > len(header):
+		return None
+	name = header[30:30 + name_size]
+	content = header[start:start + size]
+	if method == 8:
+		try:
+			content = zlib.decompress(content, -15)
+		except zlib.error:
+			return None
+	elif method:
+		return None
+	return name, content
+
 class ModelObject:
 	"""
 	Abstract parent class for all model 
@@ -18,6 +18,8 @@
 import os
 import zipfile
 
+from uc2.formats.generic import ZIP_SIGNATURE, get_file_header, \
+								get_first_zip_member
 from uc2.formats.pdxf.presenter import PDXF_Presenter
 from uc2.formats.pdxf import const
 from uc2.formats.pdxf import model
@@ -33,7 +35,22 @@ def pdxf_saver(pdxf_doc, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
 	pdxf_doc.save(filename)
 
+def sniff_pdxf(header, path=''):
+	"""
+	Detects PDXF file by file header. Archive members list is read
+	only if mimetype is not the first archive member.
+	"""
+	if not header[:4] == ZIP_SIGNATURE: return False
+	member = get_first_zip_member(header)
+	if not member is None and member[0] == 'mimetype':
+		return member[1] == const.DOC_MIME
+	if not path: return False
+	return check_pdxf_archive(path)
+
 def check_pdxf(path):
+	return sniff_pdxf(get_file_header(path), path)
+
+def check_pdxf_archive(path):
 
 	if not zipfile.is_zipfile(path):return False
 
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides parser of PDXF attribute values. Attribute values
+are Python literals (numbers, quoted strings, None/True/False, lists,
+tuples and dicts of them) and are parsed without code evaluation.
+"""
+
+import re
+import cPickle
+from ast import literal_eval
+
+from uc2.formats.pdxf import model
+
+NUMBER_KIND = 'number'
+STRING_KIND = 'string'
+CONTAINER_KIND = 'container'
+
+TOKEN_RE = re.compile(r'''\s*(?:
+	(?P<float>-?(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|-?\d+[eE][-+]?\d+)|
+	(?P<int>-?(?:0|[1-9]\d*))(?![\w.])|
+	(?P<string>'[^'\\]*'|"[^"\\]*")|
+	(?P<name>None|True|False)(?!\w)|
+	(?P<punct>[][(){},:])
+	)''', re.VERBOSE)
+
+NUMBER_PATTERN = r'-?(?:(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|\d+[eE][-+]?\d+|' + \
+		r'(?:0|[1-9]\d*)(?![\d.eE]))'
+NUMBER_RE = re.compile(NUMBER_PATTERN)
+SINGLE_NUMBER_RE = re.compile(r'\s*(%s)\s*$' % NUMBER_PATTERN)
+NUMBER_LIST_RE = re.compile(r'\s*\[\s*(?:%s\s*(?:,\s*%s\s*)*,?\s*)?\]\s*$' % \
+						(NUMBER_PATTERN, NUMBER_PATTERN))
+
+NAMES = {'None':None, 'True':True, 'False':False}
+CLOSING = {'[':']', '(':')', '{':'}'}
+
+class LiteralError(ValueError): pass
+
+class LiteralParser:
+	"""
+	Recursive descent parser of Python literals. Supports plain strings,
+	ints, floats, None/True/False and containers of them.
+	"""
+
+	def __init__(self, text):
+		self.text = text
+		self.pos = 0
+
+	def parse(self):
+		value = self.parse_value()
+		if self.text[self.pos:].strip():
+			raise LiteralError('unexpected data at %d' % self.pos)
+		return value
+
+	def next_token(self):
+		match = TOKEN_RE.match(self.text, self.pos)
+		if match is None:
+			raise LiteralError('unexpected data at %d' % self.pos)
+		self.pos = match.end()
+		return match.lastgroup, match.group(match.lastgroup)
+
+	def parse_value(self, token=None):
+		kind, token = token or self.next_token()
+		if kind == 'float':
+			return float(token)
+		elif kind == 'int':
+			return int(token)
+		elif kind == 'string':
+			return token[1:-1].encode('utf-8')
+		elif kind == 'name':
+			return NAMES[token]
+		elif token in CLOSING:
+			return self.parse_container(token)
+		raise LiteralError('unexpected %s at %d' % (token, self.pos))
+
+	def parse_container(self, opening):
+		closing = CLOSING[opening]
+		items = []
+		pairs = []
+		is_tuple = False
+		while True:
+			kind, token = self.next_token()
+			if token == closing: break
+			value = self.parse_value((kind, token))
+			if opening == '{':
+				if not self.next_token()[1] == ':':
+					raise LiteralError('colon is expected at %d' % self.pos)
+				pairs.append((value, self.parse_value()))
+			else:
+				items.append(value)
+			token = self.next_token()[1]
+			if token == closing: break
+			if not token == ',':
+				raise LiteralError('comma is expected at %d' % self.pos)
+			is_tuple = True
+		if opening == '[':
+			return items
+		elif opening == '{':
+			return dict(pairs)
+		elif is_tuple or not items:
+			return tuple(items)
+		return items[0]
+
+def parse_literal(text):
+	"""
+	Parses Python literal and returns its value. Rare literals
+	(escaped or prefixed strings, long or octal numbers) are parsed
+	by ast.literal_eval(). Raises ValueError for non-literal expressions.
+	"""
+	try:
+		return LiteralParser(text).parse()
+	except LiteralError:
+		pass
+	try:
+		if isinstance(text, str): text = text.decode('utf-8')
+		return literal_eval(text.strip())
+	except (ValueError, SyntaxError, TypeError, UnicodeError):
+		raise ValueError('Wrong attribute value: %s' % text[:80])
+
+def get_number(token):
+	if '.' in token or 'e' in token or 'E' in token:
+		return float(token)
+	return int(token)
+
+def parse_number(text):
+	"""
+	Parses int or float literal. Returns None for other literals.
+	"""
+	match = SINGLE_NUMBER_RE.match(text)
+	if match is None: return None
+	return get_number(match.group(1))
+
+def parse_number_list(text):
+	"""
+	Parses flat list of numbers. Returns None for other literals.
+	"""
+	if NUMBER_LIST_RE.match(text) is None: return None
+	return [get_number(item) for item in NUMBER_RE.findall(text)]
+
+def get_value_kind(value):
+	if isinstance(value, bool): return None
+	if isinstance(value, (int, long, float)): return NUMBER_KIND
+	if isinstance(value, str): return STRING_KIND
+	if isinstance(value, (list, tuple, dict)): return CONTAINER_KIND
+	return None
+
+SCHEMA = {}
+
+def get_schema():
+	"""
+	Returns {(tag, attribute): kind} dictionary derived from
+	default values of model classes.
+	"""
+	if not SCHEMA:
+		for cid, class_ in model.CID_TO_CLASS.items():
+			if class_ is None: continue
+			tag = model.CID_TO_TAGNAME[cid]
+			for name in dir(class_):
+				if name[:1] == '_': continue
+				kind = get_value_kind(getattr(class_, name))
+				if not kind is None:
+					SCHEMA[(tag, name)] = kind
+	return SCHEMA
+
+class AttributeDecoder:
+	"""
+	Decodes PDXF attribute values using per-(tag, attribute) schema.
+	Container values are cached by literal text as pickled data, so
+	repeated values are rebuilt quickly and objects never share
+	mutable values.
+	"""
+
+	def __init__(self):
+		self.schema = get_schema()
+		self.cache = {}
+
+	def decode(self, tag, attr, text):
+		kind = self.schema.get((tag, attr))
+		if kind == NUMBER_KIND:
+			value = parse_number(text)
+			if not value is None: return value
+		elif kind == STRING_KIND:
+			text = text.strip()
+			if len(text) > 1 and text[0] == text[-1] and text[0] in '\'"' \
+			and not '\\' in text and not text[0] in text[1:-1]:
+				return text[1:-1].encode('utf-8')
+		elif kind == CONTAINER_KIND:
+			value = parse_number_list(text)
+			if not value is None: return value
+		if text in self.cache:
+			return cPickle.loads(self.cache[text])
+		value = parse_literal(text)
+		if isinstance(value, (list, tuple, dict)):
+			self.cache[text] = cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+		return value
@@ -544,12 +544,18 @@ class PrimitiveObject(SelectableObject):
 		self.update_bbox()
 
 	def update_bbox(self):
-		self.cache_bbox = libgeom.get_cpath_bbox(self.cache_cpath)
+		bbox = libgeom.get_paths_bbox(self.cache_paths, self.trafo)
+		if bbox is None: bbox = [0.0, 0.0, 0.0, 0.0]
+		self.cache_bbox = bbox
 
 	def apply_trafo(self, trafo):
 		self.cache_cpath = libgeom.apply_trafo(self.cache_cpath, trafo)
 		self.trafo = libgeom.multiply_trafo(self.trafo, trafo)
-		self.update_bbox()
+		bbox = libgeom.get_transformed_bbox(self.cache_bbox, trafo)
+		if bbox is None:
+			self.update_bbox()
+		else:
+			self.cache_bbox = bbox
 
 	def get_trafo_snapshot(self):
 		return (self, [] + self.trafo, [] + self.cache_bbox,
@@ -25,6 +25,18 @@ class PDXF_Config(XmlConfigParser):
 
 	system_encoding = 'utf-8'
 
+	#============== FILE SECTION ==================
+	#Parse content.xml directly from archive,
+	#resources are extracted on demand
+	stream_loading = True
+	#Deflate level of archive members 0-9, -1 is zlib default level
+	compression_level = -1
+	#Media of listed MIME types is stored without compression
+	store_compressed_media = True
+	compressed_media_types = ['image/png', 'image/jpeg', 'image/gif']
+	#Number of threads compressing archive members, 0 - number of CPUs
+	compression_threads = 0
+
 	#============== DOCUMENT SECTION ==================
 	doc_origin = const.DOC_ORIGIN_LL
 	doc_units = uc2const.UNIT_MM
@@ -17,9 +17,14 @@
 
 import os
 import sys
+import time
+import zlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 
 import zipfile
-from zipfile import ZipFile
+from zipfile import ZipFile, ZipInfo
+from cStringIO import StringIO
 
 import xml.sax
 from xml.sax.xmlreader import InputSource
@@ -30,6 +35,7 @@ from uc2 import events, msgconst, uc2const
 from uc2.formats.pdxf import model
 from uc2.formats.pdxf import const
 from uc2.formats.pdxf import methods
+from uc2.formats.pdxf.literals import AttributeDecoder
 from uc2.formats.generic import GENERIC_TAGS, IDENT
 from uc2.utils import fs
 
@@ -69,12 +75,14 @@ class PDXF_Loader:
 			raise IOError(2, msg)
 
 
-		self._extract_content()
-		self._build_model()
+		if presenter.config.stream_loading:
+			self._stream_content()
+		else:
+			self._extract_content()
+			self._build_model()
 		return self.model
 
-	def _extract_content(self):
-		pdxf_file = ZipFile(self.path, 'r')
+	def _get_filelist(self, pdxf_file):
 		try:
 			fl = pdxf_file.namelist()
 		except:
@@ -92,6 +100,11 @@ class PDXF_Loader:
 			if item == 'mimetype' or item[-1] == '/':
 				continue
 			filelist.append(item)
+		return filelist
+
+	def _extract_content(self):
+		pdxf_file = ZipFile(self.path, 'r')
+		filelist = self._get_filelist(pdxf_file)
 
 		for item in filelist:
 			source = pdxf_file.read(item)
@@ -101,27 +114,46 @@ class PDXF_Loader:
 		msg = _('The file content is extracted successfully')
 		events.emit(events.MESSAGES, msgconst.OK, msg)
 
-	def _build_model(self):
+	def _stream_content(self):
+		fileobj = open(self.path, 'rb')
+		pdxf_file = ZipFile(fileobj, 'r')
+		try:
+			filelist = self._get_filelist(pdxf_file)
+			if not 'content.xml' in filelist:
+				msg = _('The file is corrupted or not PDXF file')
+				events.emit(events.MESSAGES, msgconst.ERROR, msg)
+				raise IOError(2, msg)
+			self.presenter.rm.set_source(self.path, filelist)
+			self._build_model(ContentStream(pdxf_file, fileobj))
+		finally:
+			pdxf_file.close()
+			fileobj.close()
+
+	def _build_model(self, stream=None):
 		content_handler = XMLDocReader(self.presenter)
 		error_handler = ErrorHandler()
 		entity_resolver = EntityResolver()
 		dtd_handler = DTDHandler()
 		try:
-			filename = os.path.join(self.presenter.doc_dir, 'content.xml')
-			handler = open(filename, 'r')
-			lines = float(sum(1 for l in handler))
-			handler.close()
-			self.file_handler = open(filename, "r")
+			if stream is None:
+				filename = os.path.join(self.presenter.doc_dir, 'content.xml')
+				handler = open(filename, 'r')
+				lines = float(sum(1 for l in handler))
+				handler.close()
+				self.file_handler = open(filename, "r")
+				content_handler.lines = lines
+				stream = self.file_handler
 			input_source = InputSource()
-			input_source.setByteStream(self.file_handler)
-			content_handler.lines = lines
+			input_source.setByteStream(stream)
 			xml_reader = xml.sax.make_parser()
 			xml_reader.setContentHandler(content_handler)
 			xml_reader.setErrorHandler(error_handler)
 			xml_reader.setEntityResolver(entity_resolver)
 			xml_reader.setDTDHandler(dtd_handler)
 			xml_reader.parse(input_source)
-			self.file_handler.close()
+			if not self.file_handler is None:
+				self.file_handler.close()
+				self.file_handler = None
 			content_handler.file = None
 		except:
 			errtype, value, traceback = sys.exc_info()
@@ -133,6 +165,34 @@ class PDXF_Loader:
 		msg = _('Content.xml is parsed successfully')
 		events.emit(events.MESSAGES, msgconst.OK, msg)
 
+class ContentStream:
+	"""
+	Read-only stream of content.xml archive member.
+	Parsing progress is reported by compressed bytes consumed.
+	"""
+
+	def __init__(self, pdxf_file, fileobj, name='content.xml'):
+		info = pdxf_file.getinfo(name)
+		self.stream = pdxf_file.open(info)
+		self.fileobj = fileobj
+		self.start = info.header_offset
+		self.size = float(max(info.compress_size, 1))
+		self.position = 0.0
+
+	def read(self, size=-1):
+		#small reads keep progress reporting smooth
+		if size > 0x4000: size = 0x4000
+		data = self.stream.read(size)
+		position = min((self.fileobj.tell() - self.start) / self.size, 1.0)
+		if position - self.position > 0.05:
+			msg = _('Parsing in process...')
+			events.emit(events.FILTER_INFO, msg, position)
+			self.position = position
+		return data
+
+	def close(self):
+		self.stream.close()
+
 class XMLDocReader(handler.ContentHandler):
 
 	def __init__(self, presenter):
@@ -143,6 +203,7 @@ class XMLDocReader(handler.ContentHandler):
 		self.lines = 0
 		self.position = 0
 		self.locator = None
+		self.decoder = AttributeDecoder()
 
 	def setDocumentLocator(self, locator):
 		self.locator = locator
@@ -151,20 +212,19 @@ class XMLDocReader(handler.ContentHandler):
 		if name == 'Content':
 			pass
 		else:
-			position = float(self.locator.getLineNumber()) / self.lines
-			if position - self.position > 0.05:
-				msg = _('Parsing in process...')
-				events.emit(events.FILTER_INFO, msg, position)
-				self.position = position
+			if self.lines:
+				position = float(self.locator.getLineNumber()) / self.lines
+				if position - self.position > 0.05:
+					msg = _('Parsing in process...')
+					events.emit(events.FILTER_INFO, msg, position)
+					self.position = position
 			obj = None
 			cid = model.TAGNAME_TO_CID[name]
 			obj = model.CID_TO_CLASS[cid](self.presenter.config)
 			obj.tag = name
-			for item in attrs._attrs.keys():
-				line = 'self.value=' + attrs._attrs[item]
-				code = compile(line, '<string>', 'exec')
-				exec code
-				obj.__dict__[item] = self.value
+			decode = self.decoder.decode
+			for item, value in attrs._attrs.items():
+				obj.__dict__[item] = decode(name, item, value)
 
 			if self.parent_stack:
 				parent = self.parent_stack[-1]
@@ -199,33 +259,30 @@ class PDXF_Saver:
 	counter = 0
 	obj_num = 0
 	position = 0
+	params_cache = {}
 
 	def __init__(self):
-		pass
+		self.params_cache = {}
 
 	def save(self, presenter, path):
 		self.presenter = presenter
 		self.path = path
 		self.content = []
+		self.ident = 0
+		self.counter = 0
+		self.position = 0
+		presenter.rm.extract_resources()
 		self._save_content()
 		self._write_manifest()
 		self._pack_content()
 
 	def _save_content(self):
-		content_xml = os.path.join(self.presenter.doc_dir, 'content.xml')
-		try:
-			self.file = open(content_xml, 'wb')
-		except:
-			errtype, value, traceback = sys.exc_info()
-			msg = _('Cannot open %s file for writing') % (content_xml)
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
-			raise IOError(errtype, msg + '\n' + value, traceback)
-
+		self.file = StringIO()
 		doc = self.presenter.model
 		self.obj_num = doc.count()
 		self._start()
 		self._write_tree(doc)
-		self._finish()
+		self.content.append((None, 'content.xml', self._finish()))
 
 		msg = _('PDXF file content.xml is created')
 		events.emit(events.MESSAGES, msgconst.OK, msg)
@@ -244,63 +301,60 @@ class PDXF_Saver:
 			self.position = position
 
 		tag = model.CID_TO_TAGNAME[item.cid]
-		params = self._get_params(item)
-		self._open_tag(tag, params, item.childs)
+		indent = self.ident * IDENT
+		params = self._get_params(item, indent)
 		if item.childs:
+			self.file.write('%s<%s %s>\n' % (indent, tag, params))
 			self.ident += 1
 			for child in item.childs:
 				self._write_tree(child)
 			self.ident -= 1
-			self._close_tag(tag)
-
-	def _get_params(self, child):
+			self.file.write('%s</%s>\n' % (indent, tag))
+		else:
+			self.file.write('%s<%s %s />\n' % (indent, tag, params))
+
+	def _get_param_names(self, child, props):
+		"""
+		Returns sorted names of object fields which are saved.
+		Names are cached by object class and fields set.
+		"""
+		key = (child.__class__, tuple(props))
+		names = self.params_cache.get(key)
+		if names is None:
+			names = []
+			for item in sorted(props.keys()):
+				if not item in GENERIC_TAGS and not item[:5] == 'cache':
+					names.append(item)
+			self.params_cache[key] = names
+		return names
+
+	def _get_params(self, child, indent=''):
 		result = []
 		props = child.__dict__
-		items = props.keys()
-		items.sort()
-		for item in GENERIC_TAGS:
-			if item in items:
-				items.remove(item)
-		for item in items:
-			if not item[:5] == 'cache':
-				item_str = props[item].__str__()
-				if isinstance(props[item], str):
-					item_str = "'%s'" % (escape_quote(item_str))
-				result.append((item, encode_quotes(item_str)))
-		return result
-
-	def _open_tag(self, tag, params, len):
-		self.file.write('%s<%s ' % (self.ident * IDENT, tag))
-		for item in params:
-			param, value = item
-			self.file.write('\n%s %s="%s"' % (self.ident * IDENT, param, value))
-		if len:
-			self.file.write('>\n')
-		else:
-			self.file.write(' />\n')
-
-	def _close_tag(self, tag):
-		self.file.write('%s</%s>\n' % (self.ident * IDENT, tag))
+		template = '\n%s %%s="%%s"' % (indent)
+		for item in self._get_param_names(child, props):
+			value = props[item]
+			if isinstance(value, str):
+				item_str = "'%s'" % (escape_quote(value))
+			else:
+				item_str = value.__str__()
+			result.append(template % (item, encode_quotes(item_str)))
+		return ''.join(result)
 
 	def _finish(self):
+		data = self.file.getvalue()
 		self.file.close()
+		self.file = None
+		return data
 
 	def _write_manifest(self):
-		xml = os.path.join(self.presenter.doc_dir, 'META-INF', 'manifest.xml')
-		try:
-			self.file = open(xml, 'wb')
-		except:
-			errtype, value, traceback = sys.exc_info()
-			msg = _('Cannot open %s file for writing') % (xml)
-			events.emit(events.MESSAGES, msgconst.ERROR, msg)
-			raise IOError(errtype, msg + '\n' + value, traceback)
+		self.file = StringIO()
 		self._start()
 		self.file.write('<manifest>\n')
 		self._write_manifest_entries()
 		self.file.write('</manifest>\n')
-		self._finish()
-		filename = os.path.join('META-INF', 'manifest.xml')
-		self.content.append((xml, filename))
+		filename = 'META-INF/manifest.xml'
+		self.content.append((None, filename, self._finish()))
 
 		msg = _('PDXF file manifest.xml is created')
 		events.emit(events.MESSAGES, msgconst.OK, msg)
@@ -314,20 +368,17 @@ class PDXF_Saver:
 
 		#Doc MIME
 		fn = 'mimetype'
-		pt = os.path.join(self.presenter.doc_dir, fn)
 		metainf_content.append((self._get_mime(fn), fn))
-		self.content.append((pt, fn))
+		self.content.insert(0, (None, fn, const.DOC_MIME))
 
 		#content.xml
 		fn = 'content.xml'
-		pt = os.path.join(self.presenter.doc_dir, fn)
 		metainf_content.append((self._get_mime(fn), fn))
-		self.content.append((pt, fn))
 
 		#Doc directories
 		for path in const.DOC_STRUCTURE:
 			pt = os.path.join(self.presenter.doc_dir, path)
-			self.content.append((pt, path))
+			self.content.append((pt, path, None))
 			metainf_content.append(('', path + '/'))
 			for item in resources:
 				pt, fn = item.split('/')
@@ -335,7 +386,7 @@ class PDXF_Saver:
 				if pt == path and os.path.isfile(filepath):
 					mime = self._get_mime(fn)
 					metainf_content.append((mime, item))
-					self.content.append((filepath, fn))
+					self.content.append((filepath, fn, None))
 
 		#Writing manifest.xml
 		for item in metainf_content:
@@ -351,13 +402,111 @@ class PDXF_Saver:
 
 
 	def _pack_content(self):
-		pdxf_file = ZipFile(self.presenter.doc_file, 'w')
+		config = self.presenter.config
+		try:
+			pdxf_file = PDXF_Archive(self.path, 'w')
+		except:
+			errtype, value, traceback = sys.exc_info()
+			msg = _('Cannot open %s file for writing') % (self.path)
+			events.emit(events.MESSAGES, msgconst.ERROR, msg)
+			raise IOError(errtype, msg + '\n' + str(value), traceback)
+
+		jobs = []
 		for item in self.content:
-			path, filename = item
-			filename = filename.encode('ascii')
-			pdxf_file.write(path, filename, zipfile.ZIP_DEFLATED)
-		pdxf_file.close()
+			path, filename, data = item
+			compress_type = zipfile.ZIP_DEFLATED
+			if config.store_compressed_media and \
+			self._get_mime(filename) in config.compressed_media_types:
+				compress_type = zipfile.ZIP_STORED
+			jobs.append((path, filename.encode('ascii'), data,
+						compress_type, config.compression_level))
+
+		threads = config.compression_threads
+		if threads < 1:
+			threads = multiprocessing.cpu_count()
+		pool = None
+		if threads > 1 and len(jobs) > 1:
+			pool = ThreadPool(threads)
+		try:
+			window = 2 * threads
+			for start in range(0, len(jobs), window):
+				batch = jobs[start:start + window]
+				if pool is None:
+					results = map(compress_member, batch)
+				else:
+					results = pool.map(compress_member, batch)
+				for job, result in zip(batch, results):
+					if result is None:
+						pdxf_file.write(job[0], job[1])
+					else:
+						pdxf_file.write_compressed(*result)
+		finally:
+			if not pool is None:
+				pool.close()
+				pool.join()
+			pdxf_file.close()
 
 		msg = _('PDXF file is created successfully')
 		events.emit(events.MESSAGES, msgconst.OK, msg)
 
+
+def compress_member(job):
+	"""
+	Reads and compresses PDXF archive member. The function is called
+	in worker threads, zlib releases GIL while compressing.
+	Returns (ZipInfo, data, compressed flag) tuple or None for
+	directories. Members requiring ZIP64 extensions are not compressed
+	here, they are compressed by ZipFile while writing.
+	"""
+	path, filename, data, compress_type, level = job
+	if data is None:
+		if os.path.isdir(path):
+			return None
+		st = os.stat(path)
+		zinfo = ZipInfo(filename, time.localtime(st.st_mtime)[0:6])
+		zinfo.external_attr = (st.st_mode & 0xFFFF) << 16L
+		fileobj = open(path, 'rb')
+		data = fileobj.read()
+		fileobj.close()
+	else:
+		zinfo = ZipInfo(filename, time.localtime(time.time())[0:6])
+		zinfo.external_attr = 0600 << 16L
+
+	zinfo.compress_type = compress_type
+	if not compress_type == zipfile.ZIP_DEFLATED or \
+	len(data) > zipfile.ZIP64_LIMIT:
+		return zinfo, data, False
+	zinfo.file_size = len(data)
+	zinfo.CRC = zlib.crc32(data) & 0xffffffff
+	compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+	data = compressor.compress(data) + compressor.flush()
+	zinfo.compress_size = len(data)
+	return zinfo, data, True
+
+
+class PDXF_Archive(ZipFile):
+	"""
+	ZipFile which accepts members compressed beforehand.
+	"""
+
+	def write_compressed(self, zinfo, data, compressed=True):
+		"""
+		Writes member data prepared by compress_member().
+		Compressed data is written by writestr() as stored member,
+		then local file header is rewritten with actual compression
+		method, CRC and uncompressed size of the member.
+		"""
+		if not compressed:
+			self.writestr(zinfo, data)
+			return
+		compress_type = zinfo.compress_type
+		file_size = zinfo.file_size
+		crc = zinfo.CRC
+		self.writestr(zinfo, data, zipfile.ZIP_STORED)
+		zinfo.compress_type = compress_type
+		zinfo.file_size = file_size
+		zinfo.CRC = crc
+		position = self.fp.tell()
+		self.fp.seek(zinfo.header_offset)
+		self.fp.write(zinfo.FileHeader())
+		self.fp.seek(position)
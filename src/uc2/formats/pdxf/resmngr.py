@@ -16,6 +16,7 @@
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os, shutil
+from zipfile import ZipFile
 
 from uc2.utils import generate_id
 from uc2.utils.system import WINDOWS, get_os_family
@@ -34,21 +35,70 @@ class ResourceManager:
 	manage files included into PDXF file archive. 
 	"""
 
+	source = None
+	source_members = []
+
 	def __init__(self, presenter):
 		self.presenter = presenter
 		self.doc_dir = presenter.doc_dir
 
+	def set_source(self, path, members=[]):
+		"""
+		Sets PDXF file which resources are extracted from on demand.
+		members - list of archive member names
+		"""
+		self.source = path
+		self.source_members = members
+
+	def extract_resource(self, respath):
+		"""
+		Extracts resource file from source PDXF file into document
+		cache directory. Returns True on success.
+		"""
+		member = respath
+		if not member in self.source_members:
+			member = respath.split('/')[-1]
+			if not member in self.source_members:
+				return False
+		path = os.path.join(self.doc_dir, convert_resource_path(respath))
+		try:
+			pdxf_file = ZipFile(self.source, 'r')
+			try:
+				source = pdxf_file.open(member)
+				dest = open(path, 'wb')
+				shutil.copyfileobj(source, dest)
+				dest.close()
+				source.close()
+			finally:
+				pdxf_file.close()
+		except:
+			if os.path.lexists(path):
+				os.remove(path)
+			return False
+		return True
+
+	def extract_resources(self):
+		"""
+		Extracts all resources which are not extracted yet from source
+		PDXF file. Should be called before source file is overwritten.
+		"""
+		for id in self.presenter.model.resources.keys():
+			self.get_resource_path(id)
+
 	def get_resource_path(self, id):
 		"""
 		Returns absolute path of resource file by id.
 		If requested id is not in resources or resource file is
-		absent, returns None. 
+		absent, returns None. If document is loaded with streamed
+		content, the resource file is extracted on first call.
 		"""
 		ret = None
 		res_dict = self.presenter.model.resources
 		if id in res_dict.keys():
 			respath = convert_resource_path(res_dict[id])
 			path = os.path.join(self.doc_dir, respath)
+			if not os.path.isfile(path) and self.source:
+				self.extract_resource(res_dict[id])
 			if os.path.isfile(path):
 				ret = path
 		return ret
@@ -21,6 +21,7 @@ import sys
 from uc2 import _, events, msgconst
 from uc2.formats.plt import model
 from uc2.formats.plt.presenter import PLT_Presenter
+from uc2.formats.generic import get_file_header
 from uc2.formats.pdxf.presenter import PDXF_Presenter
 
 
@@ -46,25 +47,12 @@ def plt_saver(pdxf_doc, filename, translate=True, cnf={}, **kw):
 	else:
 		pdxf_doc.save(filename)
 
-def check_plt(path):
-	file_size = os.path.getsize(path)
-
-	try:
-		file = open(path, 'rb')
-	except:
-		errtype, value, traceback = sys.exc_info()
-		msg = _('Cannot open %s file for reading') % (path)
-		events.emit(events.MESSAGES, msgconst.ERROR, msg)
-		raise IOError(errtype, msg + '\n' + value, traceback)
-
-	if file_size > 200:
-		string = file.read(200)
-	else:
-		string = file.read()
-
-	file.close()
+def sniff_plt(header, path=''):
+	string = header[:200]
 	if len(string.split("IN;")) > 1 and len(string.split(";")) > 2:
 		if len(string.split(";PD")) > 1:
 			return True
 	return False
 
+def check_plt(path):
+	return sniff_plt(get_file_header(path, 200), path)
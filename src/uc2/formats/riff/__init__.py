@@ -19,6 +19,7 @@ import sys
 
 from uc2 import events, msgconst
 from uc2.formats.riff.presenter import RIFF_Presenter
+from uc2.formats.generic import get_file_header
 
 def riff_loader(appdata, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
@@ -30,17 +31,10 @@ def riff_saver(riff_doc, filename, translate=True, cnf={}, **kw):
 	if kw: cnf.update(kw)
 	riff_doc.save(filename)
 
-def check_riff(path):
-	try:
-		file = open(path, 'rb')
-	except:
-		errtype, value, traceback = sys.exc_info()
-		msg = _('Cannot open %s file for reading') % (path)
-		events.emit(events.MESSAGES, msgconst.ERROR, msg)
-		raise IOError(errtype, msg + '\n' + value, traceback)
-
-	fourcc = file.read(4)
-	file.close()
-	if fourcc == 'RIFF':
+def sniff_riff(header, path=''):
+	if header[:4] == 'RIFF':
 		return True
 	return False
+
+def check_riff(path):
+	return sniff_riff(get_file_header(path, 4), path)
@@ -15,6 +15,7 @@
 #	You should have received a copy of the GNU General Public License
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from cStringIO import StringIO
 
 from uc2.formats.generic import BinaryModelObject
 from uc2.formats.riff.utils import dword2py_int, py_int2dword
@@ -26,6 +27,38 @@ RIFF_CMPR_LIST = 5
 RIFF_PACK = 9
 RIFF_OBJECT = 10
 
+#Shorter childs lists are scanned without index
+INDEX_MIN_SIZE = 8
+
+class ChunkView(object):
+	"""
+	Represents chunk bytes as (offset, size) view into memory mapped file.
+	Slices are read from mapped file directly, whole chunk bytes
+	are copied only on str() call.
+	"""
+
+	def __init__(self, mapping, offset, size):
+		self.mapping = mapping
+		self.offset = offset
+		self.size = min(size, len(mapping) - offset)
+
+	def __len__(self):
+		return self.size
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(self.size)
+			if not step == 1:
+				return str(self)[index]
+			return self.mapping[self.offset + start:self.offset + max(start, stop)]
+		if index < 0: index += self.size
+		if not 0 <= index < self.size:
+			raise IndexError('chunk index out of range')
+		return self.mapping[self.offset + index]
+
+	def __str__(self):
+		return self.mapping[self.offset:self.offset + self.size]
+
 class RiffModelObject(BinaryModelObject):
 	"""
 	Generic RIFF model object.
@@ -39,6 +72,27 @@ class RiffModelObject(BinaryModelObject):
 	chunk_tag = ''
 	chunk_size = 0
 	version = ''
+	chunk_view = None
+
+	def _get_chunk_bytes(self):
+		"""
+		Materializes lazy chunk on first access. Copied bytes replace
+		the property in instance dictionary, so the view is released.
+		"""
+		chunk = ''
+		if not self.chunk_view is None:
+			chunk = str(self.chunk_view)
+			self.chunk_view = None
+		self.__dict__['chunk'] = chunk
+		return chunk
+
+	chunk = property(_get_chunk_bytes)
+
+	def set_chunk(self, chunk):
+		if isinstance(chunk, ChunkView):
+			self.chunk_view = chunk
+		else:
+			self.__dict__['chunk'] = chunk
 
 	def resolve(self):
 		name = ''
@@ -47,12 +101,50 @@ class RiffModelObject(BinaryModelObject):
 		if self.cid < RIFF_OBJECT: return (False, name, str(self.chunk_size))
 		return (True, name, str(self.chunk_size))
 
-	def get_chunk(self):
-		chunk = ''
+	def materialize(self):
+		"""
+		Copies lazy chunks of the object and its childs into memory.
+		"""
+		if not self.chunk_view is None:
+			self._get_chunk_bytes()
 		for child in self.childs:
-			chunk += child.get_chunk()
-		chunk = self.chunk + chunk
-		return chunk
+			child.materialize()
+
+	def update_size(self):
+		"""
+		Recalculates list sizes bottom-up.
+		Returns object size including childs.
+		"""
+		size = self.get_raw_size()
+		for child in self.childs:
+			size += child.update_size()
+		return size
+
+	def get_raw_size(self):
+		if not self.chunk_view is None:
+			return len(self.chunk_view)
+		return len(self.chunk)
+
+	def write_raw(self, fileobj):
+		if not self.chunk_view is None:
+			fileobj.write(str(self.chunk_view))
+		else:
+			fileobj.write(self.chunk)
+
+	def write_chunk(self, fileobj):
+		"""
+		Writes object and its childs into file-like object.
+		List sizes should be recalculated by update_size() call before.
+		"""
+		self.write_raw(fileobj)
+		for child in self.childs:
+			child.write_chunk(fileobj)
+
+	def get_chunk(self):
+		self.update_size()
+		fileobj = StringIO()
+		self.write_chunk(fileobj)
+		return fileobj.getvalue()
 
 	def update(self):pass
 
@@ -80,11 +172,15 @@ class RiffList(RiffModelObject):
 
 	cid = RIFF_LIST
 
+	tag_index = None
+	indexed_childs = None
+	indexed_num = 0
+
 	def __init__(self, chunk):
 		self.childs = []
-		self.chunk = chunk
+		self.set_chunk(chunk)
 		self.identifier = 'LIST'
-		self.chunk_tag = self.chunk[8:12]
+		self.chunk_tag = chunk[8:12]
 		self.chunk_size = dword2py_int(chunk[4:8])
 		self.cache_fields = [
 						(0, 4, 'list identifier'),
@@ -92,6 +188,72 @@ class RiffList(RiffModelObject):
 						(8, 4, 'chunk tag')
 						]
 
+	def update_size(self):
+		size = 12
+		for child in self.childs:
+			size += child.update_size()
+		#size field of unchanged list is kept as is, odd size field
+		#does not count padding byte of the last child
+		if not size - 8 == self.chunk_size + (self.chunk_size & 1):
+			self.chunk_size = size - 8
+		return size
+
+	def write_chunk(self, fileobj):
+		chunk = self.chunk
+		fileobj.write(chunk[:4] + py_int2dword(self.chunk_size) + chunk[8:12])
+		for child in self.childs:
+			child.write_chunk(fileobj)
+
+	def get_tag_index(self):
+		"""
+		Returns {chunk tag: [childs]} index of list childs.
+		The index is rebuilt if childs list is replaced or resized.
+		In-place replacement of childs requires invalidate_index() call.
+		"""
+		childs = self.childs
+		if self.tag_index is None or not self.indexed_childs is childs or \
+		not self.indexed_num == len(childs):
+			tag_index = {}
+			for child in childs:
+				if child is None: continue
+				tag = child.chunk_tag
+				if tag in tag_index:
+					tag_index[tag].append(child)
+				else:
+					tag_index[tag] = [child]
+			self.tag_index = tag_index
+			self.indexed_childs = childs
+			self.indexed_num = len(childs)
+		return self.tag_index
+
+	def invalidate_index(self):
+		self.tag_index = None
+		self.indexed_childs = None
+
+	def find(self, chunk_tag):
+		"""
+		Finds child by chunk tag. Returns first occurrence or None.
+		"""
+		childs = self.childs
+		if len(childs) < INDEX_MIN_SIZE:
+			for child in childs:
+				if not child is None and child.chunk_tag == chunk_tag:
+					return child
+			return None
+		items = self.get_tag_index().get(chunk_tag)
+		if items: return items[0]
+		return None
+
+	def find_all(self, chunk_tag):
+		"""
+		Finds all childs with provided chunk tag.
+		"""
+		childs = self.childs
+		if len(childs) < INDEX_MIN_SIZE:
+			return [child for child in childs
+				if not child is None and child.chunk_tag == chunk_tag]
+		return list(self.get_tag_index().get(chunk_tag, []))
+
 class RiffRootList(RiffList):
 	"""
 	Root RIFF model list.
@@ -126,6 +288,12 @@ class RiffUnparsedList(RiffList):
 	def __init__(self, chunk):
 		RiffList.__init__(self, chunk)
 
+	def update_size(self):
+		return self.get_raw_size()
+
+	def write_chunk(self, fileobj):
+		self.write_raw(fileobj)
+
 class RiffCmprList(RiffUnparsedList):
 	"""
 	Compressed RIFF model list.
@@ -160,7 +328,7 @@ class RiffObject(RiffModelObject):
 	cid = RIFF_OBJECT
 
 	def __init__(self, chunk):
-		self.chunk = chunk
+		self.set_chunk(chunk)
 		self.identifier = chunk[:4]
 		self.chunk_size = dword2py_int(chunk[4:8])
 		self.chunk_tag = '' + self.identifier
@@ -169,6 +337,12 @@ class RiffObject(RiffModelObject):
 						(4, 4, 'chunk size'),
 						]
 
+	def update_size(self):
+		return self.get_raw_size()
+
+	def write_chunk(self, fileobj):
+		self.write_raw(fileobj)
+
 	def get_chunk(self):
 		return self.chunk
 
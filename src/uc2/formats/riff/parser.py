@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides RIFF reading engine shared by RIFF based format
+loaders (RIFF, CDR, CDRZ). Chunk tree is walked by explicit stack,
+so nesting depth is not limited by recursion limit.
+
+If several inflating threads are allowed, parsing has two phases:
+compressed regions (cmpr lists and pack objects) met by structural
+pass are inflated by thread pool concurrently, and their childs are
+parsed in file order as inflated data arrives.
+"""
+
+import struct
+import zlib
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from cStringIO import StringIO
+
+from uc2.formats.riff import model
+from uc2.formats.riff.utils import InflateStream
+
+HEADER = struct.Struct('<4sI')
+SIZE = struct.Struct('<I')
+
+class RiffFrame:
+	"""
+	Represents list which childs are under parsing.
+	Childs are parsed while stream position is not greater than limit,
+	or until stream end if limit is None. If unparsed is provided as
+	(offset, size, header) tuple, broken list is stored as unparsed one.
+	"""
+
+	def __init__(self, obj, stream, limit, blocksizes=None, unparsed=None):
+		self.obj = obj
+		self.stream = stream
+		self.limit = limit
+		self.blocksizes = blocksizes
+		self.unparsed = unparsed
+
+class RiffParser:
+	"""
+	Generic RIFF reading engine. Chunk classes are resolved by obj_map
+	dictionary (list identifier or chunk identifier -> class).
+	"""
+
+	version = ''
+	obj_map = {}
+	parse_packs = False
+	#Number of threads inflating compressed regions, 0 - number of CPUs,
+	#1 - regions are inflated incrementally by parsing thread
+	inflate_threads = 1
+
+	pool = None
+	deferred = []
+
+	file = None
+	mapping = None
+
+	file_size = 0
+	file_position = 0
+	stream_start = 0
+	stream_size = 0
+	stream_decompr_size = 0
+
+	def report_position(self, position):pass
+	def report_stream_position(self, position):pass
+
+	def skip_list(self, list_identifier):
+		"""
+		Returns True if list content should not be parsed. Skipped list
+		is stored as unparsed one.
+		"""
+		return False
+
+	def get_class(self, identifier, list_identifier=''):
+		if list_identifier:
+			if self.obj_map.has_key(list_identifier):
+				return self.obj_map[list_identifier]
+			else:
+				return model.RiffList
+		else:
+			if self.obj_map.has_key(identifier):
+				return self.obj_map[identifier]
+			else:
+				return model.RiffObject
+
+	def parse_file(self, file):
+		"""
+		Parses RIFF file and returns root list of the model.
+		If mapping is set, the file is read through memory mapping
+		and chunk objects refer mapped data lazily.
+		"""
+		if not self.mapping is None:
+			self.mapping.seek(0)
+			file = self.mapping
+		self.file = file
+		header = file.read(12)
+		self.version = header[8:12]
+		obj = model.RiffRootList(header)
+		size = SIZE.unpack(header[4:8])[0]
+		size += size & 1
+		self.deferred = []
+		try:
+			self.parse_childs(RiffFrame(obj, file, size + 7))
+		except:
+			if not self.pool is None:
+				#pending regions will not be read
+				self.pool.terminate()
+				self.pool.join()
+				self.pool = None
+			raise
+		finally:
+			if not self.pool is None:
+				self.pool.close()
+				self.pool.join()
+			self.pool = None
+			self.deferred = []
+			self.file = None
+		return obj
+
+	def get_pool(self):
+		"""
+		Returns inflating thread pool or None if compressed regions
+		should be inflated sequentially.
+		"""
+		if self.pool is None:
+			threads = self.inflate_threads
+			if threads < 1:
+				threads = multiprocessing.cpu_count()
+			if threads < 2:
+				return None
+			self.pool = ThreadPool(threads)
+		return self.pool
+
+	def defer_region(self, obj, data, blocksizes=None):
+		"""
+		Schedules compressed region inflating. Childs of the region
+		are parsed when all preceding chunks are parsed.
+		"""
+		result = self.pool.apply_async(inflate, (data,))
+		self.deferred.append((obj, result, blocksizes, self.stream_start,
+							self.stream_size, self.stream_decompr_size))
+
+	def get_deferred_frame(self):
+		"""
+		Waits for first deferred region and returns frame for its childs.
+		"""
+		obj, result, blocksizes, start, size, decompr_size = \
+				self.deferred.pop(0)
+		self.stream_start = start
+		self.stream_size = size
+		self.stream_decompr_size = decompr_size
+		data = result.get()
+		return RiffFrame(obj, StringIO(data), len(data) - 1, blocksizes)
+
+	def parse_childs(self, frame):
+		"""
+		Parses chunks into frame list childs.
+		Nested lists are parsed by the same loop using frame stack.
+		"""
+		obj_map = self.obj_map
+		stack = [frame]
+		while stack or self.deferred:
+			if not stack:
+				stack.append(self.get_deferred_frame())
+			frame = stack[-1]
+			stream = frame.stream
+			read = stream.read
+			tell = stream.tell
+			limit = frame.limit
+			blocksizes = frame.blocksizes
+			append = frame.obj.childs.append
+			mapped = stream is self.mapping
+			report = None
+			if stream is self.file:
+				report = self.report_position
+			elif not blocksizes is None:
+				report = self.report_stream_position
+
+			while True:
+				if limit is None:
+					if stream.at_end():
+						stack.pop()
+						break
+				elif tell() > limit:
+					stack.pop()
+					break
+
+				header = read(8)
+				identifier = header[:4]
+				if len(header) < 8 or not identifier[:3].isalnum():
+					if len(header) < 4:
+						#truncated stream
+						stack.pop()
+						break
+					elif frame.unparsed is None:
+						stream.seek(tell() - len(header) + 4)
+						append(None)
+						continue
+					self.set_unparsed(stack)
+					break
+
+				identifier, size = HEADER.unpack(header)
+				size_field = header[4:]
+				if not blocksizes is None:
+					size = blocksizes[size]
+					size_field = SIZE.pack(size)
+				size += size & 1
+				offset = tell()
+
+				if identifier == 'LIST':
+					list_identifier = read(4)
+					chunk = identifier + size_field + list_identifier
+					if list_identifier == 'cmpr' and blocksizes is None:
+						self.parse_cmpr_list(stack, chunk, offset, size)
+						break
+					if self.skip_list(list_identifier):
+						append(self.get_unparsed_list(stream, offset, size, chunk))
+						continue
+					class_ = obj_map.get(list_identifier, model.RiffList)
+					obj = class_(chunk)
+					append(obj)
+					stack.append(RiffFrame(obj, stream, offset + size - 4,
+									blocksizes, (offset, size, chunk)))
+					break
+				elif identifier == 'pack' and self.parse_packs and \
+				blocksizes is None:
+					chunk = identifier + size_field + read(size)
+					obj = model.RiffPackObject(chunk)
+					append(obj)
+					if not self.get_pool() is None:
+						self.defer_region(obj, chunk[20:])
+						continue
+					data = inflate(chunk[20:])
+					stack.append(RiffFrame(obj, StringIO(data), len(data) - 1))
+					break
+
+				class_ = obj_map.get(identifier, model.RiffObject)
+				if mapped:
+					stream.seek(offset + size)
+					append(class_(model.ChunkView(stream, offset - 8, size + 8)))
+				else:
+					append(class_(identifier + size_field + read(size)))
+				if not report is None:
+					report(tell())
+
+	def set_unparsed(self, stack):
+		"""
+		Removes broken list frame from stack and replaces the list
+		in parent childs by unparsed list.
+		"""
+		frame = stack.pop()
+		offset, size, chunk = frame.unparsed
+		stream = frame.stream
+		stream.seek(offset + 4)
+		obj = self.get_unparsed_list(stream, offset, size, chunk)
+		stack[-1].obj.childs[-1] = obj
+
+	def get_unparsed_list(self, stream, offset, size, chunk):
+		"""
+		Creates unparsed list for list which content starts after
+		list identifier. Mapped content is not read but referred.
+		"""
+		if stream is self.mapping:
+			stream.seek(offset + size)
+			chunk = model.ChunkView(stream, offset - 8, size + 8)
+		else:
+			chunk += stream.read(size - 4)
+		return model.RiffUnparsedList(chunk)
+
+	def parse_cmpr_list(self, stack, chunk, offset, size):
+		"""
+		Creates compressed list and pushes frame for its childs
+		which are parsed from incrementally inflated stream, or
+		schedules inflating of the list if thread pool is used.
+		"""
+		frame = stack[-1]
+		stream = frame.stream
+		if stream is self.mapping:
+			stream.seek(offset + size)
+			buffer = model.ChunkView(stream, offset - 8, size + 8)
+		else:
+			buffer = chunk + stream.read(size - 4)
+		self.stream_start = offset + 4
+		self.stream_size = size
+
+		obj = model.RiffCmprList(buffer)
+		frame.obj.childs.append(obj)
+		compressedsize = obj.compressedsize
+		self.stream_decompr_size = max(obj.uncompressedsize, 1)
+
+		blocksizesdata = zlib.decompress(buffer[36 + compressedsize:])
+		num = len(blocksizesdata) / 4
+		blocksizes = struct.unpack('<%dI' % num, blocksizesdata[:4 * num])
+
+		if not self.get_pool() is None:
+			self.defer_region(obj, buffer[36:36 + compressedsize], blocksizes)
+			return
+		stream = InflateStream(buffer, 36, 36 + compressedsize)
+		stack.append(RiffFrame(obj, stream, None, blocksizes))
+
+
+def inflate(data):
+	"""
+	Inflates zlib compressed data ignoring trailing bytes.
+	The function is called in worker threads, zlib releases GIL
+	while inflating.
+	"""
+	return zlib.decompressobj().decompress(data)
@@ -21,3 +21,8 @@ class RIFF_Config(XmlConfigParser):
 
 	system_encoding = 'utf-8'
 
+	#Number of threads inflating compressed lists and pack objects,
+	#0 - number of CPUs, 1 - sequential inflating. Batch and server
+	#modes already run a process per CPU, so sequential is default.
+	inflate_threads = 1
+
@@ -16,6 +16,9 @@
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import struct
+import zlib
+
+INFLATE_WINDOW = 0x10000
 
 def word2py_int(bytes):
 	"""
@@ -64,6 +67,82 @@ def get_chunk_size(size_field):
 	return size
 
 
+class InflateStream:
+	"""
+	Read-only file-like object over zlib compressed data.
+	Data is inflated incrementally in bounded windows, so memory usage
+	doesn't depend on uncompressed data size. Backward seek out of
+	current inflated window restarts inflating from the stream start.
+	"""
+
+	def __init__(self, source, start=0, end=None, window=INFLATE_WINDOW):
+		self.source = source
+		self.start = start
+		self.end = end
+		if end is None: self.end = len(source)
+		self.window = window
+		self._reset()
+
+	def _reset(self):
+		self.decomp = zlib.decompressobj()
+		self.src_pos = self.start
+		self.pending = ''
+		self.pending_pos = 0
+		self.position = 0
+		self.finished = False
+
+	def _fill(self):
+		while not self.finished:
+			data = self.decomp.unconsumed_tail
+			if not data:
+				end = min(self.src_pos + self.window, self.end)
+				data = self.source[self.src_pos:end]
+				self.src_pos = end
+			if not data or self.decomp.unused_data:
+				self.finished = True
+				self.pending = self.decomp.flush()
+			else:
+				self.pending = self.decomp.decompress(data, self.window)
+			self.pending_pos = 0
+			if self.pending: return True
+		return False
+
+	def at_end(self):
+		if self.pending_pos < len(self.pending):
+			return False
+		return not self._fill()
+
+	def read(self, size):
+		pieces = []
+		while size > 0:
+			available = len(self.pending) - self.pending_pos
+			if not available:
+				if not self._fill(): break
+				continue
+			num = min(size, available)
+			pieces.append(self.pending[self.pending_pos:self.pending_pos + num])
+			self.pending_pos += num
+			self.position += num
+			size -= num
+		if len(pieces) == 1: return pieces[0]
+		return ''.join(pieces)
+
+	def tell(self):
+		return self.position
+
+	def seek(self, position):
+		if position < self.position:
+			back = self.position - position
+			if back <= self.pending_pos:
+				self.pending_pos -= back
+				self.position = position
+				return
+			self._reset()
+		while self.position < position:
+			if not self.read(min(position - self.position, self.window)):
+				break
+
+
 
 
 
@@ -21,6 +21,7 @@ import sys
 from uc2 import _, events, msgconst
 from uc2.formats.sk1 import model
 from uc2.formats.sk1.presenter import SK1_Presenter
+from uc2.formats.generic import get_file_header
 from uc2.formats.pdxf.presenter import PDXF_Presenter
 
 def sk1_loader(appdata, filename, translate=True, cnf={}, **kw):
@@ -42,17 +43,9 @@ def sk1_saver(pdxf_doc, filename, translate=True, cnf={}, **kw):
 	sk1_doc.save(filename)
 	sk1_doc.close()
 
-def check_sk1(path):
-	try:
-		file = open(path, 'rb')
-	except:
-		errtype, value, traceback = sys.exc_info()
-		msg = _('Cannot open %s file for reading') % (path)
-		events.emit(events.MESSAGES, msgconst.ERROR, msg)
-		raise IOError(errtype, msg + '\n' + value, traceback)
-
-	string = file.read(5)
-
-	file.close()
-	if string == '##sK1': return True
+def sniff_sk1(header, path=''):
+	if header[:5] == '##sK1': return True
 	return False
+
+def check_sk1(path):
+	return sniff_sk1(get_file_header(path, 5), path)
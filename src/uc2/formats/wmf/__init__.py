@@ -23,6 +23,7 @@ from uc2.formats.sk1 import model
 from uc2.formats.sk1.presenter import SK1_Presenter
 from uc2.formats.pdxf.presenter import PDXF_Presenter
 from uc2.formats.wmf.wmfconst import WMF_SIGNATURE
+from uc2.formats.generic import get_file_header
 from uc2.formats.wmf.wmf_loader import WMF_Loader
 
 
@@ -48,17 +49,9 @@ def wmf_saver(pdxf_doc, filename, translate=True, cnf={}, **kw):
 	sk1_doc.save(filename)
 	sk1_doc.close()
 
-def check_wmf(path):
-	try:
-		file = open(path, 'rb')
-	except:
-		errtype, value, traceback = sys.exc_info()
-		msg = _('Cannot open %s file for reading') % (path)
-		events.emit(events.MESSAGES, msgconst.ERROR, msg)
-		raise IOError(errtype, msg + '\n' + value, traceback)
-
-	string = file.read(4)
-
-	file.close()
-	if string == WMF_SIGNATURE: return True
+def sniff_wmf(header, path=''):
+	if header[:4] == WMF_SIGNATURE: return True
 	return False
+
+def check_wmf(path):
+	return sniff_wmf(get_file_header(path, 4), path)
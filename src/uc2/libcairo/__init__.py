@@ -15,13 +15,13 @@
 #	You should have received a copy of the GNU General Public License
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 import cairo
 #import pangocairo
 import _libcairo
 
 
-SURFACE = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
-CTX = cairo.Context(SURFACE)
 DIRECT_MATRIX = cairo.Matrix()
 
 PANGO_MATRIX = cairo.Matrix(1.0, 0.0, 0.0, -1.0, 0.0, 0.0)
@@ -50,57 +50,175 @@ FAMILIES_DICT = {}
 #
 #get_fonts(FAMILIES_LIST, FAMILIES_DICT)
 
+class GeometryContext:
+	"""
+	Cairo surface and context used for paths creation, flattening
+	and bbox calculation. Context is not thread safe, so each thread
+	uses its own context (see get_context()), or context can be
+	created and passed explicitly.
+	"""
+
+	def __init__(self):
+		self.surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
+		self.ctx = cairo.Context(self.surface)
+
+	def create_cpath(self, paths, cmatrix=None):
+		ctx = self.ctx
+		ctx.set_matrix(DIRECT_MATRIX)
+		ctx.new_path()
+		for path in paths:
+			ctx.new_sub_path()
+			start_point = path[0]
+			points = path[1]
+			end = path[2]
+			x, y = start_point
+			ctx.move_to(x, y)
+
+			for point in points:
+				if len(point) == 2:
+					x, y = point
+					ctx.line_to(x, y)
+				else:
+					p1, p2, p3, m = point
+					x1, y1 = p1
+					x2, y2 = p2
+					x3, y3 = p3
+					ctx.curve_to(x1, y1, x2, y2, x3, y3)
+			if end:
+				ctx.close_path()
+
+		cairo_path = ctx.copy_path()
+		if not cmatrix is None:
+			cairo_path = apply_cmatrix(cairo_path, cmatrix)
+		return cairo_path
+
+	def create_arc_cpath(self, xc, yc, radius, angle1, angle2):
+		self.ctx.set_matrix(DIRECT_MATRIX)
+		self.ctx.new_path()
+		self.ctx.arc(xc, yc, radius, angle1, angle2)
+		return self.ctx.copy_path()
+
+	def get_flattened_path(self, cairo_path, tolerance=0.1):
+		ctx = self.ctx
+		ctx.set_matrix(DIRECT_MATRIX)
+		tlr = ctx.get_tolerance()
+		ctx.set_tolerance(tolerance)
+		ctx.new_path()
+		ctx.append_path(cairo_path)
+		result = ctx.copy_path_flat()
+		ctx.set_tolerance(tlr)
+		return result
+
+	def copy_cpath(self, cairo_path):
+		self.ctx.set_matrix(DIRECT_MATRIX)
+		self.ctx.new_path()
+		self.ctx.append_path(cairo_path)
+		return self.ctx.copy_path()
+
+	def get_cpath_bbox(self, cpath):
+		self.ctx.set_matrix(DIRECT_MATRIX)
+		self.ctx.new_path()
+		self.ctx.append_path(cpath)
+		return normalize_bbox(self.ctx.path_extents())
+
+	def convert_bbox_to_cpath(self, bbox):
+		x0, y0, x1, y1 = bbox
+		ctx = self.ctx
+		ctx.set_matrix(DIRECT_MATRIX)
+		ctx.new_path()
+		ctx.move_to(x0, y0)
+		ctx.line_to(x1, y0)
+		ctx.line_to(x1, y1)
+		ctx.line_to(x0, y1)
+		ctx.line_to(x0, y0)
+		ctx.close_path()
+		return ctx.copy_path()
+
+	def is_point_in_path(self, point, trafo, obj, stroke_width=5.0,
+						fill_flag=True):
+		dx, dy = point
+		trafo = [] + trafo
+		trafo[4] -= dx
+		trafo[5] -= dy
+		ctx = self.ctx
+		ctx.set_matrix(DIRECT_MATRIX)
+		ctx.set_tolerance(3.0)
+		ctx.set_source_rgb(1, 1, 1)
+		ctx.paint()
+		self._draw_object(obj, trafo, stroke_width, fill_flag)
+		pixel = _libcairo.get_pixel(self.surface)
+		ctx.set_tolerance(0.1)
+		if pixel[0] == pixel[1] == pixel[2] == 255:
+			return False
+		else:
+			return True
+
+	def _draw_object(self, obj, trafo, stroke_width, fill_flag):
+		if obj.childs:
+			for child in obj.childs:
+				self._draw_object(child, trafo, stroke_width, fill_flag)
+		else:
+			ctx = self.ctx
+			fill_anyway = False
+			path = obj.cache_cpath
+
+			if obj.cid in [205, 206]:
+				path = self.convert_bbox_to_cpath(obj.cache_bbox)
+				fill_anyway = True
+			if obj.cid == 204 and len(obj.paths) > 100:
+				path = self.convert_bbox_to_cpath(obj.cache_bbox)
+				fill_anyway = True
+
+			ctx.set_matrix(get_matrix_from_trafo(trafo))
+			ctx.set_source_rgb(0, 0, 0)
+			ctx.new_path()
+			ctx.append_path(path)
+			if fill_flag and obj.style[0]:
+				ctx.fill_preserve()
+			if fill_anyway:
+				ctx.fill_preserve()
+			if obj.style[1]:
+				stroke = obj.style[1]
+				width = stroke[1] * trafo[0]
+				stroke_width /= trafo[0]
+				if width < stroke_width: width = stroke_width
+				ctx.set_source_rgb(0, 0, 0)
+				ctx.set_line_width(width)
+				ctx.stroke()
+
+LOCAL = threading.local()
+
+#Context of the thread which imports the module. SURFACE and CTX are
+#kept for compatibility, they should not be used from other threads.
+LOCAL.context = GeometryContext()
+SURFACE = LOCAL.context.surface
+CTX = LOCAL.context.ctx
+
+def get_context():
+	"""
+	Returns geometry context of current thread.
+	"""
+	context = getattr(LOCAL, 'context', None)
+	if context is None:
+		context = GeometryContext()
+		LOCAL.context = context
+	return context
+
 def create_cpath(paths, cmatrix=None):
-	CTX.set_matrix(DIRECT_MATRIX)
-	CTX.new_path()
-	for path in paths:
-		CTX.new_sub_path()
-		start_point = path[0]
-		points = path[1]
-		end = path[2]
-		x, y = start_point
-		CTX.move_to(x, y)
-
-		for point in points:
-			if len(point) == 2:
-				x, y = point
-				CTX.line_to(x, y)
-			else:
-				p1, p2, p3, m = point
-				x1, y1 = p1
-				x2, y2 = p2
-				x3, y3 = p3
-				CTX.curve_to(x1, y1, x2, y2, x3, y3)
-		if end:
-			CTX.close_path()
-
-	cairo_path = CTX.copy_path()
-	if not cmatrix is None:
-		cairo_path = apply_cmatrix(cairo_path, cmatrix)
-	return cairo_path
+	return get_context().create_cpath(paths, cmatrix)
 
 def get_path_from_cpath(cairo_path):
 	return _libcairo.get_path_from_cpath(cairo_path)
 
 def get_flattened_path(cairo_path, tolerance=0.1):
-	CTX.set_matrix(DIRECT_MATRIX)
-	tlr = CTX.get_tolerance()
-	CTX.set_tolerance(tolerance)
-	CTX.new_path()
-	CTX.append_path(cairo_path)
-	result = CTX.copy_path_flat()
-	CTX.set_tolerance(tlr)
-	return result
+	return get_context().get_flattened_path(cairo_path, tolerance)
 
 def apply_cmatrix(cairo_path, cmatrix):
 	trafo = get_trafo_from_matrix(cmatrix)
 	return apply_trafo(cairo_path, trafo)
 
 def copy_cpath(cairo_path):
-	CTX.set_matrix(DIRECT_MATRIX)
-	CTX.new_path()
-	CTX.append_path(cairo_path)
-	return CTX.copy_path()
+	return get_context().copy_cpath(cairo_path)
 
 def apply_trafo(cairo_path, trafo, copy=False):
 	if copy:
@@ -133,10 +251,7 @@ def normalize_bbox(bbox):
 	return new_bbox
 
 def get_cpath_bbox(cpath):
-	CTX.set_matrix(DIRECT_MATRIX)
-	CTX.new_path()
-	CTX.append_path(cpath)
-	return normalize_bbox(CTX.path_extents())
+	return get_context().get_cpath_bbox(cpath)
 
 def _get_trafo(cmatrix):
 	result = []
@@ -183,63 +298,8 @@ def apply_trafo_to_bbox(bbox, trafo):
 	return start + end
 
 def convert_bbox_to_cpath(bbox):
-	x0, y0, x1, y1 = bbox
-	CTX.set_matrix(DIRECT_MATRIX)
-	CTX.new_path()
-	CTX.move_to(x0, y0)
-	CTX.line_to(x1, y0)
-	CTX.line_to(x1, y1)
-	CTX.line_to(x0, y1)
-	CTX.line_to(x0, y0)
-	CTX.close_path()
-	return CTX.copy_path()
+	return get_context().convert_bbox_to_cpath(bbox)
 
 def is_point_in_path(point, trafo, obj, stroke_width=5.0, fill_flag=True):
-	dx, dy = point
-	trafo = [] + trafo
-	trafo[4] -= dx
-	trafo[5] -= dy
-	CTX.set_matrix(DIRECT_MATRIX)
-	CTX.set_tolerance(3.0)
-	CTX.set_source_rgb(1, 1, 1)
-	CTX.paint()
-	_draw_object(obj, trafo, stroke_width, fill_flag)
-	pixel = _libcairo.get_pixel(SURFACE)
-	CTX.set_tolerance(0.1)
-	if pixel[0] == pixel[1] == pixel[2] == 255:
-		return False
-	else:
-		return True
-
-def _draw_object(obj, trafo, stroke_width, fill_flag):
-	if obj.childs:
-		for child in obj.childs:
-			_draw_object(child, trafo, stroke_width, fill_flag)
-	else:
-		fill_anyway = False
-		path = obj.cache_cpath
-
-		if obj.cid in [205, 206]:
-			path = convert_bbox_to_cpath(obj.cache_bbox)
-			fill_anyway = True
-		if obj.cid == 204 and len(obj.paths) > 100:
-			path = convert_bbox_to_cpath(obj.cache_bbox)
-			fill_anyway = True
-
-		CTX.set_matrix(get_matrix_from_trafo(trafo))
-		CTX.set_source_rgb(0, 0, 0)
-		CTX.new_path()
-		CTX.append_path(path)
-		if fill_flag and obj.style[0]:
-			CTX.fill_preserve()
-		if fill_anyway:
-			CTX.fill_preserve()
-		if obj.style[1]:
-			stroke = obj.style[1]
-			width = stroke[1] * trafo[0]
-			stroke_width /= trafo[0]
-			if width < stroke_width: width = stroke_width
-			CTX.set_source_rgb(0, 0, 0)
-			CTX.set_line_width(width)
-			CTX.stroke()
-
+	return get_context().is_point_in_path(point, trafo, obj,
+										stroke_width, fill_flag)
@@ -16,10 +16,14 @@
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from copy import deepcopy
+from array import array
 import math
+from itertools import izip
 
 from uc2 import libcairo
 from uc2.formats.pdxf import const
+from uc2.libgeom.compact import CompactPaths, NODE_START, NODE_LINE, \
+NODE_CURVE, KIND_MASK, VALUE_MASK, transform_coords
 
 
 """
@@ -38,6 +42,11 @@ POINTS DEFINITION:
 line point - [x,y]
 curve point - [[x1,y1],[x2,y2],[x3,y3], marker]
 marker - NODE_CUSP = 0; NODE_SMOOTH = 1; NODE_SYMMETRICAL = 2 
+
+COMPACT PATHS:
+CompactPaths object (see compact module) stores the same paths
+in flat arrays. Transforming, flattening, cairo path creation and bbox
+routines accept compact paths natively and return compact paths.
 """
 
 
@@ -132,66 +141,248 @@ def bbox_trafo(bbox0, bbox1):
 
 #------------- Flattering -------------
 
-def _flat_segment(p0, p1, p2, p3, tlr):
-	p4 = midpoint(p0, p1)
-	p5 = midpoint(p1, p2)
-	p6 = midpoint(p2, p3)
-	p7 = midpoint(p4, p5)
-	p8 = midpoint(p5, p6)
-	p9 = midpoint(p7, p8)
-
-	b = sub_points(p3, p0)
-	s = sub_points(p9, p0)
-	c1 = sub_points(p1, p0)
-	c2 = sub_points(p2, p3)
-
-	if abs_point(c1) > abs_point(b) or abs_point(c2) > abs_point(b):
-		return _flat_segment(p0, p4, p7, p9, tlr) + _flat_segment(p9, p8, p6, p3, tlr)
-
-	elif abs_point(b) < tlr / 2.0:
-		return [p9, p3]
-	else:
-		N = normalize_point(b)
-		if ((mult_points(c1, N)) < -tlr
-			or (mult_points(c2, N)) > tlr
-			or cr_points(c1, b) * cr_points(c2, b) < 0
-			or abs(cr_points(N, s)) > tlr):
-			return _flat_segment(p0, p4, p7, p9, tlr) + _flat_segment(p9, p8, p6, p3, tlr)
+#Subdivision depth limit, it is never reached for real curves
+FLAT_MAX_DEPTH = 32
+
+def flat_segment(buffer, start, p1, p2, p3, tlr):
+	"""
+	Flattens cubic Bezier segment by adaptive subdivision and appends
+	points (except start point) to flat coordinates buffer
+	(x0, y0, x1, y1, ...). Subdivision uses explicit stack,
+	halves are computed relative to start point.
+	"""
+	sx, sy = start
+	x1 = p1[0] - sx
+	y1 = p1[1] - sy
+	x2 = p2[0] - sx
+	y2 = p2[1] - sy
+	x3 = p3[0] - sx
+	y3 = p3[1] - sy
+	hypot = math.hypot
+	half_tlr = tlr / 2.0
+	append = buffer.append
+	stack = [(0.0, 0.0, x1, y1, x2, y2, x3, y3, 0)]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		x0, y0, x1, y1, x2, y2, x3, y3, depth = pop()
+		x4 = (x1 + x0) / 2.0
+		y4 = (y1 + y0) / 2.0
+		x5 = (x2 + x1) / 2.0
+		y5 = (y2 + y1) / 2.0
+		x6 = (x3 + x2) / 2.0
+		y6 = (y3 + y2) / 2.0
+		x7 = (x5 + x4) / 2.0
+		y7 = (y5 + y4) / 2.0
+		x8 = (x6 + x5) / 2.0
+		y8 = (y6 + y5) / 2.0
+		x9 = (x8 + x7) / 2.0
+		y9 = (y8 + y7) / 2.0
+
+		bx = x3 - x0
+		by = y3 - y0
+		c1x = x1 - x0
+		c1y = y1 - y0
+		c2x = x2 - x3
+		c2y = y2 - y3
+		abs_b = hypot(bx, by)
+
+		if hypot(c1x, c1y) > abs_b or hypot(c2x, c2y) > abs_b:
+			split = True
+		elif abs_b < half_tlr:
+			split = False
 		else:
-			return [p9, p3]
-
-def flat_path(path, tlr):
+			nx = bx / abs_b
+			ny = by / abs_b
+			split = (c1x * nx + c1y * ny < -tlr
+				or c2x * nx + c2y * ny > tlr
+				or (c1x * by - c1y * bx) * (c2x * by - c2y * bx) < 0
+				or abs(nx * (y9 - y0) - ny * (x9 - x0)) > tlr)
+
+		if split and depth < FLAT_MAX_DEPTH:
+			depth += 1
+			push((x9, y9, x8, y8, x6, y6, x3, y3, depth))
+			push((x0, y0, x4, y4, x7, y7, x9, y9, depth))
+		else:
+			append(x9 + sx)
+			append(y9 + sy)
+			append(x3 + sx)
+			append(y3 + sy)
+
+def get_segments_numbers(segments, tlr):
+	"""
+	Estimates numbers of line segments for list of cubic Bezier segments
+	(start, p1, p2, p3) by Wang's formula, so flattened segment deviates
+	from the curve not more than tolerance.
+	"""
+	factor = 0.75 / tlr
+	sqrt = math.sqrt
+	hypot = math.hypot
 	result = []
-	result.append([] + path[0])
-	start = [] + path[0]
+	for p0, p1, p2, p3 in segments:
+		d1 = hypot(p0[0] - 2.0 * p1[0] + p2[0], p0[1] - 2.0 * p1[1] + p2[1])
+		d2 = hypot(p1[0] - 2.0 * p2[0] + p3[0], p1[1] - 2.0 * p2[1] + p3[1])
+		result.append(max(1, int(math.ceil(sqrt(factor * max(d1, d2))))))
+	return result
+
+def _get_differences(v0, v1, v2, v3, h):
+	a = (-v0 + 3.0 * v1 - 3.0 * v2 + v3) * h * h * h
+	b = (3.0 * v0 - 6.0 * v1 + 3.0 * v2) * h * h
+	c = 3.0 * (v1 - v0) * h
+	return a + b + c, 6.0 * a + 2.0 * b, 6.0 * a
+
+def flat_segment_uniform(buffer, p0, p1, p2, p3, num):
+	"""
+	Flattens cubic Bezier segment into num line segments by forward
+	differencing and appends points (except start point) to flat
+	coordinates buffer.
+	"""
+	append = buffer.append
+	h = 1.0 / num
+	x, y = p0
+	dx, ddx, dddx = _get_differences(p0[0], p1[0], p2[0], p3[0], h)
+	dy, ddy, dddy = _get_differences(p0[1], p1[1], p2[1], p3[1], h)
+	for i in xrange(num - 1):
+		x += dx
+		dx += ddx
+		ddx += dddx
+		y += dy
+		dy += ddy
+		ddy += dddy
+		append(x)
+		append(y)
+	append(p3[0])
+	append(p3[1])
+
+def _flat_path_batched(buffer, path, tlr):
+	segments = []
+	start = path[0]
+	for point in path[1]:
+		if len(point) == 2:
+			start = point
+		else:
+			segments.append((start, point[0], point[1], point[2]))
+			start = point[2]
+	numbers = iter(get_segments_numbers(segments, tlr))
+	start = path[0]
 	for point in path[1]:
 		if len(point) == 2:
-			result.append([] + point)
-			start = [] + point
+			buffer.append(point[0])
+			buffer.append(point[1])
+			start = point
 		else:
-			p0 = sub_points(point[0], start)
-			p1 = sub_points(point[1], start)
-			p2 = sub_points(point[2], start)
-			points = _flat_segment([0.0, 0.0], p0, p1, p2, tlr)
-			for item in points:
-				p = add_points(item, start)
-				result.append(p)
-			start = [] + point[2]
-	return [result[0], result[1:], path[2]]
-
-def flat_paths(paths, tlr):
+			flat_segment_uniform(buffer, start, point[0], point[1], point[2],
+								numbers.next())
+			start = point[2]
+
+def flat_path(path, tlr, batched=False):
+	"""
+	Flattens path. In batched mode line segments numbers for all curve
+	segments of the path are estimated at once and curves are flattened
+	uniformly, otherwise adaptive subdivision is used.
+	"""
+	buffer = []
+	if batched:
+		_flat_path_batched(buffer, path, tlr)
+	else:
+		start = path[0]
+		for point in path[1]:
+			if len(point) == 2:
+				buffer.append(point[0])
+				buffer.append(point[1])
+				start = point
+			else:
+				flat_segment(buffer, start, point[0], point[1], point[2], tlr)
+				start = point[2]
+	items = iter(buffer)
+	return [[] + path[0], [[x, y] for x, y in izip(items, items)], path[2]]
+
+def flat_compact_paths(paths, tlr):
+	coords = paths.coords
+	result = CompactPaths()
+	new_coords = result.coords
+	new_nodes = result.nodes
+	start = None
+	index = 0
+	for node in paths.nodes:
+		if node & KIND_MASK == NODE_CURVE:
+			size = len(new_coords)
+			flat_segment(new_coords, start, coords[index:index + 2],
+						coords[index + 2:index + 4], coords[index + 4:index + 6],
+						tlr)
+			new_nodes.extend([NODE_LINE] * ((len(new_coords) - size) / 2))
+			start = coords[index + 4:index + 6]
+			index += 6
+		else:
+			start = coords[index:index + 2]
+			new_coords.extend(start)
+			new_nodes.append(node)
+			index += 2
+	return result
+
+def flat_paths(paths, tlr, batched=False):
+	if isinstance(paths, CompactPaths):
+		if batched:
+			return CompactPaths(flat_paths(paths.get_paths(), tlr, True))
+		return flat_compact_paths(paths, tlr)
 	result = []
 	for path in paths:
-		result.append(flat_path(path, tlr))
+		result.append(flat_path(path, tlr, batched))
 	return result
 
 #------------- generic Bezier math stuff -------------
 def apply_trafo_to_paths(paths, trafo):
+	"""
+	Applies trafo to all points of paths in single loop.
+	Compact paths are transformed as flat coordinates array.
+	"""
+	if isinstance(paths, CompactPaths):
+		return paths.apply_trafo(trafo)
+	m11, m21, m12, m22, dx, dy = trafo
 	new_paths = []
 	for path in paths:
-		new_paths.append(apply_trafo_to_path(path, trafo))
+		x, y = path[0]
+		new_points = []
+		append = new_points.append
+		for point in path[1]:
+			if len(point) == 2:
+				x0, y0 = point
+				append([m11 * x0 + m12 * y0 + dx, m21 * x0 + m22 * y0 + dy])
+			else:
+				(x1, y1), (x2, y2), (x3, y3), marker = point
+				append([[m11 * x1 + m12 * y1 + dx, m21 * x1 + m22 * y1 + dy],
+						[m11 * x2 + m12 * y2 + dx, m21 * x2 + m22 * y2 + dy],
+						[m11 * x3 + m12 * y3 + dx, m21 * x3 + m22 * y3 + dy],
+						marker])
+		new_paths.append([[m11 * x + m12 * y + dx, m21 * x + m22 * y + dy],
+						new_points, path[2]])
 	return new_paths
 
+def apply_trafo_to_paths_list(paths_list, trafo):
+	"""
+	Applies the same trafo to paths of many objects. Coordinates
+	of all compact paths are transformed by single batch.
+	"""
+	result = []
+	compact = []
+	coords = array('d')
+	for paths in paths_list:
+		if isinstance(paths, CompactPaths):
+			coords.extend(paths.coords)
+			new_paths = CompactPaths()
+			new_paths.nodes = paths.nodes[:]
+			compact.append((new_paths, len(paths.coords)))
+		else:
+			new_paths = apply_trafo_to_paths(paths, trafo)
+		result.append(new_paths)
+	if compact:
+		transform_coords(coords, trafo)
+		start = 0
+		for new_paths, size in compact:
+			new_paths.coords = coords[start:start + size]
+			start += size
+	return result
+
 def apply_trafo_to_path(path, trafo):
 	new_path = []
 	new_points = []
@@ -229,6 +420,119 @@ def bezier_base_point(point):
 	else:
 		return point[2]
 
+#------------- Bezier bbox engine -------------
+
+def get_cubic_extrema(v0, v1, v2, v3):
+	"""
+	Returns coordinate values of cubic Bezier segment (single axis)
+	at its derivative roots inside (0, 1) interval.
+	"""
+	a = v3 - 3.0 * v2 + 3.0 * v1 - v0
+	b = 2.0 * (v2 - 2.0 * v1 + v0)
+	c = v1 - v0
+	roots = []
+	if a == 0.0:
+		if b: roots.append(-c / b)
+	else:
+		disc = b * b - 4.0 * a * c
+		if disc < 0.0: return []
+		if b < 0.0:
+			q = -0.5 * (b - math.sqrt(disc))
+		else:
+			q = -0.5 * (b + math.sqrt(disc))
+		roots.append(q / a)
+		if q: roots.append(c / q)
+	values = []
+	for t in roots:
+		if 0.0 < t < 1.0:
+			mt = 1.0 - t
+			values.append(mt * mt * mt * v0 + 3.0 * mt * mt * t * v1 + \
+						3.0 * mt * t * t * v2 + t * t * t * v3)
+	return values
+
+def _add_curve_extrema(values, v0, v1, v2, v3):
+	#extrema are inside segment only if control points are outside
+	#of end points range
+	if v0 < v3:
+		if v0 <= v1 <= v3 and v0 <= v2 <= v3: return
+	elif v3 <= v1 <= v0 and v3 <= v2 <= v0: return
+	values += get_cubic_extrema(v0, v1, v2, v3)
+
+def get_paths_bbox(paths, trafo=None):
+	"""
+	Returns exact bbox of paths (list based or compact ones) transformed
+	by provided trafo, or None for empty paths. Curve extrema are
+	calculated analytically, so no cairo path is created.
+	"""
+	if isinstance(paths, CompactPaths):
+		return _get_compact_paths_bbox(paths, trafo)
+	m11, m21, m12, m22, dx, dy = trafo or const.NORMAL_TRAFO
+	xs = []
+	ys = []
+	for path in paths:
+		x, y = path[0]
+		x0 = m11 * x + m12 * y + dx
+		y0 = m21 * x + m22 * y + dy
+		xs.append(x0)
+		ys.append(y0)
+		for point in path[1]:
+			if len(point) == 2:
+				x, y = point
+				x0 = m11 * x + m12 * y + dx
+				y0 = m21 * x + m22 * y + dy
+			else:
+				x, y = point[0]
+				x1 = m11 * x + m12 * y + dx
+				y1 = m21 * x + m22 * y + dy
+				x, y = point[1]
+				x2 = m11 * x + m12 * y + dx
+				y2 = m21 * x + m22 * y + dy
+				x, y = point[2]
+				x3 = m11 * x + m12 * y + dx
+				y3 = m21 * x + m22 * y + dy
+				_add_curve_extrema(xs, x0, x1, x2, x3)
+				_add_curve_extrema(ys, y0, y1, y2, y3)
+				x0 = x3
+				y0 = y3
+			xs.append(x0)
+			ys.append(y0)
+	if not xs: return None
+	return [min(xs), min(ys), max(xs), max(ys)]
+
+def _get_compact_paths_bbox(paths, trafo=None):
+	coords = paths.coords
+	if trafo:
+		coords = coords[:]
+		transform_coords(coords, trafo)
+	xs = coords[0::2].tolist()
+	ys = coords[1::2].tolist()
+	index = 0
+	for node in paths.nodes:
+		if node & KIND_MASK == NODE_CURVE:
+			#control points are excluded from bbox values below
+			x0, y0, x1, y1, x2, y2, x3, y3 = coords[index - 2:index + 6]
+			_add_curve_extrema(xs, x0, x1, x2, x3)
+			_add_curve_extrema(ys, y0, y1, y2, y3)
+			xs[index / 2] = xs[index / 2 + 1] = x3
+			ys[index / 2] = ys[index / 2 + 1] = y3
+			index += 6
+		else:
+			index += 2
+	if not xs: return None
+	return [min(xs), min(ys), max(xs), max(ys)]
+
+def get_transformed_bbox(bbox, trafo):
+	"""
+	Returns exact bbox of transformed object if trafo has no rotation
+	and skew components, so bbox can be updated incrementally.
+	Otherwise returns None.
+	"""
+	m11, m21, m12, m22, dx, dy = trafo
+	if m21 or m12: return None
+	x0, y0, x1, y1 = bbox
+	return normalize_bbox([m11 * x0 + dx, m22 * y0 + dy,
+						m11 * x1 + dx, m22 * y1 + dy])
+
 def sum_bbox(bbox1, bbox2):
 	x0, y0, x1, y1 = bbox1
 	_x0, _y0, _x1, _y1 = bbox2
@@ -274,8 +578,34 @@ def rotate_point(center, point, angle):
 #------------- libcairo wrapper -------------
 
 def create_cpath(cache_paths):
+	if isinstance(cache_paths, CompactPaths):
+		return create_compact_cpath(cache_paths)
 	return libcairo.create_cpath(cache_paths)
 
+def create_compact_cpath(paths):
+	ctx = libcairo.get_context().ctx
+	ctx.set_matrix(libcairo.DIRECT_MATRIX)
+	ctx.new_path()
+	coords = paths.coords
+	closed = False
+	index = 0
+	for node in paths.nodes:
+		kind = node & KIND_MASK
+		if kind == NODE_START:
+			if closed: ctx.close_path()
+			closed = node & VALUE_MASK
+			ctx.new_sub_path()
+			ctx.move_to(coords[index], coords[index + 1])
+			index += 2
+		elif kind == NODE_LINE:
+			ctx.line_to(coords[index], coords[index + 1])
+			index += 2
+		else:
+			ctx.curve_to(*coords[index:index + 6])
+			index += 6
+	if closed: ctx.close_path()
+	return ctx.copy_path()
+
 def copy_cpath(cache_cpath):
 	return libcairo.copy_cpath(cache_cpath)
 
@@ -382,10 +712,8 @@ def get_circle_path(angle1, angle2, circle_type):
 			paths[0][2] = const.CURVE_OPENED
 			return paths
 
-	libcairo.CTX.set_matrix(libcairo.DIRECT_MATRIX)
-	libcairo.CTX.new_path()
-	libcairo.CTX.arc(0.5, 0.5, 0.5, angle1, angle2)
-	cairo_path = libcairo.CTX.copy_path()
+	context = libcairo.get_context()
+	cairo_path = context.create_arc_cpath(0.5, 0.5, 0.5, angle1, angle2)
 	paths = libcairo._libcairo.get_path_from_cpath(cairo_path)
 	if circle_type:
 		start_point = [] + paths[0][0]
@@ -0,0 +1,78 @@
+/* _libgeom - small module which provides fast routines for compact paths.
+ *
+ * Copyright (C) 2013 by Igor E.Novikov
+ *
+ * This program is free software: you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License as published by
+ * the Free Software Foundation, either version 3 of the License, or
+ * (at your option) any later version.
+
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program.  If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include <Python.h>
+
+/* Applies affine transformation in place to array('d')
+ * of coordinates (x0, y0, x1, y1, ...).
+ */
+static PyObject *
+libgeom_ApplyTrafoToCoords (PyObject *self, PyObject *args) {
+
+	double m11, m12, m21, m22, dx, dy, x, y;
+	double *coords;
+	void *buffer;
+	Py_ssize_t length, i;
+	PyObject *pycoords, *typecode;
+	int is_double;
+
+	if (!PyArg_ParseTuple(args, "Odddddd",
+			&pycoords, &m11, &m21, &m12, &m22, &dx, &dy)) {
+		return NULL;
+	}
+
+	/* array objects do not report item format through buffer
+	 * interface, so array typecode is checked instead */
+	typecode = PyObject_GetAttrString(pycoords, "typecode");
+	is_double = typecode != NULL && PyString_Check(typecode) &&
+			strcmp(PyString_AsString(typecode), "d") == 0;
+	Py_XDECREF(typecode);
+	if (!is_double) {
+		PyErr_SetString(PyExc_TypeError, "array of doubles is expected");
+		return NULL;
+	}
+
+	if (PyObject_AsWriteBuffer(pycoords, &buffer, &length) < 0) {
+		return NULL;
+	}
+
+	coords = (double *) buffer;
+	length = length / sizeof(double);
+
+	for (i = 0; i + 1 < length; i += 2) {
+		x = coords[i];
+		y = coords[i + 1];
+		coords[i] = m11 * x + m12 * y + dx;
+		coords[i + 1] = m21 * x + m22 * y + dy;
+	}
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static
+PyMethodDef libgeom_methods[] = {
+	{"apply_trafo", libgeom_ApplyTrafoToCoords, METH_VARARGS},
+	{NULL, NULL}
+};
+
+void
+init_libgeom(void)
+{
+    Py_InitModule("_libgeom", libgeom_methods);
+}
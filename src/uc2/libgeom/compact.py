@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides compact paths representation. Coordinates of all
+nodes are stored in flat array of doubles (x0, y0, x1, y1, ...),
+node types are stored in byte array, one byte per node:
+
+start node - NODE_START | end_marker, one point
+line node - NODE_LINE, one point
+curve node - NODE_CURVE | marker, three points (two control points
+and end point)
+
+Conversion from and to list based paths format (see libgeom package
+docstring) is lossless except ints are stored as floats.
+"""
+
+from array import array
+from itertools import izip
+
+try:
+	import _libgeom
+except ImportError:
+	_libgeom = None
+
+NODE_START = 0x00
+NODE_LINE = 0x10
+NODE_CURVE = 0x20
+KIND_MASK = 0xf0
+VALUE_MASK = 0x0f
+
+def transform_coords(coords, trafo):
+	"""
+	Applies trafo in place to all points of flat coordinates array
+	by single C loop, or by batched Python loop if _libgeom
+	extension is not built.
+	"""
+	m11, m21, m12, m22, dx, dy = trafo
+	if not _libgeom is None:
+		_libgeom.apply_trafo(coords, m11, m21, m12, m22, dx, dy)
+		return
+	xs = coords[0::2]
+	ys = coords[1::2]
+	coords[0::2] = array('d', [m11 * x + m12 * y + dx \
+							for x, y in izip(xs, ys)])
+	coords[1::2] = array('d', [m21 * x + m22 * y + dy \
+							for x, y in izip(xs, ys)])
+
+class CompactPaths:
+	"""
+	Array backed paths. Object is iterable over list based paths,
+	so it can be used where paths are only read.
+	"""
+
+	def __init__(self, paths=[]):
+		self.coords = array('d')
+		self.nodes = array('B')
+		for path in paths:
+			self.append_path(path)
+
+	def append_path(self, path):
+		coords = self.coords
+		nodes = self.nodes
+		coords.extend(path[0])
+		nodes.append(NODE_START | path[2])
+		for point in path[1]:
+			if len(point) == 2:
+				coords.extend(point)
+				nodes.append(NODE_LINE)
+			else:
+				coords.extend(point[0])
+				coords.extend(point[1])
+				coords.extend(point[2])
+				nodes.append(NODE_CURVE | point[3])
+
+	def __len__(self):
+		return self.nodes.count(NODE_START) + \
+			self.nodes.count(NODE_START | 1)
+
+	def __iter__(self):
+		coords = self.coords
+		path = None
+		index = 0
+		for node in self.nodes:
+			kind = node & KIND_MASK
+			if kind == NODE_START:
+				if not path is None: yield path
+				path = [[coords[index], coords[index + 1]], [],
+					node & VALUE_MASK]
+				index += 2
+			elif kind == NODE_LINE:
+				path[1].append([coords[index], coords[index + 1]])
+				index += 2
+			else:
+				path[1].append([[coords[index], coords[index + 1]],
+								[coords[index + 2], coords[index + 3]],
+								[coords[index + 4], coords[index + 5]],
+								node & VALUE_MASK])
+				index += 6
+		if not path is None: yield path
+
+	def __eq__(self, other):
+		if not isinstance(other, CompactPaths): return False
+		return self.nodes == other.nodes and self.coords == other.coords
+
+	def __ne__(self, other):
+		return not self.__eq__(other)
+
+	def get_paths(self):
+		"""
+		Returns list based paths.
+		"""
+		return list(self)
+
+	def copy(self):
+		result = CompactPaths()
+		result.coords = self.coords[:]
+		result.nodes = self.nodes[:]
+		return result
+
+	def apply_trafo(self, trafo):
+		"""
+		Returns new transformed paths.
+		"""
+		result = self.copy()
+		transform_coords(result.coords, trafo)
+		return result
+
+	def get_bbox(self):
+		"""
+		Returns bbox of all nodes and control points
+		or None for empty paths.
+		"""
+		if not self.coords: return None
+		xs = self.coords[0::2]
+		ys = self.coords[1::2]
+		return [min(xs), min(ys), max(xs), max(ys)]
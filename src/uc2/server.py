@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides long-running translation server. Translation jobs are
+accepted over localhost HTTP and processed by warm worker processes:
+
+POST /convert?from=cdr&to=svg   request body is a source file content,
+                                response body is a translated file content
+GET /status                     returns server statistics
+
+Each worker holds initialized application instance (config, appdata,
+color manager with its transform cache) and is recycled after provided
+number of jobs to cap memory growth.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import Queue
+import urlparse
+import BaseHTTPServer
+import SocketServer
+
+from uc2 import _, cms, events, msgconst, uc2const
+from uc2.formats import get_saver
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8100
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_JOBS = 100
+DEFAULT_MAX_SIZE = 100
+READ_CHUNK_SIZE = 65536
+
+class ServerBusyError(Exception): pass
+class JobTimeoutError(Exception): pass
+
+def convert_blob(app, work_dir, data, input_ext, output_ext):
+	"""
+	Translates file content using temporary files in worker directory.
+	Returns (True, translated content) or (False, error message).
+	"""
+	input_file = os.path.join(work_dir, 'job.' + input_ext)
+	output_file = os.path.join(work_dir, 'job_out.' + output_ext)
+	try:
+		fileobj = open(input_file, 'wb')
+		fileobj.write(data)
+		fileobj.close()
+		#job file is rewritten for every job, so its detected
+		#format is not cached
+		result, msg = app.translate(input_file, output_file, use_cache=False)
+		if result:
+			fileobj = open(output_file, 'rb')
+			msg = fileobj.read()
+			fileobj.close()
+	except:
+		result = False
+		msg = '%s %s' % (sys.exc_info()[0], sys.exc_info()[1])
+	for path in (input_file, output_file):
+		if os.path.lexists(path):
+			os.remove(path)
+	return result, msg
+
+def worker_loop(conn, app_class, path, max_jobs, verbose=False):
+	"""
+	Worker process routine. Initializes application once and translates
+	received jobs until max_jobs limit is reached or None job is received.
+	"""
+	app = app_class(path)
+	app.default_cms = cms.ColorManager()
+	if verbose:
+		events.connect(events.MESSAGES, app.verbose)
+	work_dir = tempfile.mkdtemp(prefix='uc2_worker_')
+	jobs = 0
+	try:
+		while not max_jobs or jobs < max_jobs:
+			try:
+				job = conn.recv()
+			except EOFError:
+				break
+			if job is None: break
+			conn.send(convert_blob(app, work_dir, *job))
+			jobs += 1
+	finally:
+		shutil.rmtree(work_dir, True)
+		conn.close()
+
+
+class ConversionWorker:
+	"""
+	Represents worker process on server side.
+	"""
+
+	def __init__(self, app_class, path, max_jobs, verbose=False):
+		self.jobs = 0
+		self.max_jobs = max_jobs
+		self.conn, child_conn = multiprocessing.Pipe()
+		args = (child_conn, app_class, path, max_jobs, verbose)
+		self.process = multiprocessing.Process(target=worker_loop, args=args)
+		self.process.daemon = True
+		self.process.start()
+		child_conn.close()
+
+	def execute(self, job, timeout):
+		self.jobs += 1
+		self.conn.send(job)
+		if not self.conn.poll(timeout):
+			raise JobTimeoutError(_('Translation timeout is exceeded'))
+		return self.conn.recv()
+
+	def is_exhausted(self):
+		if self.max_jobs and self.jobs >= self.max_jobs:
+			return True
+		return not self.process.is_alive()
+
+	def stop(self, force=False):
+		if force:
+			self.process.terminate()
+		elif self.process.is_alive():
+			try:
+				self.conn.send(None)
+			except IOError:
+				pass
+		self.process.join()
+		self.conn.close()
+
+
+class WorkerPool:
+	"""
+	Pool of warm worker processes with bounded jobs queue.
+	"""
+
+	def __init__(self, app, workers=0, queue_size=DEFAULT_QUEUE_SIZE,
+				timeout=DEFAULT_TIMEOUT, max_jobs=DEFAULT_MAX_JOBS,
+				verbose=False):
+		if workers < 1:
+			workers = multiprocessing.cpu_count()
+		self.app_class = app.__class__
+		self.path = app.path
+		self.timeout = timeout
+		self.max_jobs = max_jobs
+		self.verbose = verbose
+		self.workers_num = workers
+		self.slots = threading.BoundedSemaphore(workers + queue_size)
+		self.idle = Queue.Queue()
+		self.lock = threading.Lock()
+		self.stats = {'done': 0, 'failed': 0, 'timeouts': 0,
+					'rejected': 0, 'recycled': 0}
+		for i in range(workers):
+			self.idle.put(self._spawn())
+
+	def _spawn(self):
+		return ConversionWorker(self.app_class, self.path,
+							self.max_jobs, self.verbose)
+
+	def _count(self, key):
+		self.lock.acquire()
+		self.stats[key] += 1
+		self.lock.release()
+
+	def convert(self, data, input_ext, output_ext):
+		"""
+		Translates file content by first idle worker.
+		Returns (True, translated content) or (False, error message).
+		Raises ServerBusyError if jobs queue is full and JobTimeoutError
+		if the job was not completed in time.
+		"""
+		if not self.slots.acquire(False):
+			self._count('rejected')
+			raise ServerBusyError(_('Jobs queue is full'))
+		try:
+			worker = self.idle.get()
+			try:
+				result, msg = worker.execute((data, input_ext, output_ext),
+											self.timeout)
+			except JobTimeoutError:
+				self._count('timeouts')
+				worker.stop(True)
+				worker = self._spawn()
+				raise
+			except (EOFError, IOError):
+				result = False
+				msg = _('Worker process is terminated unexpectedly')
+			finally:
+				if worker.is_exhausted():
+					self._count('recycled')
+					worker.stop()
+					worker = self._spawn()
+				self.idle.put(worker)
+		finally:
+			self.slots.release()
+
+		if result: self._count('done')
+		else: self._count('failed')
+		return result, msg
+
+	def get_status(self):
+		self.lock.acquire()
+		stats = self.stats.copy()
+		self.lock.release()
+		stats['workers'] = self.workers_num
+		stats['idle'] = self.idle.qsize()
+		return stats
+
+	def close(self):
+		for i in range(self.workers_num):
+			self.idle.get().stop()
+
+
+class ConversionRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+	server_version = 'UniConvertor/2.0'
+
+	def do_GET(self):
+		if not urlparse.urlparse(self.path).path == '/status':
+			self.send_text(404, _('Unknown request'))
+			return
+		stats = self.server.pool.get_status()
+		items = stats.items()
+		items.sort()
+		lines = ['%s: %s' % (key, value) for key, value in items]
+		self.send_text(200, '\n'.join(lines) + '\n')
+
+	def do_POST(self):
+		url = urlparse.urlparse(self.path)
+		if not url.path == '/convert':
+			self.send_text(404, _('Unknown request'))
+			return
+		query = urlparse.parse_qs(url.query)
+		input_ext = query.get('from', [''])[0].lower()
+		output_ext = query.get('to', [''])[0].lower()
+		if not input_ext.isalnum() or not output_ext.isalnum():
+			self.send_text(400, _('Source and target formats are required'))
+			return
+		if get_saver('file.' + output_ext) is None:
+			msg = _("Output file format of '%s' is unsupported.") % (output_ext)
+			self.send_text(400, msg)
+			return
+		try:
+			size = int(self.headers.getheader('content-length', 0))
+		except ValueError:
+			size = 0
+		if size <= 0:
+			self.send_text(400, _('Empty request body'))
+			return
+		if size > self.server.max_size:
+			self.send_text(413, _('Request body is too large'))
+			return
+		data = self.read_body(size)
+		if data is None:
+			self.send_text(400, _('Request body is incomplete'))
+			return
+
+		try:
+			result, msg = self.server.pool.convert(data, input_ext, output_ext)
+		except ServerBusyError:
+			self.send_text(503, _('Server is busy, try again later'))
+			return
+		except JobTimeoutError:
+			self.send_text(504, _('Translation timeout is exceeded'))
+			return
+
+		if not result:
+			self.send_text(422, msg)
+			return
+		mime = uc2const.MIMES.get(output_ext, 'application/octet-stream')
+		self.send_data(200, msg, mime)
+
+	def read_body(self, size):
+		"""
+		Reads request body by bounded chunks. Returns None if
+		connection is closed before whole body is received.
+		"""
+		chunks = []
+		while size > 0:
+			chunk = self.rfile.read(min(size, READ_CHUNK_SIZE))
+			if not chunk:
+				return None
+			chunks.append(chunk)
+			size -= len(chunk)
+		return ''.join(chunks)
+
+	def send_text(self, code, text):
+		self.send_data(code, text, 'text/plain')
+
+	def send_data(self, code, data, mime):
+		self.send_response(code)
+		self.send_header('Content-Type', mime)
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message(self, format, *args):
+		msg = '%s %s' % (self.address_string(), format % args)
+		events.emit(events.MESSAGES, msgconst.INFO, msg)
+
+
+class ConversionServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def __init__(self, address, pool, max_size=DEFAULT_MAX_SIZE * 1048576):
+		self.pool = pool
+		#Maximum request body size in bytes
+		self.max_size = max_size
+		BaseHTTPServer.HTTPServer.__init__(self, address,
+										ConversionRequestHandler)
+
+
+def serve(app, options={}, verbose=False):
+	"""
+	Starts translation server and processes requests until interrupted.
+	"""
+	host = options.get('host', DEFAULT_HOST)
+	port = int(options.get('port', DEFAULT_PORT))
+	pool = WorkerPool(app,
+					workers=int(options.get('workers', 0)),
+					queue_size=int(options.get('queue', DEFAULT_QUEUE_SIZE)),
+					timeout=float(options.get('timeout', DEFAULT_TIMEOUT)),
+					max_jobs=int(options.get('max_jobs', DEFAULT_MAX_JOBS)),
+					verbose=verbose)
+	max_size = int(options.get('max_size', DEFAULT_MAX_SIZE)) * 1048576
+	server = ConversionServer((host, port), pool, max_size)
+	print _('Translation server is started on http://%s:%d/') % (host, port)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.server_close()
+	pool.close()
+	print _('Translation server is stopped')
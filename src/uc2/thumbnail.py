@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The module provides thumbnail extraction. Preview image embedded into
+CDR file (DISP chunk) or CDRZ archive (metadata/thumbnails member) is
+located without document model building and saved as PNG file.
+If there is no embedded preview, the document is loaded and first page
+is rendered in low resolution.
+"""
+
+import sys
+import zlib
+import struct
+from zipfile import ZipFile
+
+from uc2 import _, events, msgconst
+from uc2.formats import get_loader
+from uc2.formats.generic import get_file_header, ZIP_SIGNATURE
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+BMP_SIGNATURE = 'BM'
+BMP_FILEHEADER_SIZE = 14
+DIB_HEADER = struct.Struct('<IiiHHII')
+BI_RGB = 0
+
+CDRZ_THUMBNAILS = 'metadata/thumbnails/'
+DEFAULT_SIZE = 128
+
+def find_riff_chunk(path, identifier):
+	"""
+	Returns content of first top level RIFF chunk with provided identifier
+	or None. Chunk headers are walked by seeking, so lists (including
+	compressed ones) are neither read nor inflated.
+	"""
+	fileobj = open(path, 'rb')
+	try:
+		header = fileobj.read(12)
+		if len(header) < 12 or not header[:4] == 'RIFF':
+			return None
+		limit = struct.unpack('<I', header[4:8])[0] + 8
+		position = 12
+		while position + 8 <= limit:
+			fileobj.seek(position)
+			header = fileobj.read(8)
+			if len(header) < 8: break
+			size = struct.unpack('<I', header[4:])[0]
+			if header[:4] == identifier:
+				return fileobj.read(size)
+			position += 8 + size + (size & 1)
+	finally:
+		fileobj.close()
+	return None
+
+def find_zip_thumbnail(path):
+	"""
+	Returns content of first image in CDRZ thumbnails folder or None.
+	"""
+	archive = ZipFile(path, 'r')
+	try:
+		for name in archive.namelist():
+			if name.startswith(CDRZ_THUMBNAILS) and not name[-1] == '/':
+				return archive.read(name)
+	finally:
+		archive.close()
+	return None
+
+def extract_preview(path):
+	"""
+	Returns embedded preview image of CDR or CDRZ file as PNG data,
+	or None if there is no preview or its image format is unsupported.
+	"""
+	header = get_file_header(path, 4)
+	if header == 'RIFF':
+		data = find_riff_chunk(path, 'DISP')
+	elif header == ZIP_SIGNATURE:
+		data = find_zip_thumbnail(path)
+	else:
+		return None
+	if not data:
+		return None
+	return image_to_png(data)
+
+def image_to_png(data):
+	"""
+	Converts PNG, BMP file or headerless DIB data into PNG data.
+	Returns None for unsupported image.
+	"""
+	if data[:8] == PNG_SIGNATURE:
+		return data
+	if data[:2] == BMP_SIGNATURE:
+		return dib_to_png(data[BMP_FILEHEADER_SIZE:])
+	#DISP chunk content may be prefixed by 4 bytes field
+	for offset in (0, 4):
+		if data[offset:offset + 4] == struct.pack('<I', 40):
+			return dib_to_png(data[offset:])
+	return None
+
+def dib_to_png(data):
+	"""
+	Converts uncompressed Windows DIB (BITMAPINFOHEADER, palette and
+	pixels) into PNG data. Returns None for unsupported bitmap.
+	"""
+	if len(data) < DIB_HEADER.size:
+		return None
+	header_size, width, height, planes, bitcount, compression, imagesize = \
+			DIB_HEADER.unpack(data[:DIB_HEADER.size])
+	if not compression == BI_RGB or not bitcount in (1, 4, 8, 24, 32):
+		return None
+	if width <= 0 or not height:
+		return None
+	top_down = height < 0
+	height = abs(height)
+
+	offset = header_size
+	palette = []
+	if bitcount <= 8:
+		colors = struct.unpack('<I', data[32:36])[0] or 1 << bitcount
+		for i in range(colors):
+			b, g, r = data[offset + 4 * i:offset + 4 * i + 3]
+			palette.append(r + g + b)
+		offset += 4 * colors
+	stride = (width * bitcount + 31) / 32 * 4
+	if len(data) < offset + stride * height:
+		return None
+
+	rows = []
+	for i in range(height):
+		start = offset + stride * i
+		row = data[start:start + stride]
+		if bitcount == 24:
+			pixels = [row[j + 2] + row[j + 1] + row[j] \
+					for j in range(0, 3 * width, 3)]
+		elif bitcount == 32:
+			pixels = [row[j + 2] + row[j + 1] + row[j] \
+					for j in range(0, 4 * width, 4)]
+		else:
+			mask = (1 << bitcount) - 1
+			pixels = []
+			for j in range(width):
+				bit = j * bitcount
+				index = ord(row[bit / 8]) >> (8 - bitcount - bit % 8) & mask
+				pixels.append(palette[min(index, len(palette) - 1)])
+		rows.append('\0' + ''.join(pixels))
+	if not top_down:
+		rows.reverse()
+	return make_png(width, height, ''.join(rows))
+
+def make_png_chunk(identifier, data):
+	crc = zlib.crc32(identifier + data) & 0xffffffff
+	return struct.pack('>I', len(data)) + identifier + data + \
+		struct.pack('>I', crc)
+
+def make_png(width, height, rows):
+	"""
+	Creates 8-bit RGB PNG data from filtered scanlines.
+	"""
+	ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+	return PNG_SIGNATURE + make_png_chunk('IHDR', ihdr) + \
+		make_png_chunk('IDAT', zlib.compress(rows, 6)) + \
+		make_png_chunk('IEND', '')
+
+def render_preview(appdata, path, output_file, size=DEFAULT_SIZE):
+	"""
+	Loads document and renders its first page into PNG file
+	in low resolution.
+	"""
+	import cairo
+	from uc2.formats.pdxf.crenderer import CairoRenderer
+
+	loader = get_loader(path)
+	if loader is None:
+		msg = _("Input file format of '%s' is unsupported.") % (path)
+		raise IOError(msg)
+	doc = loader(appdata, path)
+	try:
+		page = doc.methods.get_page()
+		width, height = page.page_format[1]
+		scale = float(size) / max(width, height, 1.0)
+		img_width = max(1, int(round(width * scale)))
+		img_height = max(1, int(round(height * scale)))
+
+		surface = cairo.ImageSurface(cairo.FORMAT_RGB24, img_width, img_height)
+		ctx = cairo.Context(surface)
+		ctx.set_source_rgb(1.0, 1.0, 1.0)
+		ctx.paint()
+		ctx.set_matrix(cairo.Matrix(scale, 0.0, 0.0, -scale,
+								img_width / 2.0, img_height / 2.0))
+		#curves are flattened coarsely, it is enough for low resolution
+		ctx.set_tolerance(1.0)
+		renderer = CairoRenderer(doc.cms)
+		for layer in page.childs:
+			renderer.render(ctx, layer.childs)
+		surface.write_to_png(output_file)
+	finally:
+		doc.close()
+
+def save_thumbnail(appdata, path, output_file, size=DEFAULT_SIZE):
+	"""
+	Saves preview of the file as PNG file. Embedded preview is used
+	if any, otherwise the document is rendered.
+	Returns True if embedded preview was used.
+	"""
+	try:
+		data = extract_preview(path)
+	except:
+		data = None
+		msg = _('Cannot read embedded preview of %s') % (path)
+		msg += '\n%s' % (sys.exc_info()[1])
+		events.emit(events.MESSAGES, msgconst.WARNING, msg)
+	if not data is None:
+		msg = _('Embedded preview is found in %s') % (path)
+		events.emit(events.MESSAGES, msgconst.OK, msg)
+		fileobj = open(output_file, 'wb')
+		fileobj.write(data)
+		fileobj.close()
+		return True
+	msg = _('Embedded preview is not found, rendering %s') % (path)
+	events.emit(events.MESSAGES, msgconst.INFO, msg)
+	render_preview(appdata, path, output_file, size)
+	return False
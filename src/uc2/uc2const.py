@@ -211,6 +211,9 @@ MIMES = {
 	'tif':'image/tiff',
 	'tiff':'image/tiff',
 	'png':'image/png',
+	'jpg':'image/jpeg',
+	'jpeg':'image/jpeg',
+	'gif':'image/gif',
 	'eps':'image/eps',
 	'icc':'application/vnd.iccprofile',
 	'icm':'application/vnd.iccprofile',
@@ -16,13 +16,21 @@
 #	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import unittest
+import cdr_testsuite
 import cms_testsuite
 import _libimg_testsuite
 import image_testsuite
+import libgeom_testsuite
+import pdxf_testsuite
+import riff_testsuite
 
 suite = unittest.TestSuite()
+suite.addTest(cdr_testsuite.get_suite())
 suite.addTest(cms_testsuite.get_suite())
 suite.addTest(_libimg_testsuite.get_suite())
 suite.addTest(image_testsuite.get_suite())
+suite.addTest(libgeom_testsuite.get_suite())
+suite.addTest(pdxf_testsuite.get_suite())
+suite.addTest(riff_testsuite.get_suite())
 
 unittest.TextTestRunner(verbosity=2).run(suite)
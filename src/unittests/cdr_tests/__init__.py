@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#	
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#	
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#	
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from zipfile import ZipFile
+from copy import deepcopy
+
+from uc2 import uc2const
+from uc2 import formats, libgeom, thumbnail
+from uc2.formats.cdr import utils, sniff_cdr
+from uc2.formats.cdrz import sniff_cdrz
+from uc2.formats.cdr.const import CDR9, CDR_COLOR_CMYK, CDR_COLOR_REGISTRATION
+from uc2.formats.cdr.model import CdrFillProperty, CdrUniObject, CDR_CURVE
+from uc2.formats.cdr.cdr_translators import CDR_to_PDXF_Translator
+from uc2.formats.cdr.cdr_filters import CDR_Loader, CDR_Saver
+from uc2.formats.cdr.cdr_config import CDR_Config
+from uc2.formats.riff.model import RiffUnparsedList
+from riff_tests import make_chunk, make_list, make_cmpr_list
+
+class StyledObject:
+	style_id = None
+	fill_id = '01'
+	outl_id = None
+
+class TestStyleSharing(unittest.TestCase):
+
+	def test01_shared_values(self):
+		translator = CDR_to_PDXF_Translator()
+		translator.shared_values = {}
+		fill = [0, 1, ['CMYK', [0.0, 0.5, 1.0, 0.0], 1.0, '']]
+		shared = translator.share(fill)
+		self.assertEqual(fill, shared)
+		self.assertTrue(shared is translator.share(deepcopy(fill)))
+		self.assertTrue(shared[2] is translator.share(fill[2]))
+		self.assertFalse(shared is translator.share([0, 1, []]))
+
+	def test02_object_styles(self):
+		translator = CDR_to_PDXF_Translator()
+		translator.shared_values = {}
+		translator.styles = {}
+		fill = [0, 1, ['CMYK', [0.0, 0.5, 1.0, 0.0], 1.0, '']]
+		translator.fill_props = {'01': translator.share(fill)}
+		obj = StyledObject()
+		style = translator.get_style(obj)
+		other = translator.get_style(obj)
+		self.assertEqual([fill, [], [], []], style)
+		self.assertFalse(style is other)
+		self.assertFalse(style[0] is other[0])
+		self.assertFalse(style[0][2][1] is other[0][2][1])
+		style[0][1] = 2
+		style[0][2][1][0] = 1.0
+		style[1].append(1.0)
+		self.assertEqual([fill, [], [], []], other)
+		self.assertEqual([fill, [], [], []], translator.get_style(obj))
+
+class TestPropertyDecoding(unittest.TestCase):
+
+	def make_fill(self, fill_id, color_bytes):
+		data = fill_id + '\x01' + '\0' * 3 + chr(CDR_COLOR_CMYK) + '\0' * 7
+		data += color_bytes
+		obj = CdrFillProperty('fild' + struct.pack('<I', len(data)) + data)
+		obj.version = CDR9
+		obj.update()
+		return obj
+
+	def test01_color_cache(self):
+		cache = {}
+		color = utils.parse_cdr_color(CDR_COLOR_CMYK, '\x64\x32\0\0', cache)
+		self.assertEqual(['CMYK', [1.0, 0.5, 0.0, 0.0], 1.0, ''], color)
+		self.assertEqual(1, len(cache))
+		color[1][0] = 0.0
+		other = utils.parse_cdr_color(CDR_COLOR_CMYK, '\x64\x32\0\0', cache)
+		self.assertEqual(['CMYK', [1.0, 0.5, 0.0, 0.0], 1.0, ''], other)
+		self.assertFalse(color[1] is other[1])
+		color = utils.parse_cdr_color(CDR_COLOR_REGISTRATION, '\0' * 4, cache)
+		color[1][0].append(1.0)
+		other = utils.parse_cdr_color(CDR_COLOR_REGISTRATION, '\0' * 4, cache)
+		self.assertEqual([0.0, 0.0, 0.0], other[1][0])
+
+	def test02_lazy_fill(self):
+		obj = self.make_fill('\x01\0\0\0', '\0\0\x64\0')
+		self.assertEqual('01000000', obj.fill_id)
+		self.assertFalse(obj.decoded)
+		self.assertFalse(obj.__dict__.has_key('fill_color'))
+		self.assertEqual([0.0, 0.0, 1.0, 0.0], obj.fill_color[1])
+		self.assertTrue(obj.decoded)
+		self.assertEqual(1, obj.fill_type)
+
+	def test04_decoding_errors(self):
+		obj = self.make_fill('\x01\0\0\0', '\0\0\x64\0')
+		obj.color_cache = []
+		self.assertRaises(RuntimeError, getattr, obj, 'fill_color')
+		self.assertFalse(obj.decoded)
+		self.assertFalse(obj.__dict__.has_key('fill_type'))
+
+	def test03_translator_decoding(self):
+		translator = CDR_to_PDXF_Translator()
+		translator.shared_values = {}
+		translator.fill_records = {}
+		translator.fill_props = {}
+		used = self.make_fill('\x01\0\0\0', '\0\0\x64\0')
+		unused = self.make_fill('\x02\0\0\0', '\0\x64\0\0')
+		translator.add_fill_prop(used)
+		translator.add_fill_prop(unused)
+		fill = translator.get_fill_prop(used.fill_id)
+		self.assertEqual(used.fill_color, fill[2])
+		self.assertTrue(fill is translator.get_fill_prop(used.fill_id))
+		self.assertEqual([], translator.get_fill_prop('ffffffff'))
+		self.assertFalse(unused.decoded)
+
+class LoaderPresenter:
+
+	def __init__(self, cnf):
+		self.config = CDR_Config()
+		self.config.update(cnf)
+
+class TestPageSelection(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.cdr')
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def make_page(self, number):
+		return 'LIST' + struct.pack('<I', len(self.blocksizes)) + 'page' + \
+			'mcfg' + struct.pack('<I', len(self.blocksizes) + 1) + chr(number) + '\0'
+
+	def test01_compressed_pages(self):
+		#master page, pages 1 and 2 in compressed list, page 3
+		self.blocksizes = []
+		childs = []
+		for number in (1, 2):
+			childs.append(self.make_page(number))
+			self.blocksizes += [14, 1]
+		cmpr = make_cmpr_list(childs, self.blocksizes)
+		pages = [make_list('page', [make_chunk('mcfg', chr(number))]) \
+				for number in (0, 3)]
+		data = make_list('CDR9', [pages[0], cmpr, pages[1]], 'RIFF')
+		fileobj = open(self.path, 'wb')
+		fileobj.write(data)
+		fileobj.close()
+		for threads in (1, 3):
+			presenter = LoaderPresenter({'pages':'1', 'inflate_threads':threads})
+			obj = CDR_Loader().load(presenter, self.path)
+			loaded = []
+			for page in [obj.childs[0]] + obj.childs[1].childs + [obj.childs[2]]:
+				if not isinstance(page, RiffUnparsedList):
+					loaded.append(ord(page.childs[0].chunk[8]))
+			self.assertEqual([0, 1], loaded)
+
+class TestCdrSaving(unittest.TestCase):
+
+	def setUp(self):
+		self.paths = []
+		for i in range(2):
+			fd, path = tempfile.mkstemp(suffix='.cdr')
+			os.close(fd)
+			self.paths.append(path)
+		self.data = make_list('CDR9', [make_chunk('vrsn', 'ab'),
+					make_list('page', [make_chunk('mcfg', 'z' * 100)])], 'RIFF')
+		fileobj = open(self.paths[0], 'wb')
+		fileobj.write(self.data)
+		fileobj.close()
+
+	def tearDown(self):
+		for path in self.paths:
+			os.remove(path)
+
+	def load(self):
+		presenter = LoaderPresenter({'mmap_loading':True})
+		presenter.loader = CDR_Loader()
+		presenter.model = presenter.loader.load(presenter, self.paths[0])
+		return presenter
+
+	def read(self, path):
+		fileobj = open(path, 'rb')
+		data = fileobj.read()
+		fileobj.close()
+		return data
+
+	def test01_save_as(self):
+		presenter = self.load()
+		mcfg = presenter.model.childs[1].childs[0]
+		CDR_Saver().save(presenter, self.paths[1])
+		self.assertFalse(mcfg.chunk_view is None)
+		self.assertEqual(self.data, self.read(self.paths[1]))
+
+	def test02_overwrite_source(self):
+		presenter = self.load()
+		mcfg = presenter.model.childs[1].childs[0]
+		CDR_Saver().save(presenter, self.paths[0])
+		self.assertTrue(mcfg.chunk_view is None)
+		self.assertEqual(self.data, self.read(self.paths[0]))
+
+class TestObjectDecoding(unittest.TestCase):
+
+	def test01_decoding_errors(self):
+		obj = CdrUniObject('LIST' + struct.pack('<I', 4) + 'obj ')
+		obj.obj_type = CDR_CURVE
+		self.assertRaises(RuntimeError, getattr, obj, 'trafo')
+		self.assertFalse(obj.decoded)
+		obj.obj_type = None
+		self.assertEqual(None, obj.fill_id)
+		self.assertTrue(obj.decoded)
+		self.assertRaises(AttributeError, getattr, obj, 'trafo')
+
+class TestPltTranslation(unittest.TestCase):
+
+	def apply(self, trafo, point):
+		m11, m21, m12, m22, dx, dy = trafo
+		x, y = point
+		return [m11 * x + m12 * y + dx, m21 * x + m22 * y + dy]
+
+	def test01_multiply_trafo(self):
+		trafo1 = [0.5, 0.25, -1.0, 2.0, 10.0, -3.0]
+		trafo2 = [3.0, -1.0, 0.5, 1.5, -2.0, 7.0]
+		trafo = libgeom.multiply_trafo(trafo1, trafo2)
+		for point in ([0.0, 0.0], [1.0, -2.0], [13.5, 4.25]):
+			expected = self.apply(trafo2, self.apply(trafo1, point))
+			result = self.apply(trafo, point)
+			self.assertAlmostEqual(expected[0], result[0])
+			self.assertAlmostEqual(expected[1], result[1])
+
+class TestFormatDetection(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.pdxf')
+		os.write(fd, 'RIFF' + struct.pack('<I', 4) + 'CDR9')
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def test01_sniffers(self):
+		self.assertTrue(sniff_cdr('RIFF\x04\0\0\0CDR9'))
+		self.assertTrue(sniff_cdr('RIFF\x04\0\0\0CDRD'))
+		self.assertFalse(sniff_cdr('RIFF\x04\0\0\0WAVE'))
+		self.assertFalse(sniff_cdrz('RIFF\x04\0\0\0CDR9', self.path))
+
+	def test02_detection(self):
+		format = formats.detect_format(self.path,
+									[uc2const.PDXF, uc2const.CDR])
+		self.assertEqual(uc2const.CDR, format)
+		key = [item for item in formats.DETECTION_CACHE.keys() \
+			if item[0] == self.path][0]
+		formats.DETECTION_CACHE[key] = uc2const.PDXF
+		self.assertEqual(uc2const.PDXF, formats.detect_format(self.path,
+									[uc2const.PDXF, uc2const.CDR]))
+		self.assertEqual(uc2const.CDR, formats.detect_format(self.path,
+							[uc2const.PDXF, uc2const.CDR], use_cache=False))
+		os.utime(self.path, (0, 0))
+		self.assertEqual(uc2const.CDR, formats.detect_format(self.path,
+									[uc2const.PDXF, uc2const.CDR]))
+
+	def test03_rewritten_file(self):
+		formats.detect_format(self.path, [uc2const.PDXF, uc2const.CDR])
+		stat = os.stat(self.path)
+		#content is replaced keeping size and modification time
+		fileobj = open(self.path, 'wb')
+		fileobj.write('PK\x03\x04' + '\0' * 8)
+		fileobj.close()
+		os.utime(self.path, (stat.st_atime, stat.st_mtime))
+		self.assertEqual(None, formats.detect_format(self.path,
+									[uc2const.PDXF, uc2const.CDR]))
+
+class TestPreviewExtraction(unittest.TestCase):
+
+	def setUp(self):
+		self.paths = []
+
+	def tearDown(self):
+		for path in self.paths:
+			os.remove(path)
+
+	def make_file(self, suffix, data):
+		fd, path = tempfile.mkstemp(suffix=suffix)
+		os.write(fd, data)
+		os.close(fd)
+		self.paths.append(path)
+		return path
+
+	def make_dib(self):
+		#2x2 24-bit bottom-up bitmap: blue, green / red, white
+		header = struct.pack('<IiiHHIIiiII', 40, 2, 2, 1, 24, 0, 16,
+							0, 0, 0, 0)
+		return header + '\0\0\xff\xff\xff\xff\0\0' + \
+			'\xff\0\0\0\xff\0\0\0'
+
+	def get_pixels(self, png):
+		self.assertEqual(thumbnail.PNG_SIGNATURE, png[:8])
+		width, height = struct.unpack('>II', png[16:24])
+		rows = zlib.decompress(png[41:-12])
+		self.assertEqual((3 * width + 1) * height, len(rows))
+		return [rows[i * (3 * width + 1) + 1:(i + 1) * (3 * width + 1)] \
+			for i in range(height)]
+
+	def test01_dib(self):
+		pixels = self.get_pixels(thumbnail.dib_to_png(self.make_dib()))
+		self.assertEqual(['\0\0\xff\0\xff\0', '\xff\0\0\xff\xff\xff'],
+						pixels)
+
+	def test02_palette(self):
+		header = struct.pack('<IiiHHIIiiII', 40, 3, -1, 1, 1, 0, 4,
+							0, 0, 2, 0)
+		palette = '\0\0\0\0\xff\xff\xff\0'
+		png = thumbnail.dib_to_png(header + palette + '\xa0\0\0\0')
+		self.assertEqual(['\xff\xff\xff\0\0\0\xff\xff\xff'],
+						self.get_pixels(png))
+
+	def test03_cdr(self):
+		disp = '\x01\0\0\0' + self.make_dib()
+		cmpr = 'LIST' + struct.pack('<I', 8) + 'cmpr' + '\xff' * 4
+		chunks = 'vrsn\x02\0\0\0\x84\x03' + cmpr + 'DISP' + \
+			struct.pack('<I', len(disp)) + disp
+		path = self.make_file('.cdr', 'RIFF' + \
+						struct.pack('<I', len(chunks) + 4) + 'CDR9' + chunks)
+		self.assertEqual(disp, thumbnail.find_riff_chunk(path, 'DISP'))
+		self.assertEqual(thumbnail.dib_to_png(self.make_dib()),
+						thumbnail.extract_preview(path))
+
+	def test04_cdrz(self):
+		path = self.make_file('.cdr', '')
+		archive = ZipFile(path, 'w')
+		archive.writestr('content/riffData.cdr', 'RIFF')
+		archive.writestr('metadata/thumbnails/thumbnail.bmp',
+						'BM' + '\0' * 12 + self.make_dib())
+		archive.close()
+		self.assertEqual(thumbnail.dib_to_png(self.make_dib()),
+						thumbnail.extract_preview(path))
+
+	def test05_no_preview(self):
+		path = self.make_file('.cdr', 'RIFF\x04\0\0\0CDR9')
+		self.assertEqual(None, thumbnail.extract_preview(path))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#	
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#	
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#	
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import cdr_tests
+
+def get_suite():
+	suite = unittest.TestSuite()
+	suite.addTest(unittest.makeSuite(cdr_tests.TestStyleSharing))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestPropertyDecoding))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestObjectDecoding))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestPageSelection))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestCdrSaving))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestPltTranslation))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestFormatDetection))
+	suite.addTest(unittest.makeSuite(cdr_tests.TestPreviewExtraction))
+	return suite
+
+
+if __name__ == '__main__':
+	unittest.TextTestRunner(verbosity=2).run(get_suite())
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#	
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#	
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#	
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+import unittest
+from array import array
+from copy import deepcopy
+
+from uc2.formats.pdxf.const import CURVE_CLOSED, CURVE_OPENED, NODE_CUSP, \
+NODE_SYMMETRICAL
+from uc2 import libgeom, libcairo
+from uc2.libgeom import compact
+from uc2.libgeom.compact import CompactPaths
+
+PATHS = [
+	[[0.0, 0.0], [[10.0, 0.0],
+		[[15.0, 0.0], [20.0, 5.0], [20.0, 10.0], NODE_SYMMETRICAL],
+		[0.0, 0.0]], CURVE_CLOSED],
+	[[-5.0, 3.0], [[[-5.0, 8.0], [0.0, 12.0], [4.0, 12.0], NODE_CUSP]],
+		CURVE_OPENED],
+	]
+TRAFO = [2.0, 0.5, -0.25, 1.5, 3.0, -7.0]
+
+class TestCompactPaths(unittest.TestCase):
+
+	def test01_conversion(self):
+		paths = CompactPaths(PATHS)
+		self.assertEqual(PATHS, paths.get_paths())
+		self.assertEqual(2, len(paths))
+		self.assertEqual(10, len(paths.coords) / 2)
+		self.assertEqual(PATHS, [path for path in paths])
+		self.assertEqual(paths, paths.copy())
+		self.assertEqual(paths, deepcopy(paths))
+
+	def test02_trafo(self):
+		result = libgeom.apply_trafo_to_paths(CompactPaths(PATHS), TRAFO)
+		self.assertTrue(isinstance(result, CompactPaths))
+		self.assertEqual(libgeom.apply_trafo_to_paths(PATHS, TRAFO),
+						result.get_paths())
+
+	def test03_flattening(self):
+		result = libgeom.flat_paths(CompactPaths(PATHS), 0.1)
+		self.assertTrue(isinstance(result, CompactPaths))
+		self.assertEqual(libgeom.flat_paths(PATHS, 0.1), result.get_paths())
+
+	def test04_bbox(self):
+		bbox = [-5.0, 0.0, 20.0, 12.0]
+		self.assertEqual(bbox, libgeom.get_paths_bbox(PATHS))
+		self.assertEqual(bbox, libgeom.get_paths_bbox(CompactPaths(PATHS)))
+		self.assertEqual(None, libgeom.get_paths_bbox(CompactPaths()))
+
+	def test05_cpath(self):
+		cpath = libgeom.create_cpath(CompactPaths(PATHS))
+		self.assertEqual(libcairo.get_path_from_cpath(
+						libgeom.create_cpath(PATHS)),
+						libcairo.get_path_from_cpath(cpath))
+
+	def test06_trafo_batch(self):
+		paths_list = [CompactPaths(PATHS), PATHS, CompactPaths(PATHS[1:])]
+		result = libgeom.apply_trafo_to_paths_list(paths_list, TRAFO)
+		self.assertEqual(3, len(result))
+		self.assertEqual(libgeom.apply_trafo_to_paths(PATHS, TRAFO),
+						result[0].get_paths())
+		self.assertEqual(result[0].get_paths(), result[1])
+		self.assertEqual(result[1][1:], result[2].get_paths())
+		self.assertEqual(PATHS, paths_list[0].get_paths())
+
+	def test07_trafo_fallback(self):
+		paths = CompactPaths(PATHS)
+		expected = libgeom.apply_trafo_to_paths(paths, TRAFO)
+		extension = compact._libgeom
+		compact._libgeom = None
+		try:
+			result = libgeom.apply_trafo_to_paths(paths, TRAFO)
+		finally:
+			compact._libgeom = extension
+		self.assertEqual(expected, result)
+		self.assertEqual(map(libgeom.apply_trafo_to_path, PATHS, [TRAFO] * 2),
+						result.get_paths())
+
+	def test08_batched_flattening(self):
+		path = PATHS[1]
+		p0 = path[0]
+		p1, p2, p3 = path[1][0][:3]
+		num = libgeom.get_segments_numbers([(p0, p1, p2, p3)], 0.1)[0]
+		result = libgeom.flat_paths([path], 0.1, True)[0]
+		self.assertEqual(p0, result[0])
+		self.assertEqual(num, len(result[1]))
+		self.assertEqual(p3, result[1][-1])
+		for i in range(1, num):
+			t = float(i) / num
+			point = [(1 - t) ** 3 * p0[j] + 3 * (1 - t) ** 2 * t * p1[j] + \
+					3 * (1 - t) * t ** 2 * p2[j] + t ** 3 * p3[j] for j in (0, 1)]
+			self.assertAlmostEqual(point[0], result[1][i - 1][0], 9)
+			self.assertAlmostEqual(point[1], result[1][i - 1][1], 9)
+		compact_result = libgeom.flat_paths(CompactPaths([path]), 0.1, True)
+		self.assertEqual([result], compact_result.get_paths())
+
+	def test09_thread_contexts(self):
+		contexts = []
+		paths = []
+		def run():
+			contexts.append(libcairo.get_context())
+			cpath = libgeom.create_cpath(PATHS)
+			paths.append(libcairo.get_path_from_cpath(cpath))
+		threads = [threading.Thread(target=run) for i in range(4)]
+		for thread in threads: thread.start()
+		for thread in threads: thread.join()
+		self.assertTrue(libcairo.get_context() is libcairo.get_context())
+		self.assertEqual(4, len(set([id(item) for item in contexts])))
+		self.assertFalse(libcairo.get_context() in contexts)
+		self.assertTrue(libcairo.get_context().ctx is libcairo.CTX)
+		self.assertFalse(libcairo.CTX in [item.ctx for item in contexts])
+		cpath = libcairo.GeometryContext().create_cpath(PATHS)
+		self.assertEqual([libcairo.get_path_from_cpath(cpath)] * 4, paths)
+
+	def test10_exact_bbox(self):
+		path = [[0.0, 0.0], [[[0.0, 10.0], [10.0, 10.0], [10.0, 0.0],
+				NODE_CUSP]], CURVE_OPENED]
+		bbox = [0.0, 0.0, 10.0, 7.5]
+		self.assertEqual(bbox, libgeom.get_paths_bbox([path]))
+		self.assertEqual(bbox, libgeom.get_paths_bbox(CompactPaths([path])))
+		trafo = [0.0, 1.0, -1.0, 0.0, 5.0, 5.0]
+		bbox = [-2.5, 5.0, 5.0, 15.0]
+		self.assertEqual(bbox, libgeom.get_paths_bbox([path], trafo))
+		self.assertEqual(bbox, libgeom.get_paths_bbox(CompactPaths([path]),
+													trafo))
+		self.assertEqual(libgeom.get_paths_bbox(
+						libgeom.apply_trafo_to_paths(PATHS, TRAFO)),
+						libgeom.get_paths_bbox(PATHS, TRAFO))
+		self.assertEqual(None, libgeom.get_paths_bbox([]))
+
+	def test11_transformed_bbox(self):
+		bbox = [-5.0, 0.0, 20.0, 12.0]
+		self.assertEqual([-37.0, -6.0, 13.0, 18.0],
+				libgeom.get_transformed_bbox(bbox, [-2.0, 0.0, 0.0, 2.0, 3.0, -6.0]))
+		self.assertEqual(None, libgeom.get_transformed_bbox(bbox, TRAFO))
+
+	def test12_trafo_coords_type(self):
+		if compact._libgeom is None:
+			return
+		for coords in (array('f', [1.0, 2.0]), array('l', [1, 2]),
+					bytearray(16)):
+			self.assertRaises(TypeError, compact._libgeom.apply_trafo,
+							coords, *TRAFO)
+		coords = array('d', [1.0, 2.0])
+		compact.transform_coords(coords, TRAFO)
+		self.assertEqual(libgeom.apply_trafo_to_point([1.0, 2.0], TRAFO),
+						list(coords))
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#	
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#	
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#	
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from uc2.formats.pdxf import const
+from uc2.formats.pdxf.literals import parse_literal, AttributeDecoder
+from uc2.formats.pdxf.methods import create_new_doc
+from uc2.formats.pdxf.pdxf_config import PDXF_Config
+from uc2.formats.pdxf.pdxf_filters import PDXF_Archive, PDXF_Loader, \
+PDXF_Saver, compress_member
+from uc2.formats.pdxf.resmngr import ResourceManager
+
+LITERALS = [
+	u"1", u"-0", u"10L", u"012", u".5", u"5.", u"-2.5e-3", u"1e5",
+	u"None", u"True", u"False", u"'abc'", u'"a\'b"', u"'a\\'b'",
+	u"u'\xe9'", u"'\xe9'", u"(1)", u"(1,)", u"()", u"{}", u"[1,]",
+	u" [ 1 , 2 ] ", u"[[], [[]]]", u"{'a': (1, [2.0, 'x'])}",
+	u"[[1, 0, ['CMYK', [0.0, 0.0, 0.0, 1.0], 1.0, 'Black']], [], [], []]",
+	]
+
+EXPRESSIONS = [u"__import__('os').system('ls')", u"[1, 2", u"inf", u"1+",
+			u"a", u"[x for x in ()]", u"'a' * 3"]
+
+def exec_literal(text):
+	namespace = {}
+	exec compile('value=' + text, '<string>', 'exec') in namespace
+	return namespace['value']
+
+class TestLiteralFunctions(unittest.TestCase):
+
+	def test01_parse_literals(self):
+		for text in LITERALS:
+			value = parse_literal(text)
+			self.assertEqual(exec_literal(text), value)
+			self.assertEqual(type(exec_literal(text)), type(value))
+
+	def test02_reject_expressions(self):
+		for text in EXPRESSIONS:
+			self.assertRaises(ValueError, parse_literal, text)
+
+	def test03_decode_with_schema(self):
+		decoder = AttributeDecoder()
+		self.assertEqual(2.5, decoder.decode('Rectangle', 'width', u'2.5'))
+		self.assertEqual(2, decoder.decode('Rectangle', 'width', u'2'))
+		self.assertEqual('Page 1', decoder.decode('Page', 'name', u"'Page 1'"))
+		trafo = decoder.decode('Rectangle', 'trafo', u'[1.0, 0, 0, 1.0, 5, 5]')
+		self.assertEqual([1.0, 0, 0, 1.0, 5, 5], trafo)
+		self.assertEqual(int, type(trafo[1]))
+
+	def test04_cached_values_are_not_shared(self):
+		decoder = AttributeDecoder()
+		text = u"[[], [0, 0.5, ['CMYK', [0.0, 0.0, 0.0, 1.0], 1.0, 'Black']]]"
+		style1 = decoder.decode('Rectangle', 'style', text)
+		style2 = decoder.decode('Rectangle', 'style', text)
+		self.assertEqual(style1, style2)
+		style1[1][2][1][0] = 1.0
+		self.assertNotEqual(style1, style2)
+		self.assertEqual(exec_literal(text),
+						decoder.decode('Rectangle', 'style', text))
+
+
+class TestArchiveWriting(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.pdxf')
+		os.close(fd)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def test01_precompressed_members(self):
+		data = 'content ' * 1000
+		archive = PDXF_Archive(self.path, 'w')
+		for name, compress_type in (('a.xml', zipfile.ZIP_DEFLATED),
+								('b.png', zipfile.ZIP_STORED)):
+			job = ('', name, data, compress_type, 9)
+			archive.write_compressed(*compress_member(job))
+		archive.close()
+		archive = zipfile.ZipFile(self.path, 'r')
+		self.assertEqual(None, archive.testzip())
+		self.assertEqual(['a.xml', 'b.png'], archive.namelist())
+		info = archive.getinfo('a.xml')
+		self.assertEqual(zipfile.ZIP_DEFLATED, info.compress_type)
+		self.assertTrue(info.compress_size < len(data))
+		self.assertEqual(zipfile.ZIP_STORED,
+						archive.getinfo('b.png').compress_type)
+		self.assertEqual(data, archive.read('a.xml'))
+		self.assertEqual(data, archive.read('b.png'))
+		archive.close()
+
+class DocPresenter:
+
+	def __init__(self):
+		self.config = PDXF_Config()
+		self.doc_dir = tempfile.mkdtemp()
+		for path in const.DOC_STRUCTURE:
+			os.makedirs(os.path.join(self.doc_dir, path))
+		self.rm = ResourceManager(self)
+		self.model = create_new_doc(self.config)
+
+class TestResourcePacking(unittest.TestCase):
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.pdxf')
+		os.close(fd)
+		self.presenters = []
+
+	def tearDown(self):
+		os.remove(self.path)
+		for item in self.presenters:
+			shutil.rmtree(item.doc_dir)
+
+	def get_presenter(self):
+		presenter = DocPresenter()
+		self.presenters.append(presenter)
+		return presenter
+
+	def test01_resource_members(self):
+		doc = self.get_presenter()
+		doc.model.resources = {'img1': 'Images/img1.png'}
+		image = open(os.path.join(doc.doc_dir, 'Images', 'img1.png'), 'wb')
+		image.write('PNGDATA')
+		image.close()
+		PDXF_Saver().save(doc, self.path)
+		archive = zipfile.ZipFile(self.path, 'r')
+		names = archive.namelist()
+		manifest = archive.read('META-INF/manifest.xml')
+		archive.close()
+		#Resources are stored in archive root and listed in manifest.xml
+		#by resource path
+		self.assertTrue('img1.png' in names)
+		self.assertFalse('Images/img1.png' in names)
+		self.assertTrue('Images/img1.png' in manifest)
+
+		doc = self.get_presenter()
+		doc.model = PDXF_Loader().load(doc, self.path)
+		path = doc.rm.get_resource_path('img1')
+		self.assertEqual('PNGDATA', open(path, 'rb').read())
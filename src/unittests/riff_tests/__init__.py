@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#	
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#	
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#	
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import zlib
+import struct
+import unittest
+from cStringIO import StringIO
+
+from uc2.formats.riff import model
+from uc2.formats.riff.parser import RiffParser
+
+def make_chunk(identifier, data):
+	chunk = identifier + struct.pack('<I', len(data)) + data
+	if len(data) & 1: chunk += '\0'
+	return chunk
+
+def make_list(identifier, childs, header='LIST'):
+	data = identifier + ''.join(childs)
+	chunk = header + struct.pack('<I', len(data)) + data
+	if len(data) & 1: chunk += '\0'
+	return chunk
+
+def make_cmpr_list(childs, blocksizes):
+	data = ''.join(childs)
+	compressed = zlib.compress(data)
+	sizes = zlib.compress(struct.pack('<%dI' % len(blocksizes), *blocksizes))
+	header = struct.pack('<III', len(compressed), len(data), len(sizes))
+	return make_list('cmpr', [header + 'CPng\x01\x00\x04\x00\x00\x00\x00\x00',
+							compressed, sizes])
+
+def get_tree(obj):
+	childs = [get_tree(child) for child in obj.childs]
+	return (obj.__class__.__name__, str(obj.chunk), childs)
+
+class TestRiffParser(unittest.TestCase):
+
+	def parse(self, data, parser=None):
+		return (parser or RiffParser()).parse_file(StringIO(data))
+
+	def test01_round_trip(self):
+		data = make_list('CDRA', [make_chunk('vrsn', 'ab'),
+			make_list('page', [make_chunk('obj ', 'x' * 11),
+							make_list('lgob', [make_chunk('loda', 'y')])]),
+			make_chunk('mcfg', 'z' * 8)], 'RIFF')
+		parser = RiffParser()
+		obj = self.parse(data, parser)
+		self.assertEqual('CDRA', parser.version)
+		self.assertEqual(data, obj.get_chunk())
+		self.assertEqual(3, len(obj.childs))
+		self.assertEqual(model.RiffList, obj.childs[1].__class__)
+		self.assertEqual(model.RiffObject, obj.childs[1].childs[0].__class__)
+
+	def test02_class_map(self):
+		class Version(model.RiffObject): pass
+		class Page(model.RiffList): pass
+		class Parser(RiffParser):
+			obj_map = {'vrsn':Version, 'page':Page}
+		data = make_list('CDRA', [make_chunk('vrsn', 'ab'),
+							make_list('page', [])], 'RIFF')
+		obj = self.parse(data, Parser())
+		self.assertEqual(Version, obj.childs[0].__class__)
+		self.assertEqual(Page, obj.childs[1].__class__)
+
+	def test03_unparsed_list(self):
+		broken = make_list('stlt', ['\x01\x02\x03\x04garbage!'])
+		data = make_list('CDRA', [broken, make_chunk('mcfg', 'z')], 'RIFF')
+		obj = self.parse(data)
+		self.assertEqual(model.RiffUnparsedList, obj.childs[0].__class__)
+		self.assertEqual(broken, obj.childs[0].get_chunk())
+		self.assertEqual(model.RiffObject, obj.childs[1].__class__)
+		self.assertEqual(data, obj.get_chunk())
+
+	def test04_compressed_list(self):
+		childs = ['obj ' + struct.pack('<I', 0) + 'abc\0',
+				'LIST' + struct.pack('<I', 1) + 'lgob' +
+				'loda' + struct.pack('<I', 2) + 'de']
+		cmpr = make_cmpr_list(childs, [3, 14, 2])
+		data = make_list('CDRA', [make_chunk('vrsn', 'ab'), cmpr], 'RIFF')
+		obj = self.parse(data)
+		cmpr_obj = obj.childs[1]
+		self.assertEqual(model.RiffCmprList, cmpr_obj.__class__)
+		self.assertEqual(['obj ', 'LIST'],
+						[child.chunk[:4] for child in cmpr_obj.childs])
+		self.assertEqual('abc', cmpr_obj.childs[0].chunk[8:11])
+		self.assertEqual('de', cmpr_obj.childs[1].childs[0].chunk[8:])
+		self.assertEqual(data, obj.get_chunk())
+
+	def test05_pack(self):
+		class Parser(RiffParser):
+			parse_packs = True
+		inner = make_chunk('in01', 'abc') + make_list('il01', [])
+		pack = make_chunk('pack', 'H' * 12 + zlib.compress(inner))
+		data = make_list('RIFF', [pack, make_chunk('tail', 't')], 'RIFF')
+		obj = self.parse(data, Parser())
+		self.assertEqual(model.RiffPackObject, obj.childs[0].__class__)
+		self.assertEqual(['in01', 'LIST'],
+						[child.chunk[:4] for child in obj.childs[0].childs])
+		self.assertEqual(model.RiffObject, obj.childs[1].__class__)
+
+	def test06_deep_nesting(self):
+		depth = 5000
+		data = make_chunk('leaf', 'z')
+		for i in range(depth):
+			data = make_list('nest', [data])
+		data = make_list('CDRA', [data], 'RIFF')
+		obj = self.parse(data)
+		for i in range(depth + 1):
+			self.assertEqual(1, len(obj.childs))
+			obj = obj.childs[0]
+		self.assertEqual('leaf', obj.chunk[:4])
+
+	def test07_threaded_inflating(self):
+		class Parser(RiffParser):
+			parse_packs = True
+		childs = [make_chunk('vrsn', 'ab')]
+		for i in range(4):
+			cmpr = make_cmpr_list(['obj ' + struct.pack('<I', 0) + 'abc\0',
+					'LIST' + struct.pack('<I', 1) + 'lgob' +
+					'loda' + struct.pack('<I', 2) + 'de' * i], [3, 12 + 2 * i, 2 * i])
+			inner = make_chunk('in01', 'abc' * i) + make_list('il01', [])
+			childs.append(make_list('page', [cmpr]))
+			childs.append(make_chunk('pack', 'H' * 12 + zlib.compress(inner)))
+		data = make_list('CDRA', childs, 'RIFF')
+		trees = []
+		for threads in (1, 3):
+			parser = Parser()
+			parser.inflate_threads = threads
+			obj = self.parse(data, parser)
+			trees.append(get_tree(obj))
+			self.assertEqual(None, parser.pool)
+		self.assertEqual(trees[0], trees[1])
+		loda = obj.childs[7].childs[0].childs[1].childs[0]
+		self.assertEqual('dedede', loda.chunk[8:])
+		self.assertEqual(['in01', 'LIST'],
+						[child.chunk[:4] for child in obj.childs[8].childs])
+
+	def test08_skipped_lists(self):
+		class Parser(RiffParser):
+			def skip_list(self, list_identifier):
+				return list_identifier == 'page'
+		page = make_list('page', [make_list('lgob', [make_chunk('loda', 'y')])])
+		cmpr = make_cmpr_list(['LIST' + struct.pack('<I', 0) + 'page' +
+							'loda' + struct.pack('<I', 1) + 'de'], [14, 2])
+		data = make_list('CDRA', [page, make_chunk('mcfg', 'z'), cmpr], 'RIFF')
+		obj = self.parse(data, Parser())
+		self.assertEqual(model.RiffUnparsedList, obj.childs[0].__class__)
+		self.assertEqual([], obj.childs[0].childs)
+		self.assertEqual(page, obj.childs[0].get_chunk())
+		self.assertEqual(model.RiffObject, obj.childs[1].__class__)
+		skipped = obj.childs[2].childs[0]
+		self.assertEqual(model.RiffUnparsedList, skipped.__class__)
+		self.assertEqual('de', skipped.chunk[-2:])
+		self.assertEqual(data, obj.get_chunk())
+
+	def test09_aborted_parsing(self):
+		class Parser(RiffParser):
+			inflate_threads = 3
+			def skip_list(self, list_identifier):
+				if list_identifier == 'stop':
+					raise ValueError(list_identifier)
+				return False
+		cmpr = make_cmpr_list(['obj ' + struct.pack('<I', 0) + 'abc\0'], [3])
+		data = make_list('CDRA', [cmpr, cmpr, make_list('stop', [])], 'RIFF')
+		parser = Parser()
+		self.assertRaises(ValueError, self.parse, data, parser)
+		self.assertEqual(None, parser.pool)
+
+	def test10_list_sizes(self):
+		#size field of the list does not count padding byte
+		odd = 'LIST' + struct.pack('<I', 13) + 'odd ' + make_chunk('obj ', 'x')
+		data = make_list('CDRA', [odd, make_chunk('mcfg', 'z' * 8)], 'RIFF')
+		obj = self.parse(data)
+		self.assertEqual(data, obj.get_chunk())
+		self.assertEqual(13, obj.childs[0].chunk_size)
+		obj.childs[0].childs.append(model.RiffObject(make_chunk('obj ', 'y')))
+		chunk = obj.get_chunk()
+		self.assertEqual(24, obj.childs[0].chunk_size)
+		self.assertEqual(len(data) + 10, len(chunk))
+		self.assertEqual(chunk, self.parse(chunk).get_chunk())
+
+class TestRiffList(unittest.TestCase):
+
+	def make_list(self, tags):
+		obj = model.RiffList(make_list('test', []))
+		obj.childs = [model.RiffObject(make_chunk(tag, 'x')) for tag in tags]
+		return obj
+
+	def test01_find(self):
+		for num in (3, 3 * model.INDEX_MIN_SIZE):
+			obj = self.make_list(['abc ', 'loda', 'trfd'] * (num / 3))
+			self.assertEqual(obj.childs[1], obj.find('loda'))
+			self.assertEqual(None, obj.find('none'))
+			self.assertEqual(obj.childs[2::3], obj.find_all('trfd'))
+			self.assertEqual([], obj.find_all('none'))
+
+	def test02_index_invalidation(self):
+		obj = self.make_list(['abc ', 'loda', 'trfd'] * model.INDEX_MIN_SIZE)
+		self.assertEqual(None, obj.find('lgob'))
+		lgob = model.RiffList(make_list('lgob', []))
+		obj.childs.append(lgob)
+		self.assertEqual(lgob, obj.find('lgob'))
+		obj.childs[0] = model.RiffList(make_list('grp ', []))
+		obj.invalidate_index()
+		self.assertEqual(obj.childs[0], obj.find('grp '))
+		self.assertEqual(obj.childs[3], obj.find('abc '))
+		obj.childs = []
+		self.assertEqual(None, obj.find('lgob'))
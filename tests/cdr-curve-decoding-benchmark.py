@@ -0,0 +1,141 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmark of CDR curve points decoding. Compares per-point
+decoding (former CdrCurve.update implementation) with bulk decoding
+by parse_curve_points() on synthetic loda chunk data.
+"""
+
+import sys
+import time
+import random
+import struct
+from copy import deepcopy
+
+from uc2.formats.riff.utils import dword2py_int
+from uc2.formats.cdr.utils import parse_size_value, parse_curve_points
+from uc2.formats.pdxf.const import NODE_CUSP, NODE_SMOOTH, NODE_SYMMETRICAL, \
+									CURVE_CLOSED, CURVE_OPENED
+
+def make_points_block(pointnum):
+	"""
+	Creates curve points block consisting of closed subpaths
+	with line and curve segments.
+	"""
+	coords = []
+	flags = []
+	while len(flags) < pointnum:
+		flags.append(0x00)
+		for i in range(random.randint(1, 20)):
+			if random.randint(0, 1):
+				flags.append(0x40)
+			else:
+				flags += [0xc0, 0xc0, 0x80 | random.choice([0, 0x10, 0x20])]
+		flags[-1] |= 8
+	flags = flags[:pointnum]
+	for i in range(2 * pointnum):
+		coords.append(random.randint(-500000, 500000))
+	return struct.pack('<I', pointnum) + \
+		struct.pack('<%dl' % (2 * pointnum), *coords) + \
+		struct.pack('<%dB' % pointnum, *flags)
+
+def parse_per_point(data, offset):
+	paths = []
+	path = []
+	points = []
+	point1 = []
+	point2 = []
+
+	pointnum = dword2py_int(data[offset:offset + 4])
+	for i in range (pointnum):
+		x = parse_size_value(data[offset + 4 + i * 8:offset + 8 + i * 8])
+		y = parse_size_value(data[offset + 8 + i * 8:offset + 12 + i * 8])
+
+		point_type = ord(data[offset + 4 + pointnum * 8 + i])
+		if point_type & 0x10 == 0 and point_type & 0x20 == 0:
+			marker = NODE_CUSP
+		if point_type & 0x10 == 0x10:
+			marker = NODE_SMOOTH
+		if point_type & 0x20 == 0x20:
+			marker = NODE_SYMMETRICAL
+
+		if point_type & 0x40 == 0 and point_type & 0x80 == 0:
+			if path:
+				path.append(deepcopy(points))
+				path.append(CURVE_OPENED)
+				paths.append(deepcopy(path))
+			path = []
+			points = []
+			point1 = []
+			point2 = []
+			path.append([x, y])
+		if point_type & 0x40 == 0x40 and point_type & 0x80 == 0:
+			points.append([x, y])
+			point1 = []
+			point2 = []
+		if point_type & 0x40 == 0 and point_type & 0x80 == 0x80:
+			points.append(deepcopy([point1, point2, [x, y], marker]))
+			point1 = []
+			point2 = []
+		if point_type & 0x40 == 0x40 and point_type & 0x80 == 0x80:
+			if point1:
+				point2 = [x, y]
+			else:
+				point1 = [x, y]
+		if point_type & 8 == 8:
+			if path and points:
+				path.append(deepcopy(points))
+				path.append(CURVE_CLOSED)
+				paths.append(deepcopy(path))
+				path = []
+				points = []
+	if path:
+		path.append(deepcopy(points))
+		path.append(CURVE_OPENED)
+		paths.append(deepcopy(path))
+	return paths
+
+def parse_bulk(data, offset):
+	pointnum = dword2py_int(data[offset:offset + 4])
+	return parse_curve_points(data, offset + 4, pointnum)
+
+def measure(func, chunks, offset):
+	start = time.time()
+	result = [func(chunk, offset) for chunk in chunks]
+	return time.time() - start, result
+
+pointnum = 200000
+if len(sys.argv) > 1:
+	pointnum = int(sys.argv[1])
+
+random.seed(0)
+offset = 108
+header = '\0' * offset
+chunks = [header + make_points_block(pointnum / 10) for i in range(10)]
+
+print 'Curve nodes: %d in %d loda chunks' % (pointnum, len(chunks))
+per_point_time, ref = measure(parse_per_point, chunks, offset)
+print 'Per-point decoding: %.3f sec' % per_point_time
+bulk_time, result = measure(parse_bulk, chunks, offset)
+print 'Bulk decoding:      %.3f sec' % bulk_time
+if not result == ref:
+	print 'ERROR: decoded paths are different'
+	sys.exit(1)
+print 'Speedup: %.1fx' % (per_point_time / max(bulk_time, 0.000001))
@@ -0,0 +1,141 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of CDR to PDXF style translation. Compares deepcopy() of
+style items for every object (former CDR_to_PDXF_Translator behaviour)
+with copying of interned styles by copy_value() on synthetic document
+with many objects, and reports memory occupied by style lists of
+translated objects. Each object owns its style in both cases.
+Usage: cdr-style-interning-benchmark.py [objects number]
+"""
+
+import sys
+import time
+import random
+from copy import deepcopy
+
+from uc2 import uc2_init
+from uc2.formats.cdr.cdr_config import CDR_Config
+from uc2.formats.cdr import cdr_translators
+from uc2.formats.cdr.cdr_translators import CDR_to_PDXF_Translator
+from uc2.formats.pdxf.presenter import PDXF_Presenter
+
+class FillProperty:
+
+	def __init__(self, fill_id):
+		self.fill_id = fill_id
+		self.fill_color = ['CMYK', [random.random() for i in range(4)], 1.0, '']
+
+	def translate(self, translator):
+		translator.add_fill_prop(self)
+
+class OutlineProperty:
+
+	def __init__(self, stroke_id):
+		self.stroke_id = stroke_id
+		self.stroke_spec = random.choice([0, 2, 4])
+		self.stroke_width = random.random()
+		self.stroke_color = ['CMYK', [random.random() for i in range(4)], 1.0, '']
+		self.stroke_dashes = [2, 1]
+		self.stroke_caps = 0
+		self.stroke_join = 0
+
+	def translate(self, translator):
+		translator.add_stroke_prop(self)
+
+class Rectangle:
+
+	style_id = 1
+	layer_name = 'Layer 1'
+
+	def __init__(self, fills, outls):
+		self.fill_id = random.choice([None, random.randint(0, fills - 1)])
+		self.outl_id = random.choice([None, random.randint(0, outls - 1)])
+		self.rect_size = (random.random() * 100.0, random.random() * 100.0)
+		self.radiuses = (0.0, 0.0, 0.0, 0.0)
+		self.trafo = [1.0, 0.0, 0.0, 1.0, random.random(), random.random()]
+
+	def translate(self, translator):
+		translator.create_rectangle(self)
+
+class Document:
+
+	def __init__(self, num, fills=200, outls=100):
+		self.config = CDR_Config()
+		self.props = [FillProperty(i) for i in range(fills)]
+		self.props += [OutlineProperty(i) for i in range(outls)]
+		self.objs = [Rectangle(fills, outls) for i in range(num)]
+		self.model = self
+
+	def translate(self, translator):
+		for item in self.props:
+			item.translate(translator)
+		translator.start_page(None)
+		translator.start_page(None)
+		translator.start_layer(self.objs[0])
+		for item in self.objs:
+			item.translate(translator)
+		translator.close_layer()
+		translator.close_page()
+
+def get_size(value, seen):
+	if id(value) in seen: return 0
+	seen.add(id(value))
+	size = sys.getsizeof(value)
+	if isinstance(value, list):
+		for item in value:
+			size += get_size(item, seen)
+	return size
+
+def deepcopy_style(style):
+	return [deepcopy(item) for item in style]
+
+def measure(copy_function, doc, appdata):
+	cdr_translators.copy_value = copy_function
+	pdxf_doc = PDXF_Presenter(appdata)
+	start = time.time()
+	CDR_to_PDXF_Translator().translate(doc, pdxf_doc)
+	result = time.time() - start
+	objs = pdxf_doc.methods.get_pages()[0].childs[0].childs
+	seen = set()
+	size = sum([get_size(obj.style, seen) for obj in objs])
+	styles = [obj.style for obj in objs]
+	pdxf_doc.close()
+	return result, size, styles
+
+num = 100000
+if len(sys.argv) > 1:
+	num = int(sys.argv[1])
+
+random.seed(0)
+app = uc2_init()
+doc = Document(num)
+
+print 'Objects: %d, fills: 200, outlines: 100' % num
+copy_value = cdr_translators.copy_value
+copy_time, copy_size, ref = measure(deepcopy_style, doc, app.appdata)
+print 'Style deepcopy:    %.3f sec, %.1f MB' % (copy_time, copy_size / 1048576.0)
+interned_time, interned_size, styles = measure(copy_value, doc, app.appdata)
+print 'Interned styles:   %.3f sec, %.1f MB' % (interned_time, interned_size / 1048576.0)
+if not styles == ref:
+	print 'ERROR: translated styles are different'
+	sys.exit(1)
+print 'Speedup: %.1fx' % (copy_time / max(interned_time, 0.000001))
@@ -0,0 +1,86 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of CDR to PLT translation. Compares two-hop translation
+(CDR model -> PDXF model -> PLT model) with direct CDR_to_PLT_Translator.
+Usage: cdr-to-plt-benchmark.py file.cdr
+"""
+
+import os
+import re
+import sys
+import time
+import tempfile
+
+from uc2 import uc2_init
+from uc2.formats.cdr import cdr_loader, cdr_to_plt
+from uc2.formats.plt import plt_saver
+
+def two_hop(appdata, path, output):
+	doc = cdr_loader(appdata, path, cnf={})
+	plt_saver(doc, output, cnf={})
+	doc.close()
+
+def direct(appdata, path, output):
+	cdr_to_plt(appdata, path, output, cnf={})
+
+def measure(func, appdata, path, output, rounds=3):
+	start = time.time()
+	for i in range(rounds):
+		func(appdata, path, output)
+	result = (time.time() - start) / rounds
+	fileobj = open(output, 'rb')
+	data = fileobj.read()
+	fileobj.close()
+	os.remove(output)
+	return result, data
+
+def get_coords(data):
+	return [int(item) for item in re.findall(r'-?\d+', data)]
+
+if len(sys.argv) < 2:
+	print __doc__
+	sys.exit(1)
+path = sys.argv[1]
+app = uc2_init()
+output = os.path.join(tempfile.gettempdir(), 'cdr-to-plt-benchmark.plt')
+
+print 'File: %s' % os.path.basename(path)
+two_hop_time, ref = measure(two_hop, app.appdata, path, output)
+print 'CDR -> PDXF -> PLT: %.3f sec' % two_hop_time
+direct_time, data = measure(direct, app.appdata, path, output)
+print 'CDR -> PLT:         %.3f sec' % direct_time
+
+ref_coords = get_coords(ref)
+coords = get_coords(data)
+if not len(ref.split(';')) == len(data.split(';')) or \
+not len(ref_coords) == len(coords):
+	print 'ERROR: translated jobs are different'
+	sys.exit(1)
+#Cairo paths store coordinates in fixed point format,
+#so coordinates can differ by rounding
+diff = [abs(x - y) for x, y in zip(ref_coords, coords)]
+if diff and max(diff) > 1:
+	print 'ERROR: translated coordinates are different'
+	sys.exit(1)
+print 'Coordinates: %d, differ by 1 plotter unit: %d' % \
+			(len(coords), len([x for x in diff if x]))
+print 'Speedup: %.1fx' % (two_hop_time / max(direct_time, 0.000001))
@@ -0,0 +1,129 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of Bezier curves flattening. Compares former recursive
+flattening with iterative flat_paths() in adaptive and batched modes
+and reports curve segments per second at several tolerances.
+Usage: libgeom-flattening-benchmark.py [segments number]
+"""
+
+import sys
+import time
+import random
+
+from uc2.formats.pdxf.const import NODE_CUSP, CURVE_OPENED
+from uc2 import libgeom
+from uc2.libgeom import midpoint, sub_points, add_points, abs_point, \
+normalize_point, mult_points, cr_points
+
+TOLERANCES = [0.1, 0.25, 0.5, 1.0]
+
+def recursive_segment(p0, p1, p2, p3, tlr):
+	p4 = midpoint(p0, p1)
+	p5 = midpoint(p1, p2)
+	p6 = midpoint(p2, p3)
+	p7 = midpoint(p4, p5)
+	p8 = midpoint(p5, p6)
+	p9 = midpoint(p7, p8)
+
+	b = sub_points(p3, p0)
+	s = sub_points(p9, p0)
+	c1 = sub_points(p1, p0)
+	c2 = sub_points(p2, p3)
+
+	if abs_point(c1) > abs_point(b) or abs_point(c2) > abs_point(b):
+		return recursive_segment(p0, p4, p7, p9, tlr) + \
+			recursive_segment(p9, p8, p6, p3, tlr)
+	elif abs_point(b) < tlr / 2.0:
+		return [p9, p3]
+	else:
+		N = normalize_point(b)
+		if ((mult_points(c1, N)) < -tlr
+			or (mult_points(c2, N)) > tlr
+			or cr_points(c1, b) * cr_points(c2, b) < 0
+			or abs(cr_points(N, s)) > tlr):
+			return recursive_segment(p0, p4, p7, p9, tlr) + \
+				recursive_segment(p9, p8, p6, p3, tlr)
+		else:
+			return [p9, p3]
+
+def recursive_path(path, tlr):
+	result = []
+	result.append([] + path[0])
+	start = [] + path[0]
+	for point in path[1]:
+		if len(point) == 2:
+			result.append([] + point)
+			start = [] + point
+		else:
+			p0 = sub_points(point[0], start)
+			p1 = sub_points(point[1], start)
+			p2 = sub_points(point[2], start)
+			points = recursive_segment([0.0, 0.0], p0, p1, p2, tlr)
+			for item in points:
+				p = add_points(item, start)
+				result.append(p)
+			start = [] + point[2]
+	return [result[0], result[1:], path[2]]
+
+def recursive_paths(paths, tlr):
+	return [recursive_path(path, tlr) for path in paths]
+
+def make_paths(segnum):
+	paths = []
+	for i in range(segnum / 50):
+		start = [random.uniform(0, 500), random.uniform(0, 500)]
+		points = []
+		x, y = start
+		for j in range(50):
+			points.append([[x + random.uniform(-50, 50), y + random.uniform(-50, 50)],
+				[x + random.uniform(-50, 50), y + random.uniform(-50, 50)],
+				[x + random.uniform(-50, 50), y + random.uniform(-50, 50)],
+				NODE_CUSP])
+			x, y = points[-1][2]
+		paths.append([start, points, CURVE_OPENED])
+	return paths
+
+def measure(func, *args):
+	start = time.time()
+	result = func(*args)
+	return max(time.time() - start, 0.000001), result
+
+segnum = 50000
+if len(sys.argv) > 1:
+	segnum = int(sys.argv[1])
+
+random.seed(0)
+paths = make_paths(segnum)
+segnum = sum([len(path[1]) for path in paths])
+
+print 'Curve segments: %d' % segnum
+print 'tolerance  recursive seg/s  iterative seg/s  batched seg/s  speedup'
+for tlr in TOLERANCES:
+	ref_time, ref = measure(recursive_paths, paths, tlr)
+	iter_time, result = measure(libgeom.flat_paths, paths, tlr)
+	batch_time, batched = measure(libgeom.flat_paths, paths, tlr, True)
+	if not result == ref:
+		print 'ERROR: flattened paths are different at tolerance %s' % tlr
+		sys.exit(1)
+	print '%9.2f  %15d  %15d  %13d  %.1fx / %.1fx' % (tlr,
+		segnum / ref_time, segnum / iter_time, segnum / batch_time,
+		ref_time / iter_time, ref_time / batch_time)
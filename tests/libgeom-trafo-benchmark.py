@@ -0,0 +1,93 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark of affine transforms applied to paths. Compares per-point
+transforming (apply_trafo_to_path for each path) with batched
+apply_trafo_to_paths() on list based and compact paths, and with
+apply_trafo_to_paths_list() on many objects sharing a trafo.
+Usage: libgeom-trafo-benchmark.py [nodes number]
+"""
+
+import sys
+import time
+import random
+
+from uc2.formats.pdxf.const import NODE_CUSP, CURVE_CLOSED
+from uc2 import libgeom
+from uc2.libgeom import compact
+from uc2.libgeom.compact import CompactPaths
+
+def make_paths(nodenum):
+	paths = []
+	points = []
+	for i in range(nodenum):
+		if random.randint(0, 1):
+			points.append([random.random(), random.random()])
+		else:
+			points.append([[random.random(), random.random()],
+						[random.random(), random.random()],
+						[random.random(), random.random()], NODE_CUSP])
+		if len(points) == 100:
+			paths.append([[0.0, 0.0], points, CURVE_CLOSED])
+			points = []
+	return paths
+
+def per_point(paths, trafo):
+	return [libgeom.apply_trafo_to_path(path, trafo) for path in paths]
+
+def measure(func, *args):
+	start = time.time()
+	result = func(*args)
+	return time.time() - start, result
+
+nodenum = 1000000
+if len(sys.argv) > 1:
+	nodenum = int(sys.argv[1])
+
+random.seed(0)
+paths = make_paths(nodenum)
+compact_paths = CompactPaths(paths)
+objects = [CompactPaths(paths[i:i + 10]) for i in range(0, len(paths), 10)]
+trafo = [0.8, 0.3, -0.3, 0.8, 10.0, -20.0]
+
+print 'Nodes: %d, points: %d, _libgeom extension: %s' % \
+	(nodenum, len(compact_paths.coords) / 2, not compact._libgeom is None)
+ref_time, ref = measure(per_point, paths, trafo)
+print 'Per-point transforming:  %.3f sec' % ref_time
+batch_time, result = measure(libgeom.apply_trafo_to_paths, paths, trafo)
+print 'Batched list paths:      %.3f sec' % batch_time
+compact_time, compact_result = measure(libgeom.apply_trafo_to_paths,
+									compact_paths, trafo)
+print 'Compact paths:           %.3f sec' % compact_time
+objects_time, objects_result = measure(libgeom.apply_trafo_to_paths_list,
+									objects, trafo)
+print 'Compact paths, %d objects: %.3f sec' % (len(objects), objects_time)
+
+objects_paths = []
+for item in objects_result:
+	objects_paths += item.get_paths()
+if not result == ref or not compact_result.get_paths() == ref or \
+not objects_paths == ref:
+	print 'ERROR: transformed paths are different'
+	sys.exit(1)
+print 'Speedup: %.1fx (list), %.1fx (compact)' % \
+	(ref_time / max(batch_time, 0.000001),
+	ref_time / max(compact_time, 0.000001))
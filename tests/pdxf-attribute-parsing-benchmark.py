@@ -0,0 +1,78 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of PDXF attribute values decoding. Compares former
+compile/exec decoding with AttributeDecoder on content.xml attributes.
+Usage: pdxf-attribute-parsing-benchmark.py [file.pdxf]
+"""
+
+import os
+import sys
+import time
+import xml.sax
+from xml.sax import handler
+from zipfile import ZipFile
+from cStringIO import StringIO
+
+from uc2.formats.pdxf.literals import AttributeDecoder
+
+class AttributeCollector(handler.ContentHandler):
+
+	def __init__(self):
+		self.attrs = []
+
+	def startElement(self, name, attrs):
+		if name == 'Content': return
+		for item in attrs._attrs.keys():
+			self.attrs.append((name, item, attrs._attrs[item]))
+
+def exec_decode(tag, attr, text):
+	namespace = {}
+	code = compile('value=' + text, '<string>', 'exec')
+	exec code in namespace
+	return namespace['value']
+
+def measure(get_decode, attrs, rounds=5):
+	result = None
+	start = time.time()
+	for i in range(rounds):
+		decode = get_decode()
+		result = [decode(*item) for item in attrs]
+	return (time.time() - start) / rounds, result
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src',
+				'unittests', 'uc2_tests', 'uc2_data', '1152.pdxf')
+if len(sys.argv) > 1:
+	path = sys.argv[1]
+
+content = ZipFile(path, 'r').read('content.xml')
+collector = AttributeCollector()
+xml.sax.parse(StringIO(content), collector)
+attrs = collector.attrs
+
+print 'File: %s, attributes: %d' % (os.path.basename(path), len(attrs))
+exec_time, ref = measure(lambda: exec_decode, attrs)
+print 'compile/exec decoding: %.4f sec' % exec_time
+decoder_time, result = measure(lambda: AttributeDecoder().decode, attrs)
+print 'AttributeDecoder:      %.4f sec' % decoder_time
+if not result == ref:
+	print 'ERROR: decoded values are different'
+	sys.exit(1)
+print 'Speedup: %.1fx' % (exec_time / max(decoder_time, 0.000001))
@@ -0,0 +1,133 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark of RIFF chunk tree parsing. Compares former recursive
+parse_stream/parse_list/parse_object parsing with RiffParser
+on synthetic files with many small chunks and deep list nesting.
+Usage: riff-parsing-benchmark.py [chunks number]
+"""
+
+import sys
+import time
+import struct
+from cStringIO import StringIO
+
+from uc2.formats.riff import model
+from uc2.formats.riff.utils import get_chunk_size
+from uc2.formats.riff.parser import RiffParser
+
+class RecursiveParser:
+
+	obj_map = {}
+
+	def parse_file(self, file):
+		identifier = file.read(4)
+		size_field = file.read(4)
+		list_identifier = file.read(4)
+		obj = model.RiffRootList(identifier + size_field + list_identifier)
+		size = get_chunk_size(size_field)
+		while file.tell() < size + 8:
+			obj.childs.append(self.parse_stream(file))
+		return obj
+
+	def get_class(self, identifier, list_identifier=''):
+		if list_identifier:
+			return self.obj_map.get(list_identifier, model.RiffList)
+		return self.obj_map.get(identifier, model.RiffObject)
+
+	def parse_stream(self, file):
+		identifier = file.read(4)
+		if identifier == 'LIST':
+			return self.parse_list(file, identifier)
+		return self.parse_object(file, identifier)
+
+	def parse_list(self, file, identifier):
+		size_field = file.read(4)
+		list_identifier = file.read(4)
+		size = get_chunk_size(size_field)
+		offset = file.tell()
+		class_ = self.get_class(identifier, list_identifier)
+		obj = class_(identifier + size_field + list_identifier)
+		while file.tell() <= offset + size - 8:
+			obj.childs.append(self.parse_stream(file))
+		return obj
+
+	def parse_object(self, file, identifier):
+		size_field = file.read(4)
+		size = get_chunk_size(size_field)
+		chunk = file.read(size)
+		class_ = self.get_class(identifier)
+		return class_(identifier + size_field + chunk)
+
+def make_chunk(identifier, data):
+	chunk = identifier + struct.pack('<I', len(data)) + data
+	if len(data) & 1: chunk += '\0'
+	return chunk
+
+def make_list(identifier, childs, header='LIST'):
+	data = identifier + ''.join(childs)
+	return header + struct.pack('<I', len(data)) + data
+
+def make_flat_file(num):
+	childs = []
+	for i in range(num / 4):
+		childs.append(make_list('obj ', [make_chunk('trfd', 'T' * 50),
+					make_chunk('loda', 'L' * (i % 97)), make_chunk('flgs', 'F')]))
+	return make_list('CDRA', childs, 'RIFF'), 4 * (num / 4)
+
+def make_deep_file(num, depth=400):
+	data = ''
+	count = 0
+	while count < num:
+		branch = make_chunk('loda', 'L' * 7)
+		for i in range(depth):
+			branch = make_list('lgob', [make_chunk('flgs', 'F' * 3), branch])
+		data += branch
+		count += 2 * depth + 1
+	return make_list('CDRA', [data], 'RIFF'), count
+
+def get_tree(obj):
+	childs = getattr(obj, 'childs', [])
+	return (obj.chunk[:12], len(obj.chunk), [get_tree(item) for item in childs])
+
+def measure(parser, data, rounds=3):
+	start = time.time()
+	for i in range(rounds):
+		obj = parser.parse_file(StringIO(data))
+	return (time.time() - start) / rounds, obj
+
+num = 200000
+if len(sys.argv) > 1:
+	num = int(sys.argv[1])
+sys.setrecursionlimit(10000)
+
+for name, (data, chunks) in (('many small chunks', make_flat_file(num)),
+							('deep nesting', make_deep_file(num))):
+	print '%s: %d chunks, %d bytes' % (name, chunks, len(data))
+	recursive_time, ref = measure(RecursiveParser(), data)
+	print '  recursive parser: %.3f sec, %d chunks/sec' % \
+				(recursive_time, chunks / recursive_time)
+	parser_time, obj = measure(RiffParser(), data)
+	print '  RiffParser:       %.3f sec, %d chunks/sec' % \
+				(parser_time, chunks / parser_time)
+	if not get_tree(obj) == get_tree(ref):
+		print 'ERROR: parsed trees are different'
+		sys.exit(1)
+	print '  Speedup: %.1fx' % (recursive_time / max(parser_time, 0.000001))
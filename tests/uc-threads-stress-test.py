@@ -0,0 +1,85 @@
+#! /usr/bin/python
+#
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2013 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Stress test of concurrent translations. Translates files to PLT
+serially and then by many threads in parallel, parallel results
+should be identical to serial ones.
+Usage: uc-threads-stress-test.py [threads number] [rounds] [files...]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+from uc2 import uc2_init
+
+THREADS = 8
+ROUNDS = 5
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src',
+					'unittests', 'uc2_tests', 'uc2_data')
+files = [os.path.join(data_dir, '1152.pdxf'),
+		os.path.join(data_dir, '1152_rects14.pdxf'),
+		os.path.join(data_dir, 'test.pdxf')]
+
+threads_num = THREADS
+rounds = ROUNDS
+if len(sys.argv) > 1: threads_num = int(sys.argv[1])
+if len(sys.argv) > 2: rounds = int(sys.argv[2])
+if len(sys.argv) > 3: files = sys.argv[3:]
+
+app = uc2_init()
+work_dir = tempfile.mkdtemp(prefix='uc2_stress_')
+
+def translate(path, name):
+	output = os.path.join(work_dir, name + '.plt')
+	result, msg = app.translate(path, output)
+	if not result:
+		return 'ERROR: ' + msg
+	content = open(output, 'rb').read()
+	os.remove(output)
+	return content
+
+reference = {}
+for index in range(len(files)):
+	reference[index] = translate(files[index], 'serial%d' % index)
+
+failures = []
+
+def worker(thread_index):
+	for i in range(rounds):
+		for index in range(len(files)):
+			name = 'thread%d_%d_%d' % (thread_index, i, index)
+			if not translate(files[index], name) == reference[index]:
+				failures.append(name)
+
+threads = [threading.Thread(target=worker, args=(i,)) \
+		for i in range(threads_num)]
+for thread in threads: thread.start()
+for thread in threads: thread.join()
+shutil.rmtree(work_dir, True)
+
+total = threads_num * rounds * len(files)
+print 'Translations: %d in %d threads, different results: %d' % \
+	(total, threads_num, len(failures))
+if failures: sys.exit(1)